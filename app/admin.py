@@ -1,8 +1,13 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
-from .models import Project, User
+from .models import EmailOutbox, MediaFile, Project, User
 
 # 管理画面のタイトル設定
 admin.site.site_header = "Django TailwindCSS Multimedia Auth 管理画面"
@@ -10,6 +15,86 @@ admin.site.site_title = "管理画面"
 admin.site.index_title = "サイト管理"
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    絞り込みのない一覧では PostgreSQL の統計情報から件数を推定するページネーター
+
+    大きなテーブルで COUNT(*) による全件走査を避ける。
+    推定値が estimate_threshold 未満の場合や絞り込み・検索中は正確に数える。
+    """
+
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, "query", None)
+        if query is not None and not query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == "postgresql":
+                # パーティションテーブル（app.partitioning）の親テーブルは行を持たないため、
+                # パーティションの推定行数を合計する
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT sum(greatest(reltuples, 0))::bigint FROM pg_class "
+                        "WHERE oid = %s::regclass OR oid IN ("
+                        "SELECT inhrelid FROM pg_inherits "
+                        "WHERE inhparent = %s::regclass)",
+                        [queryset.model._meta.db_table] * 2,
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] >= self.estimate_threshold:
+                    return row[0]
+        return super().count
+
+
+def _media_subquery(aggregate):
+    """プロジェクトごとのメディアファイルの集計値（表示中の行についてのみ計算される）"""
+    return Coalesce(
+        Subquery(
+            # オーナーも指定し、user_id で分割したテーブルでは 1 つのパーティションだけを読む
+            MediaFile.all_objects.filter(project=OuterRef("pk"), user=OuterRef("owner"))
+            .order_by()
+            .values("project")
+            .annotate(value=aggregate)
+            .values("value"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def _format_size(size):
+    return f"{size / (1024 * 1024):.2f}MB"
+
+
+class MoveToTrashMixin:
+    """一括削除をゴミ箱への移動にする管理画面用ミックスイン"""
+
+    actions = ["move_to_trash"]
+
+    def get_actions(self, request):
+        # 確認画面で関連オブジェクトを全件列挙する標準の一括削除は使わない
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    @admin.action(description="選択された項目をゴミ箱に移動", permissions=["delete"])
+    def move_to_trash(self, request, queryset):
+        # ファイルの削除は保持期間の経過後に purge_trash コマンドが少しずつ行うため、
+        # ここでは削除日時を設定するだけにする（ゴミ箱から復元できる）。
+        # プロジェクトは中のメディアファイルを 1 回の UPDATE でまとめて移動する
+        count = 0
+        for obj in queryset.filter(deleted_at__isnull=True).iterator():
+            obj.soft_delete()
+            count += 1
+        self.message_user(
+            request,
+            f"{count}件をゴミ箱に移動しました。",
+            messages.SUCCESS,
+        )
+
+
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
     """カスタムユーザー管理"""
@@ -61,9 +146,106 @@ class UserAdmin(BaseUserAdmin):
     # 読み取り専用フィールド
     readonly_fields = ("date_joined", "last_login")
 
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
 
 @admin.register(Project)
-class ProjectAdmin(admin.ModelAdmin):
-    list_display = ("name", "owner", "created_at", "updated_at")
-    list_filter = ("owner", "created_at")
+class ProjectAdmin(MoveToTrashMixin, admin.ModelAdmin):
+    list_display = (
+        "name",
+        "owner",
+        "media_count",
+        "total_size",
+        "created_at",
+        "updated_at",
+    )
+    # オーナーは人数が多いと一覧が使えなくなるため、絞り込みではなく検索で指定する
+    list_filter = ("created_at", ("deleted_at", admin.EmptyFieldListFilter))
+    list_select_related = ("owner",)
     search_fields = ("name", "description", "owner__username", "owner__email")
+    autocomplete_fields = ("owner",)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_queryset(self, request):
+        return Project.all_objects.annotate(
+            media_count=_media_subquery(Count("pk")),
+            total_size=_media_subquery(Sum("file_size")),
+        )
+
+    @admin.display(description="ファイル数")
+    def media_count(self, obj):
+        return obj.media_count
+
+    @admin.display(description="合計サイズ")
+    def total_size(self, obj):
+        return _format_size(obj.total_size)
+
+
+@admin.register(MediaFile)
+class MediaFileAdmin(MoveToTrashMixin, admin.ModelAdmin):
+    list_display = (
+        "title",
+        "user",
+        "project",
+        "file_type",
+        "file_size_display",
+        "storage_tier",
+        "processing_status",
+        "created_at",
+    )
+    list_filter = (
+        "file_type",
+        "storage_tier",
+        "processing_status",
+        "created_at",
+        ("deleted_at", admin.EmptyFieldListFilter),
+    )
+    list_select_related = ("user", "project")
+    search_fields = ("title", "file")
+    autocomplete_fields = ("user", "project")
+    readonly_fields = (
+        "file_size",
+        "mime_type",
+        "duration",
+        "loudness_lufs",
+        "true_peak_dbtp",
+        "rms_dbfs",
+        "audio_analysis",
+        "storage_tier",
+        "tier_changed_at",
+        "access_count",
+        "last_accessed_at",
+        "processing_status",
+        "processing_started_at",
+        "processing_error",
+        "created_at",
+        "updated_at",
+        "deleted_at",
+    )
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_queryset(self, request):
+        # ゴミ箱内のファイルも表示する
+        return MediaFile.all_objects.all()
+
+    @admin.display(description="サイズ", ordering="file_size")
+    def file_size_display(self, obj):
+        return _format_size(obj.file_size)
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = (
+        "subject",
+        "to_email",
+        "status",
+        "attempts",
+        "created_at",
+        "sent_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("to_email", "subject")
+    raw_id_fields = ("user",)
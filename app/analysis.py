@@ -0,0 +1,240 @@
+"""
+音声の解析（ラウドネス・ピーク・RMS・無音区間）
+
+ffmpeg がデコードした PCM をブロック単位で AudioAnalyzer に渡し、NumPy のベクトル演算で
+集計する。ブロックの処理後に残すのは 100ms ごとの集計値だけなので、数時間のファイルでも
+メモリ使用量はブロックの大きさでほぼ決まる。
+
+ラウドネスは ITU-R BS.1770-4 に従う。K 特性フィルター（IIR）は逐次計算が必要なため
+ffmpeg のフィルターグラフで適用し、元の信号と K 特性を適用した信号を 1 つのストリームの
+前半・後半のチャンネルとして受け取る。NumPy が必要（任意依存）。
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy は任意依存
+    np = None
+
+# 解析時のサンプリング周波数（K 特性フィルターの係数はこの周波数のもの）
+SAMPLE_RATE = 48000
+# ffmpeg から一度に読み込む長さ（秒）
+BLOCK_SECONDS = 10
+# ラウドネスのゲーティング・RMS・無音判定の単位（400ms のブロックを 100ms ずつずらす）
+STEP_SECONDS = 0.1
+GATE_STEPS = 4
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+# 詳細ページに表示する RMS エンベロープの点数の上限
+ENVELOPE_POINTS = 400
+# 保存する無音区間の数の上限（合計時間はすべての区間から求める）
+MAX_SILENCES = 200
+
+# BS.1770 の K 特性フィルター（48kHz）: 高域シェルフ、RLB ハイパス
+K_WEIGHTING = [
+    (
+        (1.53512485958697, -2.69169618940638, 1.19839281085285),
+        (1.0, -1.69065929318241, 0.73248077421585),
+    ),
+    (
+        (1.0, -2.0, 1.0),
+        (1.0, -1.99004745483398, 0.99007225036621),
+    ),
+]
+
+# トゥルーピーク計算の 4 倍オーバーサンプリング（窓付き sinc の多相フィルター）
+OVERSAMPLING = 4
+TAPS_PER_PHASE = 12
+
+
+def is_available():
+    return np is not None
+
+
+def filter_graph():
+    """
+    ffmpeg の -filter_complex に渡すフィルターグラフ
+
+    出力 [analysis] のチャンネルは、前半が元の信号、後半が K 特性を適用した信号。
+    """
+    biquads = ",".join(
+        "biquad=b0={}:b1={}:b2={}:a0={}:a1={}:a2={}".format(*b, *a)
+        for b, a in K_WEIGHTING
+    )
+    return (
+        f"[0:a:0]aresample={SAMPLE_RATE},asplit=2[raw][k];"
+        f"[k]{biquads}[weighted];"
+        "[raw][weighted]amerge=inputs=2[analysis]"
+    )
+
+
+def channel_weights(channels):
+    """BS.1770 のチャンネルの重み（5.1ch は LFE を除き、サラウンドを 1.41 倍）"""
+    if channels == 6:
+        # ffmpeg の 5.1ch の並び: FL FR FC LFE BL BR
+        return np.array([1.0, 1.0, 1.0, 0.0, 1.41, 1.41])
+    return np.ones(channels)
+
+
+def _oversampling_phases():
+    taps = OVERSAMPLING * TAPS_PER_PHASE
+    t = (np.arange(taps) - (taps - 1) / 2) / OVERSAMPLING
+    prototype = np.sinc(t) * np.kaiser(taps, 8.0)
+    prototype *= OVERSAMPLING / prototype.sum()
+    return [prototype[phase::OVERSAMPLING] for phase in range(OVERSAMPLING)]
+
+
+def _db(power, floor=1e-10):
+    """平均二乗値（パワー）を dB にする"""
+    return 10 * math.log10(max(power, floor))
+
+
+class AudioAnalyzer:
+    """
+    PCM のブロックを順に受け取り、ラウドネス・ピーク・RMS・無音区間を求める
+
+    feed() には (フレーム数, チャンネル数 × 2) の float32 配列を渡す
+    （前半が元の信号、後半が K 特性を適用した信号。filter_graph() の出力）。
+    """
+
+    def __init__(self, channels, sample_rate=SAMPLE_RATE):
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.step = round(sample_rate * STEP_SECONDS)
+        self.weights = channel_weights(channels)
+        self.frames = 0
+        self.sample_peak = 0.0
+        self.true_peak = 0.0
+        self._sum_squares = 0.0
+        # 100ms に満たず次のブロックに持ち越すフレーム
+        self._pending = np.empty((0, channels * 2), dtype=np.float32)
+        # 100ms ごとの K 特性適用後の重み付きパワーと、元の信号のパワー
+        self._weighted_powers = []
+        self._powers = []
+        self._phases = _oversampling_phases()
+        # オーバーサンプリングのフィルターがブロックの境界をまたぐための直前のフレーム
+        self._history = np.zeros((TAPS_PER_PHASE - 1, channels), dtype=np.float32)
+
+    def feed(self, samples):
+        if not len(samples):
+            return
+        raw = samples[:, : self.channels]
+        self.frames += len(samples)
+        self._sum_squares += float(np.square(raw, dtype=np.float64).sum())
+        self.sample_peak = max(self.sample_peak, float(np.abs(raw).max()))
+        self._update_true_peak(raw)
+
+        frames = np.concatenate([self._pending, samples])
+        steps = len(frames) // self.step
+        if steps:
+            blocks = frames[: steps * self.step].reshape(steps, self.step, -1)
+            mean_squares = np.square(blocks, dtype=np.float64).mean(axis=1)
+            self._weighted_powers.append(
+                mean_squares[:, self.channels :] @ self.weights
+            )
+            self._powers.append(mean_squares[:, : self.channels].mean(axis=1))
+        self._pending = frames[steps * self.step :].copy()
+
+    def feed_stream(self, stream):
+        """ffmpeg の出力（float32 の PCM）を BLOCK_SECONDS ごとに読み込んで解析する"""
+        frame_bytes = self.channels * 2 * 4
+        block_bytes = self.sample_rate * BLOCK_SECONDS * frame_bytes
+        while data := stream.read(block_bytes):
+            frames = len(data) // frame_bytes
+            samples = np.frombuffer(data, dtype="<f4", count=frames * self.channels * 2)
+            self.feed(samples.reshape(frames, self.channels * 2))
+
+    def _update_true_peak(self, raw):
+        extended = np.concatenate([self._history, raw])
+        for channel in range(self.channels):
+            for phase in self._phases:
+                interpolated = np.convolve(extended[:, channel], phase, mode="valid")
+                self.true_peak = max(self.true_peak, float(np.abs(interpolated).max()))
+        self._history = extended[-(TAPS_PER_PHASE - 1) :].copy()
+
+    def integrated_loudness(self):
+        """
+        統合ラウドネス（LUFS）
+
+        400ms のブロックのうち、-70 LUFS の絶対ゲートと、残ったブロックの平均より
+        10 LU 低い相対ゲートを超えるものの平均。該当するブロックがなければ None。
+        """
+        if not self._weighted_powers:
+            return None
+        powers = np.concatenate(self._weighted_powers)
+        if len(powers) < GATE_STEPS:
+            return None
+        blocks = np.convolve(powers, np.ones(GATE_STEPS) / GATE_STEPS, mode="valid")
+        with np.errstate(divide="ignore"):
+            loudness = -0.691 + 10 * np.log10(blocks)
+        above_absolute = loudness > ABSOLUTE_GATE_LUFS
+        if not above_absolute.any():
+            return None
+        relative_gate = (
+            -0.691 + 10 * math.log10(blocks[above_absolute].mean()) + RELATIVE_GATE_LU
+        )
+        gated = blocks[above_absolute & (loudness > relative_gate)]
+        return -0.691 + 10 * math.log10(gated.mean())
+
+    def envelope(self):
+        """RMS エンベロープ（dBFS のリストと 1 点あたりの秒数）"""
+        powers = self._step_powers()
+        if not len(powers):
+            return [], STEP_SECONDS
+        group = math.ceil(len(powers) / ENVELOPE_POINTS)
+        starts = np.arange(0, len(powers), group)
+        sums = np.add.reduceat(powers, starts)
+        counts = np.diff(np.append(starts, len(powers)))
+        levels = 10 * np.log10(np.maximum(sums / counts, 1e-10))
+        return [round(float(level), 1) for level in levels], group * STEP_SECONDS
+
+    def silences(self, threshold_db, min_seconds):
+        """
+        無音区間（RMS が threshold_db 未満の状態が min_seconds 以上続く区間）
+
+        (開始秒, 終了秒) のリストと、無音の合計秒数を返す。
+        """
+        powers = self._step_powers()
+        if not len(powers):
+            return [], 0.0
+        silent = powers < 10 ** (threshold_db / 10)
+        edges = np.diff(np.concatenate([[0], silent.astype(np.int8), [0]]))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        keep = (ends - starts) * STEP_SECONDS >= min_seconds
+        starts, ends = starts[keep], ends[keep]
+        regions = [
+            (round(int(start) * STEP_SECONDS, 1), round(int(end) * STEP_SECONDS, 1))
+            for start, end in zip(starts[:MAX_SILENCES], ends[:MAX_SILENCES])
+        ]
+        return regions, round(float((ends - starts).sum()) * STEP_SECONDS, 1)
+
+    def _step_powers(self):
+        if not self._powers:
+            return np.empty(0)
+        return np.concatenate(self._powers)
+
+    def result(self, silence_threshold_db, silence_min_seconds):
+        """MediaFile に保存する値"""
+        envelope, envelope_interval = self.envelope()
+        silences, silence_seconds = self.silences(
+            silence_threshold_db, silence_min_seconds
+        )
+        loudness = self.integrated_loudness()
+        peak = max(self.sample_peak, self.true_peak)
+        rms = self._sum_squares / (self.frames * self.channels) if self.frames else 0
+        return {
+            "loudness_lufs": None if loudness is None else round(loudness, 1),
+            "true_peak_dbtp": round(_db(peak * peak), 1),
+            "rms_dbfs": round(_db(rms), 1),
+            "audio_analysis": {
+                "duration": round(self.frames / self.sample_rate, 1),
+                "channels": self.channels,
+                "sample_peak_dbfs": round(_db(self.sample_peak**2), 1),
+                "envelope": envelope,
+                "envelope_interval": envelope_interval,
+                "silences": silences,
+                "silence_seconds": silence_seconds,
+            },
+        }
@@ -0,0 +1,352 @@
+"""
+JSON API（/api/v1/）
+
+画面と同じセッション認証を使い、プロジェクトとメディアファイルを JSON で返す。
+
+- 一覧はキーセット方式（作成日時の降順 + ID）でページングし、``cursor`` で続きを取得する
+- ``fields=id,title`` で返すフィールドを絞り込める（DB から読む列も絞られる）
+- 一覧の ETag は ``updated_at`` の最大値と件数から作る弱い ETag で、
+  変更がなければ ``If-None-Match`` に対して 304 を返す
+- 一覧の本文は非同期イテレータで少しずつ書き出し、ページ全体をメモリに載せない
+"""
+
+import base64
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, IntegerField, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.views import View
+
+from .cache import weak_etag
+from .models import MediaFile, Project
+from .views import MediaUploadCompleteView, MediaUploadSessionView
+
+# 1 ページあたりの件数の既定値と上限
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# 一覧を書き出すときに 1 回のクエリで読む件数
+STREAM_CHUNK_SIZE = 100
+
+
+class ApiError(Exception):
+    """クライアントに JSON で返すエラー"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _seconds(value):
+    return value.total_seconds() if value is not None else None
+
+
+class Field:
+    """API で返すフィールド（DB から読む列と、値の変換方法）"""
+
+    def __init__(self, *columns, convert=None):
+        self.columns = columns
+        self.convert = convert
+
+    def render(self, row):
+        if self.convert is None:
+            return row[self.columns[0]]
+        return self.convert(*(row[column] for column in self.columns))
+
+
+PROJECT_FIELDS = {
+    "id": Field("id"),
+    "name": Field("name"),
+    "description": Field("description"),
+    "created_at": Field("created_at", convert=_isoformat),
+    "updated_at": Field("updated_at", convert=_isoformat),
+    "media_count": Field("media_count"),
+}
+
+MEDIA_FIELDS = {
+    "id": Field("id"),
+    "project": Field("project_id"),
+    "title": Field("title"),
+    "description": Field("description"),
+    "file_type": Field("file_type"),
+    "mime_type": Field("mime_type"),
+    "file_size": Field("file_size"),
+    "duration": Field("duration", convert=_seconds),
+    "loudness_lufs": Field("loudness_lufs"),
+    "true_peak_dbtp": Field("true_peak_dbtp"),
+    "rms_dbfs": Field("rms_dbfs"),
+    "url": Field("file", convert=lambda name: f"{settings.MEDIA_URL}{name}"),
+    "processing_status": Field("processing_status"),
+    "storage_tier": Field("storage_tier"),
+    "version": Field("current_version__number"),
+    "created_at": Field("created_at", convert=_isoformat),
+    "updated_at": Field("updated_at", convert=_isoformat),
+}
+
+# 一覧で fields を指定しない場合に返すフィールド
+DEFAULT_MEDIA_LIST_FIELDS = (
+    "id",
+    "title",
+    "file_type",
+    "mime_type",
+    "file_size",
+    "duration",
+    "url",
+    "processing_status",
+    "created_at",
+    "updated_at",
+)
+
+
+def parse_fields(request, available, default=None):
+    """fields パラメータを検証し、返すフィールド名のタプルを返す"""
+    value = request.GET.get("fields")
+    if not value:
+        return tuple(default or available)
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name))
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(f"不明なフィールドです: {', '.join(unknown)}")
+    return names
+
+
+def _columns(names, available):
+    columns = {"id", "created_at"}  # キーセットページングに必要
+    for name in names:
+        columns.update(available[name].columns)
+    return sorted(columns)
+
+
+def _render(row, names, available):
+    return {name: available[name].render(row) for name in names}
+
+
+def parse_page_size(request):
+    try:
+        size = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ApiError("limit が不正です。")
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(created_at, pk):
+    raw = json.dumps([created_at.isoformat(), pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    """cursor を (作成日時, ID) に戻す"""
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        created_at, pk = json.loads(raw)
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError
+        return created_at, int(pk)
+    except (ValueError, TypeError):
+        raise ApiError("cursor が不正です。")
+
+
+def after_cursor(queryset, cursor):
+    """(作成日時, ID) の降順で cursor より後ろの行に絞り込む"""
+    if cursor is None:
+        return queryset
+    created_at, pk = cursor
+    return queryset.filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+    )
+
+
+def collection_etag(request, *querysets):
+    """
+    一覧の弱い ETag を作る
+
+    ``updated_at`` の最大値と件数が同じなら内容も同じとみなす（ソフトデリートや
+    復元でも ``updated_at`` が更新される）。ページや fields ごとに本文が変わるので、
+    クエリ文字列も含める。
+    """
+    parts = []
+    for queryset in querysets:
+        state = queryset.aggregate(last=Max("updated_at"), count=Count("pk"))
+        parts += [_isoformat(state["last"]) or "", state["count"]]
+    return weak_etag(*parts, request.GET.urlencode())
+
+
+class ApiView(View):
+    """JSON API の基底ビュー（未ログインはリダイレクトせず 401 を返す）"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "ログインが必要です。"}, status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as exc:
+            return JsonResponse({"error": exc.message}, status=exc.status)
+        except Http404:
+            return JsonResponse({"error": "見つかりません。"}, status=404)
+
+
+class CollectionView(ApiView):
+    """キーセットページングする一覧の基底ビュー"""
+
+    fields = None
+    default_fields = None
+
+    def get_queryset(self, names):
+        raise NotImplementedError
+
+    def get_etag(self, names):
+        return collection_etag(self.request, self.get_queryset(names))
+
+    def get(self, request, *args, **kwargs):
+        names = parse_fields(request, self.fields, self.default_fields)
+        size = parse_page_size(request)
+        cursor = request.GET.get("cursor")
+        cursor = decode_cursor(cursor) if cursor else None
+
+        etag = self.get_etag(names)
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+
+        queryset = (
+            self.get_queryset(names)
+            .values(*_columns(names, self.fields))
+            .order_by("-created_at", "-pk")
+        )
+        response = StreamingHttpResponse(
+            self.stream(after_cursor(queryset, cursor), names, size),
+            content_type="application/json",
+        )
+        response["ETag"] = etag
+        return response
+
+    async def stream(self, queryset, names, size):
+        """
+        ``{"results": [...], "next": ...}`` を少しずつ書き出す
+
+        ASGI に同期イテレータを渡すと本文全体がリストにまとめられてしまうため、
+        チャンクごとの DB 読み込みを sync_to_async で行う非同期イテレータにする。
+        """
+        yield b'{"results":['
+        last = None
+        sent = 0
+        while sent < size:
+            chunk_size = min(STREAM_CHUNK_SIZE, size - sent)
+            # 1 件多く読み、続きがあるかを判定する
+            rows = await sync_to_async(list)(
+                after_cursor(queryset, last)[: chunk_size + 1]
+            )
+            more = len(rows) > chunk_size
+            rows = rows[:chunk_size]
+            if rows:
+                body = ",".join(
+                    json.dumps(_render(row, names, self.fields), cls=DjangoJSONEncoder)
+                    for row in rows
+                )
+                yield (b"," if sent else b"") + body.encode()
+                sent += len(rows)
+                last = (rows[-1]["created_at"], rows[-1]["id"])
+            if not more:
+                last = None
+                break
+        next_cursor = encode_cursor(*last) if last else None
+        yield ('],"next":%s}' % json.dumps(next_cursor)).encode()
+
+
+class ProjectListApiView(CollectionView):
+    """GET /api/v1/projects/"""
+
+    fields = PROJECT_FIELDS
+
+    def get_queryset(self, names):
+        queryset = Project.objects.filter(owner=self.request.user)
+        if "media_count" in names:
+            queryset = queryset.annotate(
+                media_count=Coalesce(
+                    Subquery(
+                        MediaFile.objects.filter(
+                            user=self.request.user, project=OuterRef("pk")
+                        )
+                        .order_by()
+                        .values("project")
+                        .annotate(value=Count("pk"))
+                        .values("value"),
+                        output_field=IntegerField(),
+                    ),
+                    0,
+                )
+            )
+        return queryset
+
+    def get_etag(self, names):
+        querysets = [Project.objects.filter(owner=self.request.user)]
+        if "media_count" in names:
+            # ファイルの追加や削除ではプロジェクトの updated_at は変わらない
+            querysets.append(MediaFile.objects.filter(user=self.request.user))
+        return collection_etag(self.request, *querysets)
+
+
+class ProjectMediaListApiView(CollectionView):
+    """GET /api/v1/projects/<project_id>/media/"""
+
+    fields = MEDIA_FIELDS
+    default_fields = DEFAULT_MEDIA_LIST_FIELDS
+
+    def get_queryset(self, names):
+        project = get_object_or_404(
+            Project.objects.only("pk"),
+            pk=self.kwargs["project_id"],
+            owner=self.request.user,
+        )
+        return MediaFile.objects.filter(project=project)
+
+
+class MediaDetailApiView(ApiView):
+    """GET / DELETE /api/v1/media/<pk>/"""
+
+    def get(self, request, pk):
+        names = parse_fields(request, MEDIA_FIELDS)
+        row = get_object_or_404(
+            MediaFile.objects.filter(user=request.user).values(
+                *_columns(names + ("updated_at",), MEDIA_FIELDS)
+            ),
+            pk=pk,
+        )
+        etag = weak_etag(
+            row["id"], row["updated_at"].isoformat(), request.GET.urlencode()
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse(_render(row, names, MEDIA_FIELDS))
+            response["ETag"] = etag
+        return response
+
+    def delete(self, request, pk):
+        media_file = get_object_or_404(
+            MediaFile.objects.filter(user=request.user), pk=pk
+        )
+        # 画面からの削除と同じくゴミ箱に移動する
+        media_file.soft_delete()
+        return HttpResponse(status=204)
+
+
+class UploadSessionApiView(ApiView, MediaUploadSessionView):
+    """POST /api/v1/projects/<project_id>/uploads/（直接アップロードの開始）"""
+
+    complete_url_name = "api:upload_complete"
+
+
+class UploadCompleteApiView(ApiView, MediaUploadCompleteView):
+    """POST /api/v1/projects/<project_id>/uploads/complete/"""
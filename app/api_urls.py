@@ -0,0 +1,25 @@
+from django.urls import path
+
+from . import api
+
+app_name = "api"
+
+urlpatterns = [
+    path("projects/", api.ProjectListApiView.as_view(), name="project_list"),
+    path(
+        "projects/<int:project_id>/media/",
+        api.ProjectMediaListApiView.as_view(),
+        name="project_media_list",
+    ),
+    path(
+        "projects/<int:project_id>/uploads/",
+        api.UploadSessionApiView.as_view(),
+        name="upload_session",
+    ),
+    path(
+        "projects/<int:project_id>/uploads/complete/",
+        api.UploadCompleteApiView.as_view(),
+        name="upload_complete",
+    ),
+    path("media/<int:pk>/", api.MediaDetailApiView.as_view(), name="media_detail"),
+]
@@ -0,0 +1,49 @@
+"""
+認証バックエンド
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+
+from .hashers import PasswordHashingBusy, run_hashing
+
+UserModel = get_user_model()
+
+
+class BoundedHashingModelBackend(ModelBackend):
+    """
+    パスワードの検証を上限付きスレッドプールで行う認証バックエンド
+
+    推奨ハッシャーが変わった場合や work factor が上がった場合は、
+    ログイン成功時にパスワードを再ハッシュして保存する。
+    ハッシュ計算が混雑している場合は、誤ったパスワードとして扱わず
+    PasswordHashingBusy をそのまま送出する（ログインビューが 503 を返す）。
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # 存在しないユーザーでも同程度の時間をかけ、ユーザーの存在を推測させない
+            # （混雑時も存在するユーザーと同じく PasswordHashingBusy を送出する）
+            run_hashing(make_password, password)
+            return None
+
+        is_correct, must_update = run_hashing(verify_password, password, user.password)
+        if is_correct and must_update:
+            try:
+                user.password = run_hashing(make_password, password)
+            except PasswordHashingBusy:
+                # 再ハッシュは次回のログインで行う
+                pass
+            else:
+                user.save(update_fields=["password"])
+
+        if is_correct and self.user_can_authenticate(user):
+            return user
+        return None
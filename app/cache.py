@@ -0,0 +1,70 @@
+"""
+テンプレートフラグメントキャッシュと HTTP キャッシュ（ETag）用のユーティリティ
+"""
+
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+
+MEDIA_LIST_VERSION_KEY = "media_list_version:{project_id}"
+
+
+def get_media_list_version(project_id):
+    """
+    プロジェクトのメディア一覧キャッシュのバージョンを返す
+
+    バージョンはページ単位のフラグメントキャッシュのキーに含め、
+    メディアファイルの追加・変更・削除時に更新することで無効化する。
+    """
+    key = MEDIA_LIST_VERSION_KEY.format(project_id=project_id)
+    version = cache.get(key)
+    if version is None:
+        # キーが追い出された場合も古いフラグメントと衝突しないよう時刻を使う
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+    return version
+
+
+def bump_media_list_version(project_id):
+    """プロジェクトのメディア一覧キャッシュを無効化する"""
+    key = MEDIA_LIST_VERSION_KEY.format(project_id=project_id)
+    cache.set(key, time.time_ns(), timeout=None)
+
+
+def weak_etag(*parts):
+    return 'W/"%s"' % hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()
+
+
+@functools.cache
+def release_id():
+    """RELEASE_ID、未設定なら静的ファイルのマニフェストのハッシュ"""
+    if settings.RELEASE_ID:
+        return settings.RELEASE_ID
+    read_manifest = getattr(staticfiles_storage, "read_manifest", None)
+    manifest = read_manifest() if read_manifest else None
+    return hashlib.sha1(manifest.encode()).hexdigest() if manifest else ""
+
+
+def page_etag(request, *parts):
+    """
+    ログインユーザー専用ページの ETag（使えない場合は None）
+
+    parts にはページの内容を決める値を渡す。ページの共通部分（ユーザー名や
+    フォームの CSRF トークン、テンプレート）が変わった場合も一致しないよう、
+    ユーザー・CSRF Cookie・リリースも含める。
+    表示待ちのメッセージがある場合は毎回描画する必要があるため None を返す。
+    開発中はテンプレートの変更がすぐ反映されるよう使わない。
+    """
+    if settings.DEBUG or len(get_messages(request)):
+        return None
+    return weak_etag(
+        release_id(),
+        request.user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+        *parts,
+    )
@@ -0,0 +1,114 @@
+"""
+動的レスポンスの圧縮（Brotli / gzip）
+
+Accept-Encoding から方式を選び、Brotli は brotli パッケージがある場合のみ使う。
+ストリーミングレスポンスはチャンクごとにフラッシュするため、圧縮器の内部に
+データが溜まって送信が遅れることはない。
+"""
+
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # brotli は任意依存
+    brotli = None
+
+
+def parse_accept_encoding(header):
+    """Accept-Encoding を {方式: q 値} にする"""
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def available_encodings():
+    """サーバーが対応する方式（優先順）"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(header):
+    """
+    クライアントが受け付ける方式のうち q 値が最も高いものを返す（同じ場合はサーバーの優先順）
+
+    受け付ける方式がなければ None。
+    """
+    accepted = parse_accept_encoding(header or "")
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type):
+    """圧縮済みの形式（画像・音声・動画・アーカイブなど）でなければ True"""
+    media_type = content_type.split(";")[0].strip().lower()
+    return not any(
+        media_type.startswith(excluded)
+        for excluded in settings.COMPRESSION_EXCLUDED_TYPES
+    )
+
+
+class Compressor:
+    """Brotli と gzip を同じ操作で扱う"""
+
+    def __init__(self, encoding):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(
+                quality=settings.COMPRESSION_BROTLI_QUALITY
+            )
+            self._process = self._compressor.process
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            # wbits に 16 を足すと gzip 形式のヘッダーとトレーラーが付く
+            self._compressor = zlib.compressobj(
+                settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16
+            )
+            self._process = self._compressor.compress
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+
+    def compress(self, data, flush=False):
+        """data を圧縮する（flush=True ならここまでの入力に対応する出力をすべて返す）"""
+        output = self._process(data)
+        return output + self._flush() if flush else output
+
+    def finish(self):
+        return self._finish()
+
+
+def compress_bytes(data, encoding):
+    compressor = Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_chunks(chunks, encoding):
+    compressor = Compressor(encoding)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk, flush=True)
+    yield compressor.finish()
+
+
+async def acompress_chunks(chunks, encoding):
+    compressor = Compressor(encoding)
+    async for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk, flush=True)
+    yield compressor.finish()
@@ -0,0 +1,103 @@
+"""
+DB を使うリクエストの同時実行数の制限
+
+uvicorn の limit_concurrency（gunicorn の worker_connections）は接続の数を数えるため、
+SSE の長時間の接続や受信中の遅いアップロードも枠を消費する。ConcurrencyLimiter は
+リクエストボディを受信し終えてから（Django がビューを呼ぶ直前に）枠を取り、
+レスポンスを送り終えたときに返すことで、DB の接続を使いうる区間だけを数える。
+
+- WebSocket はこのミドルウェアを通らない
+- SSE（text/event-stream）はビューが DB の接続を閉じてからストリームを返すため、
+  レスポンスの開始時に枠を返す
+- 枠が空くのを DB_CONCURRENCY_TIMEOUT 秒待っても空かない場合は 503 を返す
+"""
+
+import asyncio
+
+from django.conf import settings
+
+
+class ConcurrencyLimiter:
+    """ASGI アプリケーションを包み、ボディ受信後の処理の同時実行数を制限する"""
+
+    def __init__(self, app, limit, timeout):
+        self.app = app
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        held = False
+        rejected = False
+        started = False
+
+        def release():
+            nonlocal held
+            if held:
+                held = False
+                self.semaphore.release()
+
+        async def gated_receive():
+            nonlocal held, rejected
+            message = await receive()
+            if (
+                message["type"] == "http.request"
+                and not message.get("more_body")
+                and not held
+                and not rejected
+            ):
+                try:
+                    await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+                except asyncio.TimeoutError:
+                    # アプリケーションには切断として伝え、応答はこのミドルウェアが返す
+                    rejected = True
+                    return {"type": "http.disconnect"}
+                held = True
+            return message
+
+        async def gated_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                if _header(message, b"content-type").startswith(b"text/event-stream"):
+                    release()
+            await send(message)
+
+        try:
+            await self.app(scope, gated_receive, gated_send)
+        finally:
+            release()
+        if rejected and not started:
+            await _send_unavailable(send)
+
+
+def wrap(app):
+    """DB_CONCURRENCY_LIMIT が設定されていれば ConcurrencyLimiter で包む"""
+    if settings.DB_CONCURRENCY_LIMIT <= 0:
+        return app
+    return ConcurrencyLimiter(
+        app, settings.DB_CONCURRENCY_LIMIT, settings.DB_CONCURRENCY_TIMEOUT
+    )
+
+
+def _header(message, name):
+    for key, value in message.get("headers", []):
+        if key.lower() == name:
+            return value
+    return b""
+
+
+async def _send_unavailable(send):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-length", b"0"),
+                (b"retry-after", str(settings.RATELIMIT_RETRY_AFTER).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,264 @@
+"""
+メディアファイルの進捗イベント
+
+アップロード後の処理ステージの進捗を publish し、SSE（/events/...）または
+WebSocket（/ws/...）で購読する。アップロード中の送信の進捗はブラウザが
+XMLHttpRequest の upload.onprogress で表示する（ASGI ではリクエストボディを
+受信し終えてからビューが呼ばれ、Nginx もボディをバッファリングするため、
+サーバー側では受信中の進捗を得られない）。
+
+EVENTS_BACKEND が postgres の場合は LISTEN/NOTIFY を使い、別のワーカープロセスや
+processor サービスが publish したイベントも届く。memory の場合は同じプロセス内だけで
+配信する（開発用）。
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections
+
+from .models import MediaFile
+
+logger = logging.getLogger(__name__)
+
+# LISTEN/NOTIFY のチャンネル名（購読側でイベントのチャンネルごとに振り分ける）
+NOTIFY_CHANNEL = "media_events"
+# NOTIFY のペイロードの上限（8000 バイト）より少し小さくする
+MAX_PAYLOAD_BYTES = 7900
+
+
+def media_channel(media_file_id):
+    return f"media:{media_file_id}"
+
+
+class Subscription:
+    """1 つの接続が受け取るイベントのキュー"""
+
+    def __init__(self, channel, loop, maxsize=100):
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, event):
+        # publish は別スレッドから呼ばれるため、イベントループ上でキューに入れる
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # 購読していた接続のイベントループが既に終了している
+            pass
+
+    def _put(self, event):
+        if self.queue.full():
+            # 読み出しが追いつかない場合は古いイベントを捨てる（進捗は最新の値があればよい）
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """次のイベントを返す（timeout 秒以内に届かなければ None）"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class MemoryBroker:
+    """同じプロセス内の購読者にだけ配信するブローカー"""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        self.dispatch(channel, event)
+
+    def dispatch(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def subscribe(self, channel):
+        """購読を開始する（イベントループ上で呼ぶ）"""
+        subscription = Subscription(channel, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+
+class PostgresBroker(MemoryBroker):
+    """
+    Postgres の LISTEN/NOTIFY で配信するブローカー
+
+    プロセスごとに 1 本の LISTEN 用接続をスレッドで待ち受け、届いたイベントを
+    そのプロセスの購読者に振り分ける。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, channel, event):
+        payload = json.dumps(
+            {"channel": channel, "event": event}, cls=DjangoJSONEncoder
+        )
+        if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+            logger.warning("イベントが大きすぎるため送信しません: %s", channel)
+            return
+        # トランザクション内で呼ばれた場合、イベントはコミット時に送られる
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, payload])
+
+    def subscribe(self, channel):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="media-events-listener", daemon=True
+                )
+                self._listener.start()
+        return super().subscribe(channel)
+
+    def _listen(self):
+        while True:
+            wrapper = connections.create_connection("default")
+            try:
+                wrapper.ensure_connection()
+                conn = wrapper.connection
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            data = json.loads(notify.payload)
+                            self.dispatch(data["channel"], data["event"])
+                        except (ValueError, KeyError, TypeError):
+                            logger.warning("不正なイベントを無視しました")
+            except Exception:
+                logger.exception("イベントの待ち受けに失敗しました。再接続します")
+                time.sleep(1)
+            finally:
+                wrapper.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """設定に応じたブローカー（プロセスごとに 1 つ）を返す"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            backend = settings.EVENTS_BACKEND
+            if backend == "auto":
+                backend = "postgres" if connection.vendor == "postgresql" else "memory"
+            _broker = PostgresBroker() if backend == "postgres" else MemoryBroker()
+        return _broker
+
+
+def publish(channel, event):
+    """
+    イベントを送信する
+
+    進捗の通知に失敗しても、アップロードや処理そのものは止めない。
+    """
+    try:
+        get_broker().publish(channel, event)
+    except Exception:
+        logger.exception("イベントを送信できません: %s", channel)
+
+
+async def iter_events(channel):
+    """
+    チャンネルのイベントを順に返す非同期イテレータ
+
+    EVENTS_HEARTBEAT_SECONDS の間イベントがなければ None を返す（接続維持用）。
+    EVENTS_STREAM_TIMEOUT 秒で終了し、クライアントには再接続させる。
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(channel)
+    deadline = time.monotonic() + settings.EVENTS_STREAM_TIMEOUT
+    try:
+        while time.monotonic() < deadline:
+            yield await subscription.get(settings.EVENTS_HEARTBEAT_SECONDS)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def resolve_channel(user, kind, key):
+    """
+    購読するチャンネル名と最初に送るイベントを返す
+
+    ユーザーが購読できないチャンネルの場合は (None, None) を返す。
+    """
+    if not user.is_authenticated:
+        return None, None
+    if kind == "media":
+        state = (
+            await MediaFile.objects.filter(pk=key, user=user)
+            .values("processing_status", "processing_error")
+            .afirst()
+        )
+        if state is None:
+            return None, None
+        return media_channel(key), status_event(
+            state["processing_status"], state["processing_error"]
+        )
+    return None, None
+
+
+def close_connection():
+    """
+    DB の接続を閉じる（sync_to_async で ORM と同じスレッドから呼ぶ）
+
+    connection は参照したスレッドの接続を指すため、sync_to_async(connection.close) では
+    イベントループのスレッドの接続を閉じようとして失敗する。
+    """
+    connection.close()
+
+
+def format_sse(event):
+    data = json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+async def sse_stream(channel, initial=None):
+    """SSE の本文（イベントがない間はコメント行を送って接続を維持する）"""
+    yield f"retry: {settings.EVENTS_RETRY_MILLISECONDS}\n\n"
+    if initial is not None:
+        yield format_sse(initial)
+    async for event in iter_events(channel):
+        yield ": keepalive\n\n" if event is None else format_sse(event)
+
+
+def status_event(status, error=""):
+    return {"type": "status", "status": status, "error": error}
+
+
+def publish_stage(media_file_id, name, state):
+    publish(
+        media_channel(media_file_id), {"type": "stage", "stage": name, "state": state}
+    )
+
+
+def publish_status(media_file_id, status, error=""):
+    publish(media_channel(media_file_id), status_event(status, error))
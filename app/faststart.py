@@ -0,0 +1,153 @@
+"""
+MP4 / QuickTime ファイルの moov アトムをメディアデータ（mdat）の前へ移動する（faststart）
+
+再エンコードはせず、トップレベルのアトムの並べ替えとチャンクオフセット（stco / co64）の
+書き換えのみを行う。moov 以外はストリーミングでコピーするため、ファイルサイズによらず
+使用メモリは moov アトムの大きさ程度に収まる。
+"""
+
+import io
+import os
+import shutil
+import struct
+import tempfile
+
+# faststart の対象とする Content-Type
+FASTSTART_TYPES = {
+    "video/mp4",
+    "video/quicktime",
+    "video/3gpp",
+    "audio/mp4",
+    "audio/3gpp",
+}
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# stco / co64 を含みうるコンテナアトム
+_CONTAINER_ATOMS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+class FaststartError(Exception):
+    """ファイルの構造が想定外で faststart に変換できない"""
+
+
+def iter_atoms(f, start, end):
+    """[start, end) にあるアトムを (種類, 開始位置, サイズ, ヘッダー長) で返す"""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:
+            extended = f.read(8)
+            if len(extended) < 8:
+                raise FaststartError("アトムのサイズを読み取れません。")
+            (size,) = struct.unpack(">Q", extended)
+            header_size = 16
+        elif size == 0:
+            # サイズ 0 はファイル末尾までを表す
+            size = end - offset
+        if size < header_size or offset + size > end:
+            raise FaststartError(f"不正なアトムです: {kind!r} (offset={offset})")
+        yield kind, offset, size, header_size
+        offset += size
+
+
+def _layout(f):
+    """最初の mdat と moov の (開始位置, サイズ) を返す（見つからない場合は None）"""
+    end = os.fstat(f.fileno()).st_size
+    mdat = moov = None
+    for kind, offset, size, _ in iter_atoms(f, 0, end):
+        if kind == b"mdat" and mdat is None:
+            mdat = (offset, size)
+        elif kind == b"moov":
+            if moov is not None:
+                raise FaststartError("moov アトムが複数あります。")
+            moov = (offset, size)
+    return mdat, moov, end
+
+
+def needs_faststart(path):
+    """moov アトムが mdat より後ろにあるかどうか"""
+    with open(path, "rb") as f:
+        mdat, moov, _ = _layout(f)
+    return mdat is not None and moov is not None and moov[0] > mdat[0]
+
+
+def _patch_chunk_offsets(data, start, end, adjust):
+    """moov の中の stco / co64 のチャンクオフセットを adjust で書き換える"""
+    reader = io.BytesIO(data)
+    for kind, offset, size, header_size in iter_atoms(reader, start, end):
+        body = offset + header_size
+        if kind in _CONTAINER_ATOMS:
+            _patch_chunk_offsets(data, body, offset + size, adjust)
+        elif kind in (b"stco", b"co64"):
+            # version / flags（4バイト）とエントリー数（4バイト）の後にオフセットが並ぶ
+            (count,) = struct.unpack_from(">I", data, body + 4)
+            entry_format, entry_size = (">I", 4) if kind == b"stco" else (">Q", 8)
+            if body + 8 + count * entry_size > offset + size:
+                raise FaststartError(f"{kind.decode()} のエントリー数が不正です。")
+            for i in range(count):
+                position = body + 8 + i * entry_size
+                (value,) = struct.unpack_from(entry_format, data, position)
+                value = adjust(value)
+                if kind == b"stco" and value > 0xFFFFFFFF:
+                    raise FaststartError("co64 への変換が必要なため対応していません。")
+                struct.pack_into(entry_format, data, position, value)
+
+
+def _copy_range(src, dst, start, end):
+    src.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = src.read(min(COPY_BUFFER_SIZE, remaining))
+        if not chunk:
+            raise FaststartError("ファイルが途中で終わっています。")
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+
+def relocate_moov(path):
+    """
+    moov アトムを最初の mdat の前へ移動し、変換した場合は True を返す
+
+    既に faststart 形式のファイルや moov / mdat のないファイルは変更しない。
+    同じディレクトリの一時ファイルに書き出してから置き換えるため、
+    途中で失敗しても元のファイルは壊れない。
+    """
+    with open(path, "rb") as src:
+        mdat, moov, file_size = _layout(src)
+        if mdat is None or moov is None or moov[0] < mdat[0]:
+            return False
+
+        mdat_start = mdat[0]
+        moov_start, moov_size = moov
+        src.seek(moov_start)
+        data = bytearray(src.read(moov_size))
+
+        # mdat の先頭から元の moov の位置までは moov の大きさだけ後ろへずれる
+        def adjust(value):
+            if mdat_start <= value < moov_start:
+                return value + moov_size
+            return value
+
+        _patch_chunk_offsets(data, 0, len(data), adjust)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".faststart-")
+        try:
+            with os.fdopen(fd, "wb") as dst:
+                _copy_range(src, dst, 0, mdat_start)
+                dst.write(data)
+                _copy_range(src, dst, mdat_start, moov_start)
+                _copy_range(src, dst, moov_start + moov_size, file_size)
+                dst.flush()
+                os.fsync(dst.fileno())
+            shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    return True
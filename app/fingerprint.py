@@ -0,0 +1,240 @@
+"""
+音声の指紋による重複・類似ファイルの検出
+
+形式やビットレートが違うだけの同じ録音は内容のハッシュでは見つけられないため、
+音声の指紋を比べる。
+
+- 指紋: 5512Hz・モノラルにダウンサンプリングした音声を NumPy の FFT で周波数帯ごとの
+  エネルギーにし、隣り合う帯と前のフレームとの差の符号を 32 ビットにまとめる
+  （Haitsma-Kalker 方式）。フレームごとの 32 ビットを連結したものを保存する
+- 検索: 先頭 KEY_FRAMES フレームの指紋を KEY_STRIDE フレームごとに間引いてキーとして
+  インデックス付きの列に保存する。同じ録音なら、ビット誤りのないフレームがいくつかは
+  残るため、調べるファイルの全フレームの指紋と、差が小さく反転しやすいビットを
+  FLIP_BITS 個まで反転したものをキーと完全一致で検索し、一致したキーの多いファイルから
+  順に指紋のビット誤り率で確かめる
+
+NumPy が必要（任意依存）。
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import MediaFile, MediaFingerprint, MediaFingerprintKey
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:  # numpy は任意依存
+    np = None
+
+# 指紋の形式のバージョン（計算方法を変えた場合は上げ、古い指紋とは比べない）
+VERSION = 2
+SAMPLE_RATE = 5512
+FRAME_SIZE = 2048
+# フレームの間隔（約 46ms）
+HOP_SIZE = 256
+# 300Hz〜2000Hz を対数で等間隔の 33 帯に分ける（隣り合う帯の差で 32 ビット）
+BAND_COUNT = 33
+MIN_FREQUENCY = 300
+MAX_FREQUENCY = 2000
+# ffmpeg から一度に読み込む長さ（秒）
+BLOCK_SECONDS = 30
+# 比較に必要な重なりの最小フレーム数（約 5 秒）
+MIN_OVERLAP_FRAMES = 108
+# 比較するときにずらすフレーム数の上限（約 2 秒。先頭の無音の長さの違いを吸収する）
+MAX_SHIFT_FRAMES = 43
+# 検索キーにする先頭のフレーム数（約 60 秒）と間引く間隔
+KEY_FRAMES = 1296
+KEY_STRIDE = 2
+# 検索するときに反転を試す、フレームごとの信頼性の低いビットの数（2^FLIP_BITS 通り）
+FLIP_BITS = 3
+# 一度の問い合わせで検索するキーの数
+QUERY_BATCH_SIZE = 1000
+# 帯のエネルギーの大小が揃っているだけの、どの音にも現れやすい指紋はキーにしない
+UNINFORMATIVE_CODES = (0, 0xFFFFFFFF)
+# キーが一致した候補のうち、一致の多い順に指紋を比べる件数の上限
+MAX_CANDIDATES = 50
+
+
+def is_available():
+    return np is not None
+
+
+def ffmpeg_args(source):
+    """指紋の計算に使う PCM を出力する ffmpeg の引数（先頭 MEDIA_FINGERPRINT_MAX_SECONDS 秒）"""
+    return [
+        "-i",
+        source,
+        "-map",
+        "0:a:0",
+        "-ac",
+        "1",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-t",
+        str(settings.MEDIA_FINGERPRINT_MAX_SECONDS),
+    ]
+
+
+def _band_edges():
+    frequencies = MIN_FREQUENCY * (MAX_FREQUENCY / MIN_FREQUENCY) ** (
+        np.arange(BAND_COUNT + 1) / BAND_COUNT
+    )
+    return np.round(frequencies * FRAME_SIZE / SAMPLE_RATE).astype(int)
+
+
+class FingerprintBuilder:
+    """モノラルの PCM を順に受け取り、フレームごとの指紋を作る"""
+
+    def __init__(self):
+        self.window = np.hanning(FRAME_SIZE)
+        self.edges = _band_edges()
+        self.frames = 0
+        # 次のフレームに使うサンプル（フレームの重なりの分）
+        self._pending = np.empty(0, dtype=np.float32)
+        self._previous_diff = None
+        self._chunks = []
+        # 検索に使う先頭のフレームの、差の絶対値が小さい（反転しやすい）ビットの位置
+        self._weak_bits = []
+
+    def feed_stream(self, stream):
+        """ffmpeg の出力（float32 の PCM）を BLOCK_SECONDS ごとに読み込む"""
+        block_bytes = SAMPLE_RATE * BLOCK_SECONDS * 4
+        while data := stream.read(block_bytes):
+            self.feed(np.frombuffer(data, dtype="<f4", count=len(data) // 4))
+
+    def feed(self, samples):
+        samples = np.concatenate([self._pending, samples])
+        count = (len(samples) - FRAME_SIZE) // HOP_SIZE + 1
+        if count <= 0:
+            self._pending = samples
+            return
+        frames = sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE][:count]
+        spectrum = np.square(np.abs(np.fft.rfft(frames * self.window, axis=1)))
+        energies = np.add.reduceat(
+            spectrum[:, : self.edges[-1]], self.edges[:-1], axis=1
+        )
+        self._add_energies(energies)
+        self._pending = samples[count * HOP_SIZE :].copy()
+
+    def _add_energies(self, energies):
+        # 隣り合う帯の差と、その前のフレームとの差の符号が指紋のビット
+        diff = energies[:, :-1] - energies[:, 1:]
+        if self._previous_diff is not None:
+            diff = np.concatenate([self._previous_diff, diff])
+        self._previous_diff = diff[-1:]
+        delta = np.diff(diff, axis=0)
+        bits = delta > 0
+        remaining = KEY_FRAMES + MAX_SHIFT_FRAMES - self.frames
+        if remaining > 0:
+            self._weak_bits.append(
+                np.argsort(np.abs(delta[:remaining]), axis=1)[:, :FLIP_BITS]
+            )
+        self._chunks.append(
+            np.packbits(bits, axis=1, bitorder="little").view("<u4").ravel()
+        )
+        self.frames += len(energies)
+
+    def codes(self):
+        """フレームごとの 32 ビットの指紋"""
+        if not self._chunks:
+            return np.empty(0, dtype="<u4")
+        return np.concatenate(self._chunks)
+
+    def query_codes(self):
+        """
+        検索に使う指紋（先頭のすべてのフレームと、信頼性の低いビットを反転したもの）
+
+        保存側は間引いているため、どのフレームの位置から始まっていても一致するよう
+        こちらは間引かない。比べるときにずらす分だけ範囲を広げる。
+        """
+        if not self._weak_bits:
+            return []
+        weak = np.concatenate(self._weak_bits).astype("<u4")
+        codes = self.codes()[: len(weak)]
+        variants = [codes]
+        for subset in range(1, 1 << FLIP_BITS):
+            mask = np.zeros(len(codes), dtype="<u4")
+            for i in range(FLIP_BITS):
+                if subset >> i & 1:
+                    mask |= np.left_shift(np.uint32(1), weak[:, i])
+            variants.append(codes ^ mask)
+        return _distinct_codes(np.concatenate(variants))
+
+    def is_informative(self):
+        """無音などビットに偏りがあり、どのファイルとも一致してしまう指紋でなければ True"""
+        codes = self.codes()
+        if len(codes) < MIN_OVERLAP_FRAMES:
+            return False
+        ones = np.unpackbits(codes.view(np.uint8)).mean()
+        return 0.1 < ones < 0.9
+
+
+def _distinct_codes(codes):
+    codes = np.unique(codes)
+    return [int(code) for code in codes if int(code) not in UNINFORMATIVE_CODES]
+
+
+def index_codes(data):
+    """保存する検索キー（保存した指紋の先頭 KEY_FRAMES フレームを KEY_STRIDE ごとに間引く）"""
+    codes = np.frombuffer(data, dtype="<u4")
+    return _distinct_codes(codes[:KEY_FRAMES:KEY_STRIDE])
+
+
+def bit_error_rate(a, b):
+    """
+    2 つの指紋を MAX_SHIFT_FRAMES までずらして比べ、最も小さいビット誤り率を返す
+
+    重なりが MIN_OVERLAP_FRAMES または短い方の半分に満たない場合は比べない（1.0）。
+    """
+    min_overlap = max(MIN_OVERLAP_FRAMES, min(len(a), len(b)) // 2)
+    best = 1.0
+    for shift in range(-MAX_SHIFT_FRAMES, MAX_SHIFT_FRAMES + 1):
+        x = a[max(shift, 0) :]
+        y = b[max(-shift, 0) :]
+        overlap = min(len(x), len(y))
+        if overlap < min_overlap:
+            continue
+        errors = np.unpackbits(np.bitwise_xor(x[:overlap], y[:overlap]).view(np.uint8))
+        best = min(best, errors.sum() / (overlap * 32))
+    return best
+
+
+def find_similar(fingerprint, query_codes):
+    """
+    同じユーザーのファイルから、指紋が最も近いもの（ファイル, 類似度）を返す
+
+    query_codes（FingerprintBuilder.query_codes）が検索キーと完全に一致するものだけを
+    候補にし、一致したキーの多い順に MAX_CANDIDATES 件まで比べるため、全件は走査しない。
+    ビット誤り率が MEDIA_FINGERPRINT_MAX_BIT_ERROR_RATE を超える場合は (None, None)。
+    """
+    matches = Counter()
+    for start in range(0, len(query_codes), QUERY_BATCH_SIZE):
+        rows = (
+            MediaFingerprintKey.objects.filter(
+                user_id=fingerprint.user_id,
+                code__in=query_codes[start : start + QUERY_BATCH_SIZE],
+                fingerprint__version=fingerprint.version,
+                fingerprint__media_file__deleted_at__isnull=True,
+            )
+            .exclude(fingerprint_id=fingerprint.pk)
+            .values("fingerprint_id")
+            .annotate(matches=Count("id"))
+        )
+        for row in rows:
+            matches[row["fingerprint_id"]] += row["matches"]
+    ranked = [pk for pk, _ in matches.most_common(MAX_CANDIDATES)]
+    candidates = MediaFingerprint.objects.only("media_file_id", "codes").in_bulk(ranked)
+    codes = np.frombuffer(fingerprint.codes, dtype="<u4")
+    best_id, best_rate = None, settings.MEDIA_FINGERPRINT_MAX_BIT_ERROR_RATE
+    for pk in ranked:
+        candidate = candidates[pk]
+        rate = bit_error_rate(codes, np.frombuffer(candidate.codes, dtype="<u4"))
+        if rate <= best_rate:
+            best_id, best_rate = candidate.media_file_id, rate
+    similar = MediaFile.objects.filter(pk=best_id).first() if best_id else None
+    if similar is None:
+        return None, None
+    return similar, round(1 - best_rate, 3)
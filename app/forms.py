@@ -1,16 +1,39 @@
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
+from django.db.models import Q
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 
 from .constants import ACCOUNTS_PREFIX
+from .hashers import PasswordHashingBusy, run_hashing
+from .mail import enqueue_email
+from .mediatypes import coerce_content_type, detect_content_type
 from .models import MediaFile, Project
+from .versions import compute_content_hash
 
 User = get_user_model()
 
+HASHING_BUSY_MESSAGE = "現在混雑しています。しばらくしてから再度お試しください。"
+
+
+class LoginForm(AuthenticationForm):
+    """ログインフォーム（パスワードの検証が混雑している場合を区別する）"""
+
+    hashing_busy = False
+
+    def clean(self):
+        try:
+            return super().clean()
+        except PasswordHashingBusy:
+            # 誤ったパスワードとは扱わない（ビューが 503 を返す）
+            self.hashing_busy = True
+            raise forms.ValidationError(HASHING_BUSY_MESSAGE, code="busy")
+
 
 class SignUpForm(UserCreationForm):
     """サインアップフォーム"""
@@ -57,25 +80,57 @@ class SignUpForm(UserCreationForm):
         model = User
         fields = ("username", "email", "password1", "password2")
 
-    def clean_email(self):
-        email = self.cleaned_data.get("email")
-        if User.objects.filter(email=email).exists():
-            raise forms.ValidationError("このメールアドレスは既に登録されています。")
-        return email
-
     def clean_username(self):
-        username = self.cleaned_data.get("username")
-        if User.objects.filter(username=username).exists():
-            raise forms.ValidationError("このユーザー名は既に使用されています。")
-        return username
+        # 重複チェックは clean() でメールアドレスと合わせて1クエリで行う
+        return self.cleaned_data.get("username")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        username = cleaned_data.get("username")
+        email = cleaned_data.get("email")
+
+        query = Q()
+        if username:
+            query |= Q(username=username)
+        if email:
+            query |= Q(email=email)
+        if not query:
+            return cleaned_data
+
+        existing = User.objects.filter(query).values_list("username", "email")[:2]
+        for existing_username, existing_email in existing:
+            if username and existing_username == username:
+                self.add_error("username", "このユーザー名は既に使用されています。")
+            if email and existing_email == email:
+                self.add_error("email", "このメールアドレスは既に登録されています。")
+        return cleaned_data
+
+    def validate_unique(self):
+        # username / email の重複は clean() で確認済みのため、再度クエリを発行しない
+        exclude = self._get_validation_exclusions() | {"username", "email"}
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except forms.ValidationError as e:
+            self._update_errors(e)
+
+    def set_password_and_save(self, user, password_field_name="password1", commit=True):
+        # ハッシュ計算は上限付きのスレッドプールで行う
+        user.password = run_hashing(
+            make_password, self.cleaned_data[password_field_name]
+        )
+        if commit:
+            user.save()
+        return user
 
     def save(self, commit=True):
         user = super().save(commit=False)
         user.email = self.cleaned_data["email"]
         user.is_active = False  # アクティベーションが必要
         if commit:
-            user.save()
-            self._send_activation_email(user)
+            # ユーザーとアクティベーションメールを同じトランザクションで登録
+            with transaction.atomic():
+                user.save()
+                self._send_activation_email(user)
         return user
 
     def _send_activation_email(self, user):
@@ -91,7 +146,29 @@ Django TailwindCSS Multimedia Auth にご登録いただきありがとうござ
             settings.FRONTEND_URL + f"/{ACCOUNTS_PREFIX}activate/{uid}/{token}/"
         )
         message = message_template + activate_url
-        user.email_user(subject, message)
+        # 実際の送信は send_outbox コマンドが行う
+        enqueue_email(user.email, subject, message, user=user)
+
+
+def validate_media_upload(file, file_type):
+    """
+    アップロードされたメディアファイルのサイズと形式を検証し、Content-Type を返す
+
+    形式はブラウザの申告ではなくファイルの先頭バイトで判定する。
+    """
+    # ファイルサイズ制限
+    max_size = settings.MAX_MEDIA_FILE_SIZE_BYTES
+    if file.size > max_size:
+        raise forms.ValidationError(
+            f"ファイルサイズが大きすぎます。{settings.MAX_MEDIA_FILE_SIZE_MB}MB以下のファイルを選択してください。"
+        )
+
+    content_type = coerce_content_type(detect_content_type(file), file_type)
+    if file_type == "audio" and content_type is None:
+        raise forms.ValidationError("音声ファイルを選択してください。")
+    elif file_type == "video" and content_type is None:
+        raise forms.ValidationError("動画ファイルを選択してください。")
+    return content_type
 
 
 class MediaFileUploadForm(forms.ModelForm):
@@ -150,25 +227,40 @@ class MediaFileUploadForm(forms.ModelForm):
     def clean_file(self):
         file = self.cleaned_data.get("file")
         if file:
-            # ファイルサイズ制限
-            max_size = settings.MAX_MEDIA_FILE_SIZE_BYTES
-            if file.size > max_size:
-                raise forms.ValidationError(
-                    f"ファイルサイズが大きすぎます。{settings.MAX_MEDIA_FILE_SIZE_MB}MB以下のファイルを選択してください。"
-                )
-
-            # ファイル形式の検証
-            file_type = self.cleaned_data.get("file_type")
-            if file_type == "audio":
-                if not file.content_type.startswith("audio/"):
-                    raise forms.ValidationError("音声ファイルを選択してください。")
-            elif file_type == "video":
-                if not file.content_type.startswith("video/"):
-                    raise forms.ValidationError("動画ファイルを選択してください。")
+            content_type = validate_media_upload(
+                file, self.cleaned_data.get("file_type")
+            )
+            self.instance.mime_type = content_type or ""
+            self.instance.content_hash = compute_content_hash(file)
 
         return file
 
 
+class MediaFileReplaceForm(forms.Form):
+    """メディアファイルの内容の差し替えフォーム（新しい版を作成する）"""
+
+    file = forms.FileField(
+        label="新しいファイル",
+        widget=forms.FileInput(
+            attrs={
+                "class": "w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-blue-500",
+                "accept": "audio/*,video/*",
+            }
+        ),
+    )
+
+    def __init__(self, *args, media_file, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.media_file = media_file
+
+    def clean_file(self):
+        file = self.cleaned_data["file"]
+        # 差し替え後もファイル種別（音声 / 動画）は変えない
+        self.mime_type = validate_media_upload(file, self.media_file.file_type)
+        self.content_hash = compute_content_hash(file)
+        return file
+
+
 class MediaFileRenameForm(forms.ModelForm):
     """メディアファイル名変更フォーム"""
 
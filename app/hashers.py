@@ -0,0 +1,72 @@
+"""
+パスワードハッシュ計算の実行制御
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class PasswordHashingBusy(TimeoutError):
+    """パスワードのハッシュ計算が混雑していて、時間内に実行できない"""
+
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+def get_hash_executor():
+    """パスワードハッシュ計算用の上限付きスレッドプールを返す"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    thread_name_prefix="password-hash",
+                )
+    return _executor
+
+
+def _get_slots():
+    """実行中と待機中を合わせたハッシュ計算の数を制限するセマフォを返す"""
+    global _slots
+    if _slots is None:
+        with _executor_lock:
+            if _slots is None:
+                _slots = threading.BoundedSemaphore(
+                    settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE
+                )
+    return _slots
+
+
+def run_hashing(func, *args, **kwargs):
+    """
+    ハッシュ計算をスレッドプールで実行し、結果を返す
+
+    同時に実行されるハッシュ計算を PASSWORD_HASH_WORKERS 個までに抑え、
+    ログインが集中しても他のリクエストの CPU を奪い尽くさないようにする。
+    待ち行列が PASSWORD_HASH_QUEUE_SIZE 個を超える場合はすぐに、待ち時間が
+    PASSWORD_HASH_TIMEOUT 秒を超えた場合は待機中の計算を取り消して
+    PasswordHashingBusy を送出する（実行中の計算は止められないが、
+    終わるまで待ち行列の枠を使い続ける）。
+    """
+    slots = _get_slots()
+    if not slots.acquire(blocking=False):
+        raise PasswordHashingBusy("パスワードのハッシュ計算の待ち行列が一杯です")
+    try:
+        future = get_hash_executor().submit(func, *args, **kwargs)
+    except BaseException:
+        slots.release()
+        raise
+    # 完了・取り消しのどちらでも枠を返す
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=settings.PASSWORD_HASH_TIMEOUT)
+    except TimeoutError as e:
+        future.cancel()
+        raise PasswordHashingBusy(
+            "パスワードのハッシュ計算が時間内に終わりません"
+        ) from e
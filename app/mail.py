@@ -0,0 +1,101 @@
+"""
+アウトボックス経由のメール送信
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmailOutbox
+from .observability import span
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(to_email, subject, body, user=None):
+    """
+    メールをアウトボックスに登録する
+
+    呼び出し元のトランザクション内で作成されるため、
+    ユーザー作成がロールバックされた場合はメールも送信されない。
+    """
+    return EmailOutbox.objects.create(
+        user=user, to_email=to_email, subject=subject, body=body
+    )
+
+
+def _retry_delay(attempts):
+    """試行回数に応じた再送までの待ち時間（指数バックオフ）"""
+    base = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS
+    return timedelta(seconds=min(base * (2 ** (attempts - 1)), 3600))
+
+
+def deliver_outbox_batch(connection, batch_size=None):
+    """
+    送信待ちのメールをまとめて送信し、送信件数と失敗件数を返す
+
+    同じ接続を使い回して送信する。複数の送信プロセスが動いていても
+    同じメールを二重に送らないよう、対象行はロックしてから処理する。
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    rate = settings.EMAIL_OUTBOX_RATE_PER_SECOND
+    min_interval = 1.0 / rate if rate > 0 else 0.0
+    sent = failed = 0
+
+    with transaction.atomic():
+        outbox = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(
+                status=EmailOutbox.STATUS_PENDING,
+                next_attempt_at__lte=timezone.now(),
+            )
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        last_sent_at = 0.0
+        for item in outbox:
+            # 送信レートの制限
+            wait = min_interval - (time.monotonic() - last_sent_at)
+            if wait > 0:
+                time.sleep(wait)
+            last_sent_at = time.monotonic()
+
+            message = EmailMessage(
+                item.subject,
+                item.body,
+                settings.DEFAULT_FROM_EMAIL,
+                [item.to_email],
+                connection=connection,
+            )
+            item.attempts += 1
+            try:
+                with span("email.send", **{"email.outbox_id": item.pk}):
+                    message.send()
+            except Exception as e:
+                logger.warning("メール送信エラー: outbox_id=%s", item.pk, exc_info=True)
+                item.last_error = str(e)
+                if item.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    item.status = EmailOutbox.STATUS_FAILED
+                else:
+                    item.next_attempt_at = timezone.now() + _retry_delay(item.attempts)
+                failed += 1
+            else:
+                item.status = EmailOutbox.STATUS_SENT
+                item.sent_at = timezone.now()
+                item.last_error = ""
+                sent += 1
+            item.save(
+                update_fields=[
+                    "status",
+                    "attempts",
+                    "next_attempt_at",
+                    "last_error",
+                    "sent_at",
+                ]
+            )
+
+    return sent, failed
@@ -0,0 +1,51 @@
+import time
+
+from django.contrib.auth.hashers import get_hasher, get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "パスワードハッシャーごとに1コアあたりのログイン処理数（検証回数/秒）を計測します"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=3.0,
+            help="ハッシャーごとの計測時間（秒）",
+        )
+        parser.add_argument(
+            "--hasher",
+            action="append",
+            dest="hashers",
+            help="計測するハッシャーのアルゴリズム名（複数指定可、省略時は全て）",
+        )
+
+    def handle(self, *args, **options):
+        password = "correct horse battery staple"
+        algorithms = options["hashers"] or [h.algorithm for h in get_hashers()]
+        preferred = get_hasher("default").algorithm
+
+        self.stdout.write(f"{'hasher':<24}{'logins/sec/core':>18}{'ms/login':>12}")
+        for algorithm in algorithms:
+            try:
+                hasher = get_hasher(algorithm)
+                encoded = hasher.encode(password, hasher.salt())
+            except (ValueError, ImportError) as e:
+                self.stdout.write(f"{algorithm:<24}{'スキップ: ' + str(e):>18}")
+                continue
+
+            # 1スレッドで検証を繰り返し、1コアあたりの処理性能を求める
+            count = 0
+            start = time.perf_counter()
+            elapsed = 0.0
+            while elapsed < options["duration"] or count == 0:
+                hasher.verify(password, encoded)
+                count += 1
+                elapsed = time.perf_counter() - start
+
+            marker = " (推奨)" if algorithm == preferred else ""
+            self.stdout.write(
+                f"{algorithm + marker:<24}{count / elapsed:>18.1f}"
+                f"{elapsed / count * 1000:>12.1f}"
+            )
@@ -0,0 +1,130 @@
+import logging
+import time
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DatabaseSessionStore
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.models import User
+from app.observability import span
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "アクティベーションされないまま保持期間が経過したユーザーと、期限切れのセッションを"
+        "少しずつ削除します（定期実行を想定）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.UNACTIVATED_USER_RETENTION_DAYS,
+            help="登録からこの日数が経過した、アクティベーションされていないユーザーを削除する",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="1回のトランザクションで削除する件数",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.2,
+            help="バッチ間の待機秒数（DB の負荷を抑える）",
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=0,
+            help="1回の実行で処理する最大バッチ数（0 は無制限）",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.batches = 0
+        start = time.monotonic()
+        with span("cleanup_accounts") as current:
+            users = self._delete_users(timezone.now() - timedelta(days=options["days"]))
+            sessions = self._delete_sessions()
+            duration = time.monotonic() - start
+            current.set_attribute("cleanup.users_deleted", users)
+            current.set_attribute("cleanup.sessions_deleted", sessions)
+            current.set_attribute("cleanup.batches", self.batches)
+        logger.info(
+            "アカウントの整理が完了しました",
+            extra={
+                "users_deleted": users,
+                "sessions_deleted": sessions,
+                "batches": self.batches,
+                "duration_seconds": round(duration, 3),
+            },
+        )
+        self.stdout.write(
+            f"削除: ユーザー {users}件, セッション {sessions}件"
+            f"（{self.batches}バッチ, {duration:.1f}秒）"
+        )
+
+    def _batches(self, queryset, delete):
+        """
+        queryset の先頭から batch_size 件ずつ pk を取り出して delete に渡す
+
+        どちらのクエリもインデックスの順に読むため、削除済みの行を走査し直さない。
+        """
+        removed = 0
+        while (
+            not self.options["max_batches"]
+            or self.batches < self.options["max_batches"]
+        ):
+            pks = list(queryset[: self.options["batch_size"]])
+            if not pks:
+                break
+            delete(pks)
+            removed += len(pks)
+            self.batches += 1
+            if self.options["sleep"]:
+                time.sleep(self.options["sleep"])
+        return removed
+
+    def _delete_users(self, cutoff):
+        # 部分インデックス user_unactivated_idx の条件と同じ条件で、登録日時の順に読む。
+        # 管理者が無効にしたユーザー（ログインしたことがある）やスタッフは対象外
+        queryset = (
+            User.objects.filter(
+                is_active=False,
+                last_login__isnull=True,
+                date_joined__lt=cutoff,
+                is_staff=False,
+                is_superuser=False,
+            )
+            .order_by("date_joined")
+            .values_list("pk", flat=True)
+        )
+        # 関連レコード（アウトボックスのメールなど）は Django がまとめて削除する
+        return self._batches(
+            queryset, lambda pks: User.objects.filter(pk__in=pks).delete()
+        )
+
+    def _delete_sessions(self):
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not issubclass(store, DatabaseSessionStore):
+            # キャッシュのセッションは期限切れで自動的に消える。ファイルなどは標準の処理に任せる
+            store.clear_expired()
+            return 0
+        # 標準の clearsessions は 1 つの DELETE で全件を削除するため、expire_date の
+        # インデックスの順に少しずつ削除する
+        model = store.get_model_class()
+        queryset = (
+            model.objects.filter(expire_date__lt=timezone.now())
+            .order_by("expire_date")
+            .values_list("pk", flat=True)
+        )
+        return self._batches(
+            queryset, lambda pks: model.objects.filter(pk__in=pks).delete()
+        )
@@ -0,0 +1,62 @@
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.mediatypes import (
+    SNIFF_BYTES,
+    coerce_content_type,
+    read_file_head,
+    sniff_content_type,
+)
+from app.models import MediaFile
+
+
+class Command(BaseCommand):
+    help = (
+        "Content-Type が未判定の既存メディアファイルをファイルシグネチャから判定して"
+        "保存します"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="1回のクエリで処理する件数"
+        )
+
+    def handle(self, *args, **options):
+        detected = failed = 0
+        queryset = MediaFile.objects.filter(mime_type="").order_by("pk")
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[: options["batch_size"]])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for media_file in batch:
+                try:
+                    head = self._read_head(media_file)
+                except OSError as e:
+                    self.stderr.write(f"読み込みエラー: {media_file.file.name}: {e}")
+                    failed += 1
+                    continue
+                content_type = coerce_content_type(
+                    sniff_content_type(head),
+                    media_file.file_type,
+                )
+                if content_type is None:
+                    self.stderr.write(f"判定できません: {media_file.file.name}")
+                    failed += 1
+                    continue
+                # updated_at も更新してテンプレートフラグメントキャッシュを無効化する
+                MediaFile.objects.filter(pk=media_file.pk).update(
+                    mime_type=content_type, updated_at=timezone.now()
+                )
+                detected += 1
+        self.stdout.write(f"判定: {detected}件, 失敗: {failed}件")
+
+    def _read_head(self, media_file):
+        storage = media_file.file.storage
+        if isinstance(storage, FileSystemStorage):
+            # コールド階層のファイルも実際の配置場所から読む
+            with open(media_file.get_physical_path(), "rb") as f:
+                return f.read(SNIFF_BYTES)
+        return read_file_head(storage, media_file.file.name)
@@ -0,0 +1,67 @@
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+
+from app.faststart import (
+    FASTSTART_TYPES,
+    FaststartError,
+    needs_faststart,
+    relocate_moov,
+)
+from app.models import MediaFile
+from app.storage import select_media_storage
+from app.versions import rehash_stored_file
+
+
+class Command(BaseCommand):
+    help = (
+        "既存の MP4 / QuickTime ファイルの moov アトムを先頭側へ移動します"
+        "（変換済みのファイルは変更しません）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="1回のクエリで処理する件数"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="変換が必要なファイルを表示するだけで変換しない",
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(select_media_storage(), FileSystemStorage):
+            raise CommandError("ファイルシステムストレージでのみ実行できます。")
+
+        converted = skipped = failed = 0
+        queryset = (
+            MediaFile.objects.filter(mime_type__in=FASTSTART_TYPES)
+            .only("file", "storage_tier", "content_hash")
+            .order_by("pk")
+        )
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[: options["batch_size"]])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for media_file in batch:
+                path = media_file.get_physical_path()
+                try:
+                    if options["dry_run"]:
+                        if needs_faststart(path):
+                            self.stdout.write(f"[dry-run] {media_file.file.name}")
+                            converted += 1
+                        else:
+                            skipped += 1
+                    elif relocate_moov(path):
+                        rehash_stored_file(media_file)
+                        self.stdout.write(f"変換しました: {media_file.file.name}")
+                        converted += 1
+                    else:
+                        skipped += 1
+                except (OSError, FaststartError) as e:
+                    self.stderr.write(f"変換エラー: {media_file.file.name}: {e}")
+                    failed += 1
+        self.stdout.write(
+            f"変換: {converted}件, 変換不要: {skipped}件, 失敗: {failed}件"
+        )
@@ -0,0 +1,211 @@
+import heapq
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.functions import Collate
+
+from app.models import MediaFile, MediaFileVersion, MediaRendition
+from app.storage import select_media_storage
+from app.tiering import tier_root
+
+
+def _list_dir(path):
+    """
+    ディレクトリの中身を名前順で返す
+
+    サブディレクトリは名前の末尾に "/" を付けて並べることで、
+    深さ優先で辿った順序が相対パス文字列の順序と一致するようにする。
+    """
+    entries = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                entries.append((entry.name + "/" if is_dir else entry.name, is_dir))
+    except FileNotFoundError:
+        return []
+    entries.sort()
+    return entries
+
+
+class Command(BaseCommand):
+    help = (
+        "ファイルが存在しない MediaFile / MediaFileVersion / MediaRendition レコードと、"
+        "レコードのないファイルを検出します。"
+        "ファイルシステムと DB をそれぞれパス順に走査してマージするため、"
+        "件数によらず一定のメモリで動作します。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tier",
+            choices=[MediaFile.TIER_HOT, MediaFile.TIER_COLD],
+            action="append",
+            dest="tiers",
+            help="検査するストレージ階層（省略時は全て）",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="ディレクトリを走査するスレッド数",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="DB から一度に読み込むレコード数",
+        )
+        parser.add_argument(
+            "--delete-orphans",
+            action="store_true",
+            help="レコードのないファイルを削除する",
+        )
+        parser.add_argument(
+            "--delete-missing",
+            action="store_true",
+            help="ファイルが存在しないレコードを削除する",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=3600,
+            help="削除対象とするファイルの最小経過秒数（アップロード中のファイルを除外）",
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(select_media_storage(), FileSystemStorage):
+            raise CommandError("ファイルシステムストレージでのみ実行できます。")
+
+        self.options = options
+        tiers = options["tiers"] or [MediaFile.TIER_HOT, MediaFile.TIER_COLD]
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for tier in tiers:
+                self._check_tier(executor, tier)
+
+    def _check_tier(self, executor, tier):
+        root = tier_root(tier)
+        files = self._walk_files(executor, root)
+        rows = heapq.merge(
+            self._db_rows(MediaFile, MediaFile.all_objects.filter(storage_tier=tier)),
+            self._db_rows(
+                MediaFileVersion, MediaFileVersion.objects.filter(storage_tier=tier)
+            ),
+            key=lambda row: row[0],
+        )
+        if tier == MediaFile.TIER_HOT:
+            # 変換済みファイルは常にホット階層に置かれる
+            rows = heapq.merge(
+                rows,
+                self._db_rows(MediaRendition, MediaRendition.objects.all()),
+                key=lambda row: row[0],
+            )
+
+        orphans = missing = matched = 0
+        file_name = next(files, None)
+        file_matched = False
+        row = next(rows, None)
+        while file_name is not None or row is not None:
+            if row is None or (file_name is not None and file_name < row[0]):
+                if not file_matched:
+                    orphans += 1
+                    self._handle_orphan(root, file_name)
+                file_name = next(files, None)
+                file_matched = False
+            elif file_name is None or row[0] < file_name:
+                missing += 1
+                self._handle_missing(row)
+                row = next(rows, None)
+            else:
+                # 同じファイルを複数のレコードが参照している場合もあるため、ファイルは進めない
+                matched += 1
+                file_matched = True
+                row = next(rows, None)
+
+        self.stdout.write(
+            f"[{tier}] 一致: {matched}件, レコードなし: {orphans}件, "
+            f"ファイルなし: {missing}件"
+        )
+
+    def _walk_files(self, executor, root):
+        """root 以下のファイルの相対パスを文字列順に返す"""
+        yield from self._walk(executor, root, "", _list_dir(root))
+
+    def _walk(self, executor, root, rel_dir, listing):
+        # サブディレクトリの走査はスレッドプールで先読みする（先読み数は上限あり）
+        subdirs = iter([key for key, is_dir in listing if is_dir])
+        pending = deque()
+        prefetch = self.options["workers"] * 2
+
+        def submit_next():
+            key = next(subdirs, None)
+            if key is not None:
+                pending.append(
+                    executor.submit(_list_dir, os.path.join(root, rel_dir + key))
+                )
+
+        for _ in range(prefetch):
+            submit_next()
+
+        for key, is_dir in listing:
+            if is_dir:
+                future = pending.popleft()
+                submit_next()
+                yield from self._walk(executor, root, rel_dir + key, future.result())
+            else:
+                yield rel_dir + key
+
+    def _db_rows(self, model, queryset):
+        """(ファイル名, pk, モデル) をファイル名のコードポイント順にキーセットページングで返す"""
+        if connection.vendor == "postgresql":
+            # ロケール依存の照合順序ではなくバイト順で比較する
+            queryset = queryset.annotate(sort_name=Collate("file", "C"))
+        else:
+            queryset = queryset.annotate(sort_name=F("file"))
+        queryset = queryset.exclude(file="").order_by("sort_name", "pk")
+
+        last = None
+        while True:
+            page = queryset
+            if last is not None:
+                page = page.filter(
+                    Q(sort_name__gt=last[0]) | Q(sort_name=last[0], pk__gt=last[1])
+                )
+            rows = list(
+                page.values_list("sort_name", "pk")[: self.options["chunk_size"]]
+            )
+            if not rows:
+                return
+            for name, pk in rows:
+                yield name, pk, model
+            last = rows[-1]
+
+    def _handle_orphan(self, root, name):
+        path = os.path.join(root, name)
+        self.stdout.write(f"レコードなし: {name}")
+        if not self.options["delete_orphans"]:
+            return
+        try:
+            if time.time() - os.path.getmtime(path) < self.options["min_age"]:
+                return
+            os.remove(path)
+            self.stdout.write(f"  削除しました: {path}")
+        except OSError as e:
+            self.stderr.write(f"  削除エラー: {path}: {e}")
+
+    def _handle_missing(self, row):
+        name, pk, model = row
+        label = model._meta.model_name
+        self.stdout.write(f"ファイルなし: {name} ({label} id={pk})")
+        if self.options["delete_missing"]:
+            model._base_manager.filter(pk=pk).delete()
+            self.stdout.write(f"  レコードを削除しました: {label} id={pk}")
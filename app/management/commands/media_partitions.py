@@ -0,0 +1,171 @@
+from datetime import datetime, time, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from app import partitioning
+
+
+def _parse_date(value):
+    """YYYY-MM-DD を UTC のその日の 0 時にする"""
+    try:
+        day = datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"日付は YYYY-MM-DD で指定してください: {value}")
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+class Command(BaseCommand):
+    help = (
+        "メディアファイルのテーブルを PostgreSQL の宣言的パーティショニングで分割し、"
+        "パーティションを管理します（作成・追加・月単位の一括削除）"
+    )
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="action", required=True)
+
+        subparsers.add_parser("status", help="分割方式とパーティションの一覧を表示する")
+
+        convert = subparsers.add_parser(
+            "convert",
+            help="テーブルを止めずにパーティションテーブルへ変換する（再実行できる）",
+        )
+        convert.add_argument(
+            "--strategy",
+            choices=partitioning.STRATEGIES,
+            required=True,
+            help="hash: user_id のハッシュで分割, range: created_at の月ごとに分割",
+        )
+        convert.add_argument(
+            "--partitions",
+            type=int,
+            default=16,
+            help="hash の場合のパーティション数",
+        )
+        convert.add_argument(
+            "--months-ahead",
+            type=int,
+            default=settings.MEDIA_PARTITION_MONTHS_AHEAD,
+            help="range の場合に先に作成しておく月数",
+        )
+        convert.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="既存の行を 1 回のトランザクションでコピーする id の範囲",
+        )
+        convert.add_argument(
+            "--sleep",
+            type=float,
+            default=0.1,
+            help="コピーのバッチ間の待機秒数（DB の負荷を抑える）",
+        )
+
+        create = subparsers.add_parser(
+            "create",
+            help="range の場合に今月から先の月のパーティションを作成する（定期実行を想定）",
+        )
+        create.add_argument(
+            "--months-ahead",
+            type=int,
+            default=settings.MEDIA_PARTITION_MONTHS_AHEAD,
+            help="今月から何か月先まで作成するか",
+        )
+
+        attach = subparsers.add_parser(
+            "attach",
+            help="同じ列を持つ既存のテーブルを range のパーティションとして追加する",
+        )
+        attach.add_argument("table", help="追加するテーブル名")
+        attach.add_argument(
+            "--from", dest="start", required=True, help="範囲の開始日（YYYY-MM-DD）"
+        )
+        attach.add_argument(
+            "--to", dest="end", required=True, help="範囲の終了日（この日を含まない）"
+        )
+
+        purge = subparsers.add_parser(
+            "purge",
+            help="指定した日より前の月のパーティションを切り離して、ファイルごと削除する",
+        )
+        purge.add_argument(
+            "--before",
+            required=True,
+            help="終了日がこの日（YYYY-MM-DD）以前のパーティションを削除する",
+        )
+        purge.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="関連レコードとファイルを 1 回のトランザクションで削除する件数",
+        )
+        purge.add_argument(
+            "--sleep",
+            type=float,
+            default=0.5,
+            help="バッチ間の待機秒数（DB とストレージの負荷を抑える）",
+        )
+        purge.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="削除対象のパーティションを表示するだけで削除しない",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            getattr(self, f"_{options['action']}")(options)
+        except partitioning.PartitioningError as e:
+            raise CommandError(str(e))
+        except DatabaseError as e:
+            raise CommandError(f"DB エラー: {e}")
+
+    def _log(self, message):
+        self.stdout.write(message)
+
+    def _status(self, options):
+        partitioning.check_server()
+        strategy = partitioning.get_strategy()
+        self.stdout.write(f"分割方式: {strategy or 'なし'}")
+        for name, bound, rows, size in partitioning.list_partitions():
+            self.stdout.write(
+                f"{name}\t{bound}\t推定 {rows}行\t{size / (1024 * 1024):.1f}MB"
+            )
+        for name in partitioning.purging_tables():
+            self.stdout.write(f"{name}\t削除待ち（purge を再実行してください）")
+
+    def _convert(self, options):
+        if options["partitions"] < 2:
+            raise CommandError("--partitions は 2 以上を指定してください")
+        partitioning.convert(
+            options["strategy"],
+            options["partitions"],
+            options["months_ahead"],
+            options["batch_size"],
+            options["sleep"],
+            self._log,
+        )
+
+    def _create(self, options):
+        created = partitioning.create_month_partitions(
+            options["months_ahead"], self._log
+        )
+        self._log(f"作成: {len(created)}件")
+
+    def _attach(self, options):
+        start, end = _parse_date(options["start"]), _parse_date(options["end"])
+        if start >= end:
+            raise CommandError("--to は --from より後の日付を指定してください")
+        partitioning.attach_partition(options["table"], start, end)
+        self._log(f"追加: {options['table']}")
+
+    def _purge(self, options):
+        before = _parse_date(options["before"])
+        if options["dry_run"]:
+            for name in partitioning.purge_targets(before):
+                self._log(f"[dry-run] {name}")
+            return
+        removed = partitioning.purge_partitions(
+            before, options["batch_size"], options["sleep"], self._log
+        )
+        self._log(f"削除: メディアファイル {removed}件")
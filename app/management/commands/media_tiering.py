@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.models import MediaFile
+from app.tiering import demotion_candidates, move_to_tier, promotion_candidates
+
+
+class Command(BaseCommand):
+    help = (
+        "アクセス頻度に応じてメディアファイルをホット/コールド階層間で移動します"
+        "（定期実行を想定）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--demote-after-days",
+            type=int,
+            default=settings.MEDIA_TIER_DEMOTE_AFTER_DAYS,
+            help="この日数アクセスがないファイルをコールド階層へ移動する",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="1回の実行で移動する最大件数（階層ごと）",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="移動対象を表示するだけで移動しない"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        promoted = self._move(
+            promotion_candidates()[:batch_size], MediaFile.TIER_HOT, options
+        )
+        demoted = self._move(
+            demotion_candidates(options["demote_after_days"]).order_by(
+                "last_accessed_at", "created_at"
+            )[:batch_size],
+            MediaFile.TIER_COLD,
+            options,
+        )
+        self.stdout.write(f"ホットへ移動: {promoted}件, コールドへ移動: {demoted}件")
+
+    def _move(self, queryset, tier, options):
+        moved = 0
+        for media_file in queryset.iterator():
+            if options["dry_run"]:
+                self.stdout.write(f"[dry-run] {media_file.file.name} -> {tier}")
+                moved += 1
+                continue
+            try:
+                if move_to_tier(media_file, tier):
+                    moved += 1
+            except (OSError, KeyError) as e:
+                self.stderr.write(f"移動エラー: {media_file.file.name}: {e}")
+        return moved
@@ -0,0 +1,77 @@
+import os
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app.processing import claim_next, process_media_file
+
+
+class Command(BaseCommand):
+    help = "アップロードされたメディアファイルの変換などの処理をバックグラウンドで実行します"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.MEDIA_PROCESSING_WORKERS,
+            help="同時に処理するファイル数",
+        )
+        parser.add_argument(
+            "--nice",
+            type=int,
+            default=settings.MEDIA_PROCESSING_NICE,
+            help="プロセスの nice 値（ffmpeg にも引き継がれる）",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="処理待ちのファイルがなくなったら終了する",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.MEDIA_PROCESSING_POLL_INTERVAL,
+            help="処理待ちがない場合の待機秒数",
+        )
+
+    def handle(self, *args, **options):
+        if options["nice"]:
+            # Web ワーカーと同じホストで動かしても応答性を損なわないよう優先度を下げる
+            os.nice(options["nice"])
+
+        self.stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: self.stop.set())
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = [
+                executor.submit(self._work, options) for _ in range(options["workers"])
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except KeyboardInterrupt:
+                # 処理中のファイルが終わるのを待って終了する
+                self.stop.set()
+
+    def _work(self, options):
+        try:
+            while not self.stop.is_set():
+                media_file = claim_next()
+                if media_file is None:
+                    if options["once"]:
+                        break
+                    self.stop.wait(options["interval"])
+                    continue
+                if process_media_file(media_file):
+                    self.stdout.write(f"処理しました: {media_file.file.name}")
+                else:
+                    self.stderr.write(
+                        f"処理に失敗しました: {media_file.file.name}: "
+                        f"{media_file.processing_error}"
+                    )
+        finally:
+            connection.close()
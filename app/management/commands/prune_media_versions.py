@@ -0,0 +1,60 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from app.models import MediaFile
+from app.versions import prunable_versions
+
+
+class Command(BaseCommand):
+    help = (
+        "保持ポリシーを超えたメディアファイルの古い版を削除します"
+        "（どの版からも参照されなくなったファイルも削除されます）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=settings.MEDIA_VERSION_KEEP,
+            help="現在の版以外に残す版の数",
+        )
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=settings.MEDIA_VERSION_KEEP_DAYS,
+            help="作成からこの日数以内の版は削除しない",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=100, help="1回のクエリで処理する件数"
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=0.1, help="バッチ間の待機秒数"
+        )
+
+    def handle(self, *args, **options):
+        # 版が保持数を超えているメディアファイルだけを対象にする
+        queryset = (
+            MediaFile.all_objects.annotate(version_count=Count("versions"))
+            .filter(version_count__gt=options["keep"] + 1)
+            .order_by("pk")
+        )
+        pruned = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[: options["batch_size"]])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for media_file in batch:
+                versions = prunable_versions(
+                    media_file, keep=options["keep"], keep_days=options["keep_days"]
+                )
+                # 削除時のシグナルで、参照されなくなったファイルも削除される
+                deleted, _ = versions.delete()
+                pruned += deleted
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        self.stdout.write(f"削除した版: {pruned}件")
@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.models import MediaFile, Project
+
+
+class Command(BaseCommand):
+    help = (
+        "ゴミ箱に移動してから保持期間が経過したメディアファイルとプロジェクトを"
+        "少しずつ完全に削除します（定期実行を想定）"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.TRASH_RETENTION_DAYS,
+            help="ゴミ箱に移動してからこの日数が経過したものを削除する",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="1回のトランザクションで削除する件数",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.5,
+            help="バッチ間の待機秒数（DB とストレージの負荷を抑える）",
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=0,
+            help="1回の実行で処理する最大バッチ数（0 は無制限）",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        self.batches = 0
+        # 先にメディアファイルを削除し、プロジェクトの削除時に大量の関連行を一度に消さない
+        media_count = self._purge(MediaFile, cutoff, options)
+        project_count = self._purge(Project, cutoff, options)
+        self.stdout.write(
+            f"削除: メディアファイル {media_count}件, プロジェクト {project_count}件"
+        )
+
+    def _purge(self, model, cutoff, options):
+        queryset = (
+            model.all_objects.filter(deleted_at__lt=cutoff)
+            .order_by("deleted_at")
+            .values_list("pk", flat=True)
+        )
+        purged = 0
+        while not options["max_batches"] or self.batches < options["max_batches"]:
+            pks = list(queryset[: options["batch_size"]])
+            if not pks:
+                break
+            # 削除時のシグナルで物理ファイルも削除される
+            model.all_objects.filter(pk__in=pks).delete()
+            purged += len(pks)
+            self.batches += 1
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        return purged
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from app.mail import deliver_outbox_batch
+
+
+class Command(BaseCommand):
+    help = "アウトボックスに登録されたメールをバックグラウンドで送信します"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="1バッチだけ送信して終了する"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help="1バッチで送信する最大件数",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.EMAIL_OUTBOX_POLL_INTERVAL,
+            help="送信待ちがない場合の待機秒数",
+        )
+
+    def handle(self, *args, **options):
+        # 同じ接続（anymail の場合は HTTP セッション）を全バッチで使い回す
+        connection = get_connection()
+        connection.open()
+        try:
+            while True:
+                sent, failed = deliver_outbox_batch(
+                    connection, batch_size=options["batch_size"]
+                )
+                if sent or failed:
+                    self.stdout.write(f"送信: {sent}件, 失敗: {failed}件")
+                if options["once"]:
+                    break
+                if not sent and not failed:
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
@@ -0,0 +1,125 @@
+"""
+ファイルシグネチャ（マジックバイト）によるメディアの Content-Type 判定
+"""
+
+import mimetypes
+import os
+from functools import lru_cache
+
+# 判定に使う先頭のバイト数
+SNIFF_BYTES = 512
+
+# 音声のみ・動画付きの両方がありうるコンテナ形式の、音声として扱う場合の Content-Type
+AUDIO_CONTAINER_TYPES = {
+    "video/mp4": "audio/mp4",
+    "video/webm": "audio/webm",
+    "video/ogg": "audio/ogg",
+    "video/x-matroska": "audio/x-matroska",
+    "video/x-ms-asf": "audio/x-ms-wma",
+    "video/3gpp": "audio/3gpp",
+}
+VIDEO_CONTAINER_TYPES = {v: k for k, v in AUDIO_CONTAINER_TYPES.items()}
+
+_MP4_AUDIO_BRANDS = {b"M4A ", b"M4B ", b"M4P ", b"F4A ", b"F4B "}
+
+
+def sniff_content_type(head):
+    """
+    ファイル先頭のバイト列から Content-Type を判定する（判定できない場合は None）
+    """
+    if head.startswith(b"ID3"):
+        return "audio/mpeg"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand == b"qt  ":
+            return "video/quicktime"
+        if brand in _MP4_AUDIO_BRANDS:
+            return "audio/mp4"
+        if brand.startswith(b"3g"):
+            return "video/3gpp"
+        return "video/mp4"
+    if head.startswith(b"RIFF"):
+        if head[8:12] == b"WAVE":
+            return "audio/wav"
+        if head[8:12] == b"AVI ":
+            return "video/x-msvideo"
+        return None
+    if head.startswith(b"OggS"):
+        if b"theora" in head:
+            return "video/ogg"
+        return "audio/ogg"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        if b"webm" in head:
+            return "video/webm"
+        return "video/x-matroska"
+    if head.startswith(b"fLaC"):
+        return "audio/flac"
+    if head.startswith(b"FORM") and head[8:12] in (b"AIFF", b"AIFC"):
+        return "audio/aiff"
+    if head.startswith(b"#!AMR"):
+        return "audio/amr"
+    if head.startswith(b"\x30\x26\xb2\x75\x8e\x66\xcf\x11"):
+        return "video/x-ms-asf"
+    if head.startswith(b"\x00\x00\x01\xba") or head.startswith(b"\x00\x00\x01\xb3"):
+        return "video/mpeg"
+    if len(head) > 188 and head[0] == 0x47 and head[188] == 0x47:
+        return "video/mp2t"
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # MPEG オーディオのフレーム同期。レイヤービットが 00 の場合は ADTS（AAC）
+        if head[1] & 0x06 == 0:
+            return "audio/aac"
+        return "audio/mpeg"
+    return None
+
+
+def detect_content_type(file):
+    """
+    アップロードされたファイルの先頭を読んで Content-Type を判定する
+
+    ファイルの読み込み位置は元に戻す。
+    """
+    position = file.tell() if hasattr(file, "tell") else 0
+    try:
+        file.seek(0)
+        head = file.read(SNIFF_BYTES)
+    finally:
+        file.seek(position)
+    return sniff_content_type(head)
+
+
+def read_file_head(storage, name, size=SNIFF_BYTES):
+    """ストレージ上のファイルの先頭 size バイトを読む"""
+    if hasattr(storage, "read_head"):
+        return storage.read_head(name, size)
+    with storage.open(name, "rb") as f:
+        return f.read(size)
+
+
+def coerce_content_type(content_type, file_type):
+    """
+    ファイル種別（audio / video）に合わせて Content-Type を補正する
+
+    MP4 や WebM など音声・動画の両方がありうるコンテナは、
+    選択されたファイル種別に合わせて読み替える。合わない場合は None を返す。
+    """
+    if content_type is None:
+        return None
+    if content_type.startswith(f"{file_type}/"):
+        return content_type
+    if file_type == "audio":
+        return AUDIO_CONTAINER_TYPES.get(content_type)
+    if file_type == "video":
+        return VIDEO_CONTAINER_TYPES.get(content_type)
+    return None
+
+
+@lru_cache(maxsize=256)
+def guess_content_type_by_extension(ext):
+    """拡張子から Content-Type を推測する（結果はキャッシュする）"""
+    content_type, _ = mimetypes.guess_type(f"file{ext.lower()}")
+    return content_type
+
+
+def guess_content_type(name):
+    _, ext = os.path.splitext(name)
+    return guess_content_type_by_extension(ext)
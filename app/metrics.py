@@ -0,0 +1,156 @@
+"""
+ワーカー単位のメトリクス（処理中のリクエスト数、イベントループの遅延）
+
+各ワーカーは METRICS_DIR/<pid>.json に定期的に値を書き出し、/metrics はディレクトリ内の
+全ワーカーの値を Prometheus のテキスト形式で返す。どのワーカーが /metrics に応答しても
+全ワーカーの値が得られる。
+"""
+
+import asyncio
+import collections
+import glob
+import json
+import logging
+import os
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# loop_lag_max を計算する期間（秒）
+LAG_WINDOW_SECONDS = 60
+
+# (名前, 種類, 説明, スナップショットのキー)
+METRICS = [
+    (
+        "app_worker_in_flight_requests",
+        "gauge",
+        "処理中のリクエスト数（ストリーミング中のレスポンスを含む）",
+        "in_flight",
+    ),
+    (
+        "app_worker_requests_total",
+        "counter",
+        "ワーカーが受け付けたリクエスト数",
+        "requests_total",
+    ),
+    (
+        "app_worker_event_loop_lag_seconds",
+        "gauge",
+        "直近のイベントループの遅延",
+        "loop_lag",
+    ),
+    (
+        "app_worker_event_loop_lag_max_seconds",
+        "gauge",
+        "直近 1 分間のイベントループの遅延の最大値",
+        "loop_lag_max",
+    ),
+]
+
+
+class WorkerMetrics:
+    """このプロセスのメトリクス（イベントループのスレッドからのみ更新する）"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests_total = 0
+        self.loop_lag = 0.0
+        self._lag_samples = collections.deque()
+        self._monitor = None
+
+    def ensure_monitor(self):
+        """イベントループの遅延の計測を開始する（ワーカーのイベントループ上で呼ぶ）"""
+        if self._monitor is None or self._monitor.done():
+            self._monitor = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.METRICS_LOOP_LAG_INTERVAL
+        written_at = 0.0
+        while True:
+            start = loop.time()
+            await asyncio.sleep(interval)
+            # 予定より遅れて再開した分が、他の処理にループが占有されていた時間
+            now = loop.time()
+            self.loop_lag = max(0.0, now - start - interval)
+            self._lag_samples.append((now, self.loop_lag))
+            while self._lag_samples[0][0] < now - LAG_WINDOW_SECONDS:
+                self._lag_samples.popleft()
+            if now - written_at >= settings.METRICS_WRITE_INTERVAL:
+                written_at = now
+                try:
+                    await loop.run_in_executor(None, write_snapshot, self.snapshot())
+                except OSError:
+                    logger.warning("メトリクスを書き出せません", exc_info=True)
+
+    def snapshot(self):
+        return {
+            "pid": os.getpid(),
+            "in_flight": self.in_flight,
+            "requests_total": self.requests_total,
+            "loop_lag": self.loop_lag,
+            "loop_lag_max": max((lag for _, lag in self._lag_samples), default=0.0),
+            "updated_at": time.time(),
+        }
+
+
+worker_metrics = WorkerMetrics()
+
+
+def write_snapshot(snapshot):
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, f"{snapshot['pid']}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def read_snapshots():
+    """全ワーカーの値（このプロセスは書き出し前の最新の値）を返す"""
+    snapshots = {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, "*.json")):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+            snapshots[snapshot["pid"]] = snapshot
+        except (OSError, ValueError, KeyError):
+            continue
+    if worker_metrics.requests_total:
+        snapshots[os.getpid()] = worker_metrics.snapshot()
+    return [snapshots[pid] for pid in sorted(snapshots)]
+
+
+def render_metrics():
+    """Prometheus のテキスト形式"""
+    snapshots = read_snapshots()
+    lines = []
+    for name, kind, description, key in METRICS:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for snapshot in snapshots:
+            lines.append(f'{name}{{pid="{snapshot["pid"]}"}} {snapshot[key]}')
+    lines.append("# HELP app_workers ワーカー数")
+    lines.append("# TYPE app_workers gauge")
+    lines.append(f"app_workers {len(snapshots)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """処理中のリクエスト数を数える ASGI ミドルウェア（レスポンスの送信完了まで数える）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        worker_metrics.ensure_monitor()
+        worker_metrics.in_flight += 1
+        worker_metrics.requests_total += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            worker_metrics.in_flight -= 1
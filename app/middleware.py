@@ -0,0 +1,282 @@
+"""
+ミドルウェア
+"""
+
+import logging
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.storage import FileSystemStorage
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse, JsonResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+
+from .compression import (
+    acompress_chunks,
+    choose_encoding,
+    compress_bytes,
+    compress_chunks,
+    is_compressible,
+)
+from .metrics import render_metrics
+from .observability import NOT_SAMPLED, db_span_wrapper, request_id_var, span
+from .storage import select_media_storage
+
+logger = logging.getLogger(__name__)
+
+
+class HealthCheckMiddleware:
+    """
+    /healthz（プロセスが応答できるか）、/readyz（リクエストを受け付けられるか）、
+    /metrics（ワーカーごとのメトリクス）
+
+    ロードバランサーやコンテナのプローブ、メトリクスの収集から呼ばれるため、
+    ホスト名の検証・セッション・ログ出力などを行う他のミドルウェアより前で応答する。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.migrated = False
+
+    def __call__(self, request):
+        if request.path == "/healthz":
+            return JsonResponse({"status": "ok"})
+        if request.path == "/readyz":
+            return self.readiness()
+        if request.path == "/metrics" and settings.METRICS_ENABLED:
+            return HttpResponse(
+                render_metrics(), content_type="text/plain; version=0.0.4"
+            )
+        return self.get_response(request)
+
+    def readiness(self):
+        checks = {}
+        for name, check in (
+            ("database", self.check_database),
+            ("migrations", self.check_migrations),
+            ("storage", self.check_storage),
+        ):
+            try:
+                check()
+                checks[name] = "ok"
+            except Exception as e:
+                logger.warning("readiness check failed: %s: %s", name, e)
+                checks[name] = "error"
+        ready = all(result == "ok" for result in checks.values())
+        return JsonResponse(
+            {"status": "ok" if ready else "unavailable", "checks": checks},
+            status=200 if ready else 503,
+        )
+
+    def check_database(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    def check_migrations(self):
+        """release サービスでのマイグレーションが済むまでは準備中とする"""
+        if self.migrated:
+            return
+        executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            raise RuntimeError("未適用のマイグレーションがあります")
+        # 一度適用を確認したら、以降は確認しない
+        self.migrated = True
+
+    def check_storage(self):
+        storage = select_media_storage()
+        if isinstance(storage, FileSystemStorage):
+            if not os.access(storage.location, os.W_OK):
+                raise RuntimeError(f"{storage.location} に書き込めません")
+        else:
+            storage.client.head_bucket(Bucket=storage.bucket_name)
+
+
+class RequestContextMiddleware:
+    """
+    リクエストIDの付与とリクエスト全体のトレース
+
+    リクエストID は Nginx が付与した X-Request-ID を引き継ぎ（なければ生成）、
+    ログとスパンに記録してレスポンスヘッダーでも返す。
+    サンプリング対象のリクエストでは DB クエリとテンプレート描画もスパンとして記録する。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        request.request_id = request_id
+        token = request_id_var.set(request_id)
+        start = time.monotonic()
+        try:
+            with span(
+                "http.request",
+                traceparent=request.headers.get("traceparent"),
+                **{"http.method": request.method, "http.target": request.path},
+            ) as current:
+                if current is NOT_SAMPLED:
+                    response = self.get_response(request)
+                else:
+                    with connection.execute_wrapper(db_span_wrapper):
+                        response = self.get_response(request)
+                current.set_attribute("http.status_code", response.status_code)
+                if request.resolver_match is not None:
+                    current.set_attribute("http.route", request.resolver_match.route)
+
+            duration_ms = (time.monotonic() - start) * 1000
+            if duration_ms >= settings.SLOW_REQUEST_THRESHOLD_MS:
+                logger.warning(
+                    "遅いリクエスト: %s %s",
+                    request.method,
+                    request.path,
+                    extra={
+                        "duration_ms": round(duration_ms, 1),
+                        "status_code": response.status_code,
+                    },
+                )
+        finally:
+            request_id_var.reset(token)
+
+        response["X-Request-ID"] = request_id
+        return response
+
+    def process_template_response(self, request, response):
+        render = response.render
+
+        def traced_render():
+            with span("template.render", template=str(response.template_name)):
+                return render()
+
+        response.render = traced_render
+        return response
+
+
+class CompressionMiddleware:
+    """
+    HTML や JSON などのレスポンスを Brotli または gzip で圧縮する
+
+    - 圧縮済みの形式（COMPRESSION_EXCLUDED_TYPES）、COMPRESSION_MIN_SIZE 未満の本文、
+      X-Accel-Redirect で本文を Nginx（または MediaResponder）に任せるレスポンスは圧縮しない
+    - ストリーミングレスポンスはチャンクごとにフラッシュしながら圧縮する
+    - CSRF トークンはレスポンスごとにマスクされるため、BREACH 対策として圧縮を避ける必要はない
+    """
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.has_header("Content-Encoding")
+            or response.has_header("X-Accel-Redirect")
+            or response.status_code in (204, 206, 304)
+            or not is_compressible(response.get("Content-Type", ""))
+            or "no-transform" in response.get("Cache-Control", "")
+        ):
+            return response
+        if (
+            not response.streaming
+            and len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_chunks(
+                    response.streaming_content, encoding
+                )
+            else:
+                response.streaming_content = compress_chunks(
+                    response.streaming_content, encoding
+                )
+            # 圧縮後の長さは送り終えるまでわからない
+            del response.headers["Content-Length"]
+        else:
+            compressed = compress_bytes(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # 圧縮後の本文はバイト単位では一致しないため、強い ETag は弱い ETag にする
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+class RateLimitMiddleware:
+    """
+    ビュークラスの ratelimit_rules / concurrency_limits に従ってリクエストを制限する
+
+    ビューの処理（フォームの解析やパスワードのハッシュ計算）の前に判定し、
+    制限を超えた場合は 429 を返す。
+
+    ASGI では Django がリクエストボディを受信し終えてからミドルウェアを呼ぶため、
+    この判定では大きなアップロードの帯域やディスクは守れない。
+    アップロードのボディの受信は nginx の limit_req / limit_conn で制限する（nginx.conf）。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.RATELIMIT_ENABLED:
+            return self.get_response(request)
+
+        view_class = self._get_view_class(request)
+        rules = getattr(view_class, "ratelimit_rules", ())
+        limits = getattr(view_class, "concurrency_limits", ())
+        if not rules and not limits:
+            return self.get_response(request)
+
+        for rule in rules:
+            if not rule.applies(request):
+                continue
+            allowed, retry_after = rule.hit(request)
+            if not allowed:
+                return self._too_many_requests(retry_after)
+
+        acquired = []
+        try:
+            for limit in limits:
+                if not limit.applies(request):
+                    continue
+                slot = limit.acquire(request)
+                if slot is False:
+                    return self._too_many_requests(settings.RATELIMIT_RETRY_AFTER)
+                if slot:
+                    acquired.append((limit, slot))
+            return self.get_response(request)
+        finally:
+            for limit, slot in acquired:
+                limit.release(slot)
+
+    def _get_view_class(self, request):
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        return getattr(match.func, "view_class", match.func)
+
+    def _too_many_requests(self, retry_after):
+        response = HttpResponse(
+            "リクエストが多すぎます。しばらくしてから再度お試しください。",
+            status=429,
+            content_type="text/plain; charset=utf-8",
+        )
+        response["Retry-After"] = str(max(int(retry_after), 1))
+        return response
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:29
+
+from django.db import migrations, models
+
+import app.models
+import app.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0004_emailoutbox"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="mediafile",
+            name="file",
+            field=models.FileField(
+                storage=app.storage.select_media_storage,
+                upload_to=app.models.media_upload_to,
+                verbose_name="ファイル",
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:31
+
+from django.db import migrations, models
+
+import app.models
+import app.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0005_alter_mediafile_file_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mediafile",
+            name="access_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="アクセス回数"),
+        ),
+        migrations.AddField(
+            model_name="mediafile",
+            name="last_accessed_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="最終アクセス日時"
+            ),
+        ),
+        migrations.AddField(
+            model_name="mediafile",
+            name="storage_tier",
+            field=models.CharField(
+                choices=[("hot", "ホット"), ("cold", "コールド")],
+                db_index=True,
+                default="hot",
+                max_length=10,
+                verbose_name="ストレージ階層",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mediafile",
+            name="tier_changed_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="階層変更日時"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="mediafile",
+            name="file",
+            field=models.FileField(
+                db_index=True,
+                storage=app.storage.select_media_storage,
+                upload_to=app.models.media_upload_to,
+                verbose_name="ファイル",
+            ),
+        ),
+    ]
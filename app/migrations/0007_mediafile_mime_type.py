@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0006_mediafile_storage_tier"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mediafile",
+            name="mime_type",
+            field=models.CharField(
+                blank=True, max_length=100, verbose_name="Content-Type"
+            ),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+import app.models
+import app.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0007_mediafile_mime_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mediafile",
+            name="processing_error",
+            field=models.TextField(blank=True, verbose_name="処理エラー"),
+        ),
+        migrations.AddField(
+            model_name="mediafile",
+            name="processing_started_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="処理開始日時"
+            ),
+        ),
+        migrations.AddField(
+            model_name="mediafile",
+            name="processing_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "処理待ち"),
+                    ("running", "処理中"),
+                    ("done", "処理済み"),
+                    ("failed", "失敗"),
+                ],
+                db_index=True,
+                default="pending",
+                max_length=10,
+                verbose_name="処理状態",
+            ),
+        ),
+        migrations.CreateModel(
+            name="MediaRendition",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "profile",
+                    models.CharField(max_length=20, verbose_name="変換プロファイル"),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        db_index=True,
+                        storage=app.storage.select_media_storage,
+                        upload_to=app.models.rendition_upload_to,
+                        verbose_name="ファイル",
+                    ),
+                ),
+                (
+                    "mime_type",
+                    models.CharField(max_length=100, verbose_name="Content-Type"),
+                ),
+                (
+                    "file_size",
+                    models.PositiveIntegerField(
+                        verbose_name="ファイルサイズ（バイト）"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="作成日時"
+                    ),
+                ),
+                (
+                    "media_file",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="renditions",
+                        to="app.mediafile",
+                        verbose_name="メディアファイル",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "変換済みファイル",
+                "verbose_name_plural": "変換済みファイル",
+                "unique_together": {("media_file", "profile")},
+            },
+        ),
+    ]
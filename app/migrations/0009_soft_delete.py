@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0008_media_processing"),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name="project",
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name="mediafile",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="削除日時"),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="削除日時"),
+        ),
+        migrations.AddIndex(
+            model_name="mediafile",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["project", "-created_at"],
+                name="mediafile_live_project_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mediafile",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", False)),
+                fields=["deleted_at"],
+                name="mediafile_trash_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["owner", "-created_at"],
+                name="project_live_owner_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", False)),
+                fields=["deleted_at"],
+                name="project_trash_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="project",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=("owner", "name"),
+                name="unique_live_project_name",
+            ),
+        ),
+    ]
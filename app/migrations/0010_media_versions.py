@@ -0,0 +1,151 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+import app.models
+import app.storage
+
+
+def create_initial_versions(apps, schema_editor):
+    """既存のメディアファイルの現在の内容を最初の版として登録する"""
+    MediaFile = apps.get_model("app", "MediaFile")
+    MediaFileVersion = apps.get_model("app", "MediaFileVersion")
+    queryset = (
+        MediaFile._base_manager.filter(current_version__isnull=True)
+        .exclude(file="")
+        .order_by("pk")
+    )
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:500])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        versions = MediaFileVersion.objects.bulk_create(
+            [
+                MediaFileVersion(
+                    media_file=media_file,
+                    number=1,
+                    file=media_file.file.name,
+                    file_size=media_file.file_size,
+                    mime_type=media_file.mime_type,
+                    content_hash=media_file.content_hash,
+                    storage_tier=media_file.storage_tier,
+                    created_at=media_file.created_at,
+                )
+                for media_file in batch
+            ]
+        )
+        for media_file, version in zip(batch, versions):
+            media_file.current_version_id = version.pk
+        MediaFile._base_manager.bulk_update(batch, ["current_version"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0009_soft_delete"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mediafile",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                max_length=64,
+                verbose_name="内容のハッシュ（SHA-256）",
+            ),
+        ),
+        migrations.CreateModel(
+            name="MediaFileVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("number", models.PositiveIntegerField(verbose_name="版")),
+                (
+                    "file",
+                    models.FileField(
+                        db_index=True,
+                        storage=app.storage.select_media_storage,
+                        upload_to=app.models.media_upload_to,
+                        verbose_name="ファイル",
+                    ),
+                ),
+                (
+                    "file_size",
+                    models.PositiveIntegerField(
+                        verbose_name="ファイルサイズ（バイト）"
+                    ),
+                ),
+                (
+                    "mime_type",
+                    models.CharField(
+                        blank=True, max_length=100, verbose_name="Content-Type"
+                    ),
+                ),
+                (
+                    "content_hash",
+                    models.CharField(
+                        blank=True,
+                        db_index=True,
+                        max_length=64,
+                        verbose_name="内容のハッシュ（SHA-256）",
+                    ),
+                ),
+                (
+                    "storage_tier",
+                    models.CharField(
+                        choices=[("hot", "ホット"), ("cold", "コールド")],
+                        default="hot",
+                        max_length=10,
+                        verbose_name="ストレージ階層",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="作成日時"
+                    ),
+                ),
+                (
+                    "media_file",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="versions",
+                        to="app.mediafile",
+                        verbose_name="メディアファイル",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "メディアファイルの版",
+                "verbose_name_plural": "メディアファイルの版",
+                "ordering": ["-number"],
+                "unique_together": {("media_file", "number")},
+            },
+        ),
+        migrations.AddField(
+            model_name="mediafile",
+            name="current_version",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="app.mediafileversion",
+                verbose_name="現在の版",
+            ),
+        ),
+        migrations.RunPython(create_initial_versions, migrations.RunPython.noop),
+    ]
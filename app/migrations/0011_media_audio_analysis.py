@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0010_media_versions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mediafile",
+            name="audio_analysis",
+            field=models.JSONField(
+                blank=True, default=dict, verbose_name="音声の解析結果"
+            ),
+        ),
+        migrations.AddField(
+            model_name="mediafile",
+            name="loudness_lufs",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="統合ラウドネス（LUFS）"
+            ),
+        ),
+        migrations.AddField(
+            model_name="mediafile",
+            name="rms_dbfs",
+            field=models.FloatField(blank=True, null=True, verbose_name="RMS（dBFS）"),
+        ),
+        migrations.AddField(
+            model_name="mediafile",
+            name="true_peak_dbtp",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="トゥルーピーク（dBTP）"
+            ),
+        ),
+    ]
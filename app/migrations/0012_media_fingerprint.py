@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0011_media_audio_analysis"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaFingerprint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "version",
+                    models.PositiveSmallIntegerField(verbose_name="形式のバージョン"),
+                ),
+                ("simhash", models.BigIntegerField(verbose_name="simhash")),
+                ("band0", models.PositiveIntegerField(verbose_name="バンド 0")),
+                ("band1", models.PositiveIntegerField(verbose_name="バンド 1")),
+                ("band2", models.PositiveIntegerField(verbose_name="バンド 2")),
+                ("band3", models.PositiveIntegerField(verbose_name="バンド 3")),
+                ("codes", models.BinaryField(verbose_name="指紋")),
+                ("duration", models.FloatField(verbose_name="指紋の長さ（秒）")),
+                (
+                    "similarity",
+                    models.FloatField(blank=True, null=True, verbose_name="類似度"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="作成日時"
+                    ),
+                ),
+                (
+                    "media_file",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fingerprint",
+                        to="app.mediafile",
+                        verbose_name="メディアファイル",
+                    ),
+                ),
+                (
+                    "similar_to",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="app.mediafile",
+                        verbose_name="類似ファイル",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="ユーザー",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "音声の指紋",
+                "verbose_name_plural": "音声の指紋",
+                "indexes": [
+                    models.Index(
+                        fields=["user", "band0"], name="fingerprint_band0_idx"
+                    ),
+                    models.Index(
+                        fields=["user", "band1"], name="fingerprint_band1_idx"
+                    ),
+                    models.Index(
+                        fields=["user", "band2"], name="fingerprint_band2_idx"
+                    ),
+                    models.Index(
+                        fields=["user", "band3"], name="fingerprint_band3_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0012_media_fingerprint"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_active", False), ("last_login__isnull", True)),
+                fields=["date_joined"],
+                name="user_unactivated_idx",
+            ),
+        ),
+    ]
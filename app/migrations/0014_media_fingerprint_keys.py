@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0013_user_unactivated_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaFingerprintKey",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("code", models.BigIntegerField(verbose_name="フレームの指紋")),
+            ],
+            options={
+                "verbose_name": "音声の指紋の検索キー",
+                "verbose_name_plural": "音声の指紋の検索キー",
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="mediafingerprint",
+            name="fingerprint_band0_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="mediafingerprint",
+            name="fingerprint_band1_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="mediafingerprint",
+            name="fingerprint_band2_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="mediafingerprint",
+            name="fingerprint_band3_idx",
+        ),
+        migrations.RemoveField(
+            model_name="mediafingerprint",
+            name="band0",
+        ),
+        migrations.RemoveField(
+            model_name="mediafingerprint",
+            name="band1",
+        ),
+        migrations.RemoveField(
+            model_name="mediafingerprint",
+            name="band2",
+        ),
+        migrations.RemoveField(
+            model_name="mediafingerprint",
+            name="band3",
+        ),
+        migrations.RemoveField(
+            model_name="mediafingerprint",
+            name="simhash",
+        ),
+        migrations.AddField(
+            model_name="mediafingerprintkey",
+            name="fingerprint",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="keys",
+                to="app.mediafingerprint",
+                verbose_name="音声の指紋",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mediafingerprintkey",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="ユーザー",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mediafingerprintkey",
+            index=models.Index(
+                fields=["user", "code"], name="fingerprint_key_code_idx"
+            ),
+        ),
+    ]
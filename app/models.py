@@ -1,53 +1,51 @@
+import logging
 import os
-import time
+from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.files.storage import FileSystemStorage
-from django.db import models
-from django.db.models.signals import post_delete
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
+from .cache import bump_media_list_version
+from .mediatypes import guess_content_type
+from .observability import span
 
-class SafeMediaFileStorage(FileSystemStorage):
-    """
-    安全なメディアファイルストレージ
-    """
+# SafeMediaFileStorage は既存のマイグレーションから参照されるため再エクスポートする
+from .storage import SafeMediaFileStorage, select_media_storage  # noqa: F401
 
-    def get_available_name(self, name, max_length=None):
-        """
-        ファイル名を安全な形式に変換し、重複を避ける
-        """
-        # 絶対パスを相対パスに変換
-        if os.path.isabs(name):
-            name = os.path.basename(name)
-
-        # ディレクトリとファイル名に分割
-        dir_name = os.path.dirname(name)
-        base_name = os.path.basename(name)
-        safe_base_name = self._get_safe_filename(base_name)
-        # ディレクトリが存在する場合は結合、そうでなければファイル名のみ
-        safe_name = (
-            os.path.join(dir_name, safe_base_name) if dir_name else safe_base_name
-        )
+logger = logging.getLogger(__name__)
 
-        # 重複チェックのため元のget_available_nameメソッドを呼び出し
-        return super().get_available_name(safe_name, max_length)
+# 主要なブラウザがそのまま再生できる Content-Type
+WEB_PLAYABLE_TYPES = {
+    "audio/mpeg",
+    "audio/mp4",
+    "audio/aac",
+    "audio/ogg",
+    "audio/webm",
+    "audio/flac",
+    "audio/wav",
+    "video/mp4",
+    "video/webm",
+}
 
-    def _get_safe_filename(self, filename):
-        """
-        ファイル名をタイムスタンプベースの安全な形式に変換
-        """
-        # ファイル拡張子を取得
-        _, ext = os.path.splitext(filename)
 
-        # タイムスタンプベースのファイル名を生成
-        timestamp = int(time.time() * 1000)  # ミリ秒のタイムスタンプ
+class SoftDeleteQuerySet(models.QuerySet):
+    def alive(self):
+        return self.filter(deleted_at__isnull=True)
+
+    def trashed(self):
+        return self.filter(deleted_at__isnull=False)
+
 
-        # 安全なファイル名を生成
-        safe_name = f"media_{timestamp}{ext}"
+class LiveManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """ゴミ箱に移動していないレコードのみを返すマネージャー"""
 
-        return safe_name
+    def get_queryset(self):
+        return super().get_queryset().alive()
 
 
 class User(AbstractUser):
@@ -55,6 +53,16 @@ class User(AbstractUser):
 
     email = models.EmailField(unique=True, verbose_name="メールアドレス")
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # アクティベーションされないまま残ったユーザーの削除（cleanup_accounts コマンド）
+            models.Index(
+                fields=["date_joined"],
+                condition=models.Q(is_active=False, last_login__isnull=True),
+                name="user_unactivated_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.username
 
@@ -69,16 +77,184 @@ class Project(models.Model):
     description = models.TextField(blank=True, verbose_name="説明")
     created_at = models.DateTimeField(default=timezone.now, verbose_name="作成日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+    deleted_at = models.DateTimeField(null=True, blank=True, verbose_name="削除日時")
+
+    objects = LiveManager()
+    all_objects = SoftDeleteQuerySet.as_manager()
 
     class Meta:
         verbose_name = "プロジェクト"
         verbose_name_plural = "プロジェクト"
-        unique_together = ("owner", "name")
         ordering = ["-created_at"]
+        constraints = [
+            # ゴミ箱内のプロジェクトと同じ名前のプロジェクトは作成できる
+            models.UniqueConstraint(
+                fields=["owner", "name"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="unique_live_project_name",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["owner", "-created_at"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="project_live_owner_idx",
+            ),
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(deleted_at__isnull=False),
+                name="project_trash_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def soft_delete(self):
+        """
+        プロジェクトと中のメディアファイルをゴミ箱に移動する
+
+        メディアファイルには同じ削除日時を設定し、復元時にまとめて戻せるようにする。
+        ファイルの削除は purge_trash コマンドが保持期間の経過後に行う。
+        ゴミ箱に移動したメディアファイルの件数を返す。
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            self.deleted_at = now
+            self.save(update_fields=["deleted_at", "updated_at"])
+            count = MediaFile.objects.filter(
+                user_id=self.owner_id, project=self
+            ).update(deleted_at=now, updated_at=now)
+        bump_media_list_version(self.pk)
+        return count
+
+    def restore(self):
+        """ゴミ箱から復元する（プロジェクトと一緒に削除されたメディアファイルも戻す）"""
+        deleted_at = self.deleted_at
+        now = timezone.now()
+        with transaction.atomic():
+            self.deleted_at = None
+            self.save(update_fields=["deleted_at", "updated_at"])
+            MediaFile.all_objects.filter(
+                user_id=self.owner_id, project=self, deleted_at=deleted_at
+            ).update(deleted_at=None, updated_at=now)
+        bump_media_list_version(self.pk)
+
+
+class EmailOutbox(models.Model):
+    """
+    送信待ちメールのアウトボックス
+
+    リクエスト処理中はレコードの作成のみ行い、実際の送信は
+    send_outbox コマンドがバックグラウンドでまとめて行う。
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "送信待ち"),
+        (STATUS_SENT, "送信済み"),
+        (STATUS_FAILED, "送信失敗"),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="outbox_emails",
+        verbose_name="ユーザー",
+        null=True,
+        blank=True,
+    )
+    to_email = models.EmailField(verbose_name="宛先")
+    subject = models.CharField(max_length=255, verbose_name="件名")
+    body = models.TextField(verbose_name="本文")
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name="状態",
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="試行回数")
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now, verbose_name="次回送信日時"
+    )
+    last_error = models.TextField(blank=True, verbose_name="最後のエラー")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="作成日時")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="送信日時")
+
+    class Meta:
+        verbose_name = "送信メール"
+        verbose_name_plural = "送信メール"
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email}"
+
+
+def is_file_referenced(name):
+    """メディアファイルまたはその版がファイルを参照しているかどうか"""
+    return (
+        MediaFile.all_objects.filter(file=name).exists()
+        or MediaFileVersion.objects.filter(file=name).exists()
+    )
+
+
+def release_stored_file(file, delete):
+    """
+    どのレコードからも参照されなくなったファイルを削除する
+
+    参照の確認と削除はトランザクションのコミット後に行うため、
+    カスケード削除で複数のレコードが同時に削除された場合も正しく判定できる。
+    """
+    if not file:
+        return
+    name = file.name
+
+    def release():
+        if is_file_referenced(name):
+            return
+        with span("storage.delete_physical_file", **{"storage.name": name}):
+            delete()
+
+    transaction.on_commit(release)
+
+
+def delete_stored_file(file, get_path):
+    """
+    ストレージ上のファイルを削除する（ファイルシステムでは空になったディレクトリも削除）
+
+    get_path はローカルファイルのパスを返す関数（ファイルシステムストレージのみ使用）。
+    """
+    storage = file.storage
+    if not isinstance(storage, FileSystemStorage):
+        # オブジェクトストレージにはディレクトリがないためオブジェクトのみ削除
+        try:
+            storage.delete(file.name)
+            logger.info("メディアファイルを削除しました: %s", file.name)
+        except Exception:
+            logger.exception("メディアファイル削除エラー: %s", file.name)
+        return
+
+    try:
+        file_path = get_path()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            logger.info("メディアファイルを削除しました: %s", file_path)
+
+            # ディレクトリが空になったら削除
+            file_dir = os.path.dirname(file_path)
+            if os.path.exists(file_dir) and not os.listdir(file_dir):
+                try:
+                    os.rmdir(file_dir)
+                    logger.info("空のディレクトリを削除: %s", file_dir)
+                except OSError:
+                    pass  # ディレクトリが空でない場合は無視
+
+    except (OSError, ValueError, AttributeError):
+        logger.exception("メディアファイル削除エラー: %s", file.name)
+
 
 def media_upload_to(instance, filename):
     """ユーザー/プロジェクトのディレクトリへ保存するパスを返す"""
@@ -95,6 +271,24 @@ class MediaFile(models.Model):
         ("video", "動画"),
     ]
 
+    TIER_HOT = "hot"
+    TIER_COLD = "cold"
+    TIER_CHOICES = [
+        (TIER_HOT, "ホット"),
+        (TIER_COLD, "コールド"),
+    ]
+
+    PROCESSING_PENDING = "pending"
+    PROCESSING_RUNNING = "running"
+    PROCESSING_DONE = "done"
+    PROCESSING_FAILED = "failed"
+    PROCESSING_STATUS_CHOICES = [
+        (PROCESSING_PENDING, "処理待ち"),
+        (PROCESSING_RUNNING, "処理中"),
+        (PROCESSING_DONE, "処理済み"),
+        (PROCESSING_FAILED, "失敗"),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="ユーザー")
     project = models.ForeignKey(
         Project,
@@ -111,18 +305,88 @@ class MediaFile(models.Model):
     )
     file = models.FileField(
         upload_to=media_upload_to,
-        storage=SafeMediaFileStorage(),
+        storage=select_media_storage,
+        db_index=True,
         verbose_name="ファイル",
     )
     file_size = models.PositiveIntegerField(verbose_name="ファイルサイズ（バイト）")
+    mime_type = models.CharField(
+        max_length=100, blank=True, verbose_name="Content-Type"
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name="内容のハッシュ（SHA-256）",
+    )
+    current_version = models.ForeignKey(
+        "MediaFileVersion",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="現在の版",
+    )
     duration = models.DurationField(null=True, blank=True, verbose_name="再生時間")
+    loudness_lufs = models.FloatField(
+        null=True, blank=True, verbose_name="統合ラウドネス（LUFS）"
+    )
+    true_peak_dbtp = models.FloatField(
+        null=True, blank=True, verbose_name="トゥルーピーク（dBTP）"
+    )
+    rms_dbfs = models.FloatField(null=True, blank=True, verbose_name="RMS（dBFS）")
+    # RMS エンベロープと無音区間など（app.analysis.AudioAnalyzer.result）
+    audio_analysis = models.JSONField(
+        default=dict, blank=True, verbose_name="音声の解析結果"
+    )
+    storage_tier = models.CharField(
+        max_length=10,
+        choices=TIER_CHOICES,
+        default=TIER_HOT,
+        db_index=True,
+        verbose_name="ストレージ階層",
+    )
+    tier_changed_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="階層変更日時"
+    )
+    processing_status = models.CharField(
+        max_length=10,
+        choices=PROCESSING_STATUS_CHOICES,
+        default=PROCESSING_PENDING,
+        db_index=True,
+        verbose_name="処理状態",
+    )
+    processing_started_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="処理開始日時"
+    )
+    processing_error = models.TextField(blank=True, verbose_name="処理エラー")
+    access_count = models.PositiveIntegerField(default=0, verbose_name="アクセス回数")
+    last_accessed_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="最終アクセス日時"
+    )
     created_at = models.DateTimeField(default=timezone.now, verbose_name="作成日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+    deleted_at = models.DateTimeField(null=True, blank=True, verbose_name="削除日時")
+
+    objects = LiveManager()
+    all_objects = SoftDeleteQuerySet.as_manager()
 
     class Meta:
         verbose_name = "メディアファイル"
         verbose_name_plural = "メディアファイル"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["project", "-created_at"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="mediafile_live_project_idx",
+            ),
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(deleted_at__isnull=False),
+                name="mediafile_trash_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.get_file_type_display()})"
@@ -131,6 +395,63 @@ class MediaFile(models.Model):
         """ファイルサイズをMB単位で返す"""
         return round(self.file_size / (1024 * 1024), 2)
 
+    def get_mime_type(self):
+        """
+        Content-Type を返す
+
+        アップロード時にファイルシグネチャから判定した値を使い、
+        未判定の古いレコードは拡張子から推測する。
+        """
+        if self.mime_type:
+            return self.mime_type
+        if self.file:
+            return guess_content_type(self.file.name) or "application/octet-stream"
+        return "application/octet-stream"
+
+    def get_playback_source(self):
+        """
+        再生に使うファイル（元ファイルまたは変換済みファイル）を返す
+
+        ブラウザで再生できる候補のうち最もサイズの小さいものを選ぶ。
+        renditions は prefetch_related しておくこと。
+        """
+        candidates = list(self.renditions.all())
+        if self.get_mime_type() in WEB_PLAYABLE_TYPES or not candidates:
+            candidates.append(self)
+        return min(candidates, key=lambda source: source.file_size)
+
+    def get_physical_path(self):
+        """ストレージ階層を考慮したローカルファイルのパスを返す"""
+        if self.storage_tier == self.TIER_COLD:
+            return os.path.join(settings.MEDIA_COLD_ROOT, self.file.name)
+        return self.file.path
+
+    def get_envelope_points(self, width=600, height=60, floor_db=-60):
+        """RMS エンベロープを SVG の polyline の points にする（上端が 0 dBFS）"""
+        envelope = self.audio_analysis.get("envelope") or []
+        if len(envelope) < 2:
+            return ""
+        step = width / (len(envelope) - 1)
+        return " ".join(
+            f"{i * step:.1f},{height * min(max(level / floor_db, 0), 1):.1f}"
+            for i, level in enumerate(envelope)
+        )
+
+    def get_silence_regions(self, limit=10):
+        """無音区間の（開始, 終了）を timedelta で返す（先頭から limit 件）"""
+        return [
+            (timedelta(seconds=round(start)), timedelta(seconds=round(end)))
+            for start, end in (self.audio_analysis.get("silences") or [])[:limit]
+        ]
+
+    def get_similar_file(self):
+        """音声の指紋から見つかった類似ファイル（ゴミ箱内のものを除く。ない場合は None）"""
+        fingerprint = getattr(self, "fingerprint", None)
+        similar = fingerprint.similar_to if fingerprint else None
+        if similar is None or similar.deleted_at is not None:
+            return None
+        return similar
+
     def get_safe_filename(self):
         """安全なファイル名を取得"""
         if self.file:
@@ -140,25 +461,24 @@ class MediaFile(models.Model):
     def delete_physical_file(self):
         """
         メディアファイルの物理ファイルを削除
+
+        同じファイルを他のレコード（版や内容が同じ別のメディアファイル）が
+        参照している場合は削除しない。
         """
-        if self.file:
-            try:
-                file_path = self.file.path
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    print(f"メディアファイルを削除しました: {file_path}")
-
-                    # ディレクトリが空になったら削除
-                    file_dir = os.path.dirname(file_path)
-                    if os.path.exists(file_dir) and not os.listdir(file_dir):
-                        try:
-                            os.rmdir(file_dir)
-                            print(f"空のディレクトリを削除: {file_dir}")
-                        except OSError:
-                            pass  # ディレクトリが空でない場合は無視
-
-            except (OSError, ValueError, AttributeError) as e:
-                print(f"メディアファイル削除エラー: {e}")
+        release_stored_file(self.file, self._delete_physical_file)
+
+    def _delete_physical_file(self):
+        delete_stored_file(self.file, self.get_physical_path)
+
+    def soft_delete(self):
+        """ゴミ箱に移動する（ファイルは purge_trash コマンドが保持期間の経過後に削除する）"""
+        self.deleted_at = timezone.now()
+        self.save(update_fields=["deleted_at", "updated_at"])
+
+    def restore(self):
+        """ゴミ箱から復元する"""
+        self.deleted_at = None
+        self.save(update_fields=["deleted_at", "updated_at"])
 
     def delete(self, *args, **kwargs):
         """
@@ -169,6 +489,186 @@ class MediaFile(models.Model):
         super().delete(*args, **kwargs)
 
 
+def rendition_upload_to(instance, filename):
+    """変換済みファイルは元ファイルと同じディレクトリの renditions/ 以下に保存する"""
+    media_file = instance.media_file
+    return os.path.join(
+        os.path.dirname(media_file.file.name), "renditions", os.path.basename(filename)
+    )
+
+
+class MediaRendition(models.Model):
+    """Web で再生しやすい形式に変換したメディアファイル"""
+
+    media_file = models.ForeignKey(
+        MediaFile,
+        on_delete=models.CASCADE,
+        related_name="renditions",
+        verbose_name="メディアファイル",
+    )
+    profile = models.CharField(max_length=20, verbose_name="変換プロファイル")
+    file = models.FileField(
+        upload_to=rendition_upload_to,
+        storage=select_media_storage,
+        db_index=True,
+        verbose_name="ファイル",
+    )
+    mime_type = models.CharField(max_length=100, verbose_name="Content-Type")
+    file_size = models.PositiveIntegerField(verbose_name="ファイルサイズ（バイト）")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="作成日時")
+
+    class Meta:
+        verbose_name = "変換済みファイル"
+        verbose_name_plural = "変換済みファイル"
+        unique_together = ["media_file", "profile"]
+
+    def __str__(self):
+        return f"{self.media_file} [{self.profile}]"
+
+    def get_mime_type(self):
+        return self.mime_type
+
+    def delete_physical_file(self):
+        if not self.file:
+            return
+        with span("storage.delete_physical_file", **{"storage.name": self.file.name}):
+            delete_stored_file(self.file, lambda: self.file.path)
+
+
+class MediaFingerprint(models.Model):
+    """
+    メディアファイルの音声の指紋（app.fingerprint）
+
+    フレームごとの 32 ビットの指紋のうち間引いたものを MediaFingerprintKey に持ち、
+    一致するキーが多いものを類似ファイルの候補にする。
+    """
+
+    media_file = models.OneToOneField(
+        MediaFile,
+        on_delete=models.CASCADE,
+        related_name="fingerprint",
+        verbose_name="メディアファイル",
+    )
+    # 検索を同じユーザーのファイルに限るため、インデックスに含める
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+", verbose_name="ユーザー"
+    )
+    version = models.PositiveSmallIntegerField(verbose_name="形式のバージョン")
+    codes = models.BinaryField(verbose_name="指紋")
+    duration = models.FloatField(verbose_name="指紋の長さ（秒）")
+    similar_to = models.ForeignKey(
+        MediaFile,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="類似ファイル",
+    )
+    similarity = models.FloatField(null=True, blank=True, verbose_name="類似度")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="作成日時")
+
+    class Meta:
+        verbose_name = "音声の指紋"
+        verbose_name_plural = "音声の指紋"
+
+    def __str__(self):
+        return f"{self.media_file_id} v{self.version}"
+
+
+class MediaFingerprintKey(models.Model):
+    """音声の指紋の検索キー（間引いたフレームの 32 ビットの指紋。完全一致で検索する）"""
+
+    fingerprint = models.ForeignKey(
+        MediaFingerprint,
+        on_delete=models.CASCADE,
+        related_name="keys",
+        verbose_name="音声の指紋",
+    )
+    # 検索を同じユーザーのファイルに限るため、インデックスに含める
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+", verbose_name="ユーザー"
+    )
+    code = models.BigIntegerField(verbose_name="フレームの指紋")
+
+    class Meta:
+        verbose_name = "音声の指紋の検索キー"
+        verbose_name_plural = "音声の指紋の検索キー"
+        indexes = [
+            models.Index(fields=["user", "code"], name="fingerprint_key_code_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.fingerprint_id}: {self.code:08x}"
+
+
+class MediaFileVersion(models.Model):
+    """
+    メディアファイルの内容の版
+
+    MediaFile の file / file_size / mime_type / content_hash は現在の版の値を保持する。
+    内容が同じ版はファイルを共有する。
+    """
+
+    media_file = models.ForeignKey(
+        MediaFile,
+        on_delete=models.CASCADE,
+        related_name="versions",
+        verbose_name="メディアファイル",
+    )
+    number = models.PositiveIntegerField(verbose_name="版")
+    file = models.FileField(
+        upload_to=media_upload_to,
+        storage=select_media_storage,
+        db_index=True,
+        verbose_name="ファイル",
+    )
+    file_size = models.PositiveIntegerField(verbose_name="ファイルサイズ（バイト）")
+    mime_type = models.CharField(
+        max_length=100, blank=True, verbose_name="Content-Type"
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name="内容のハッシュ（SHA-256）",
+    )
+    storage_tier = models.CharField(
+        max_length=10,
+        choices=MediaFile.TIER_CHOICES,
+        default=MediaFile.TIER_HOT,
+        verbose_name="ストレージ階層",
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="作成日時")
+
+    class Meta:
+        verbose_name = "メディアファイルの版"
+        verbose_name_plural = "メディアファイルの版"
+        unique_together = ["media_file", "number"]
+        ordering = ["-number"]
+
+    def __str__(self):
+        return f"{self.media_file} (v{self.number})"
+
+    def get_file_size_mb(self):
+        return round(self.file_size / (1024 * 1024), 2)
+
+    def get_mime_type(self):
+        if self.mime_type:
+            return self.mime_type
+        return guess_content_type(self.file.name) or "application/octet-stream"
+
+    def get_physical_path(self):
+        """ストレージ階層を考慮したローカルファイルのパスを返す"""
+        if self.storage_tier == MediaFile.TIER_COLD:
+            return os.path.join(settings.MEDIA_COLD_ROOT, self.file.name)
+        return self.file.path
+
+    def delete_physical_file(self):
+        release_stored_file(
+            self.file, lambda: delete_stored_file(self.file, self.get_physical_path)
+        )
+
+
 @receiver(post_delete, sender=MediaFile)
 def delete_media_file(sender, instance, **kwargs):
     """
@@ -181,3 +681,49 @@ def delete_media_file(sender, instance, **kwargs):
     """
     # モデルのメソッドを再利用
     instance.delete_physical_file()
+
+
+@receiver(post_delete, sender=MediaFileVersion)
+def delete_version_file(sender, instance, **kwargs):
+    """版の削除時に、参照されなくなった物理ファイルを削除"""
+    instance.delete_physical_file()
+
+
+@receiver(post_save, sender=MediaFile)
+def create_initial_version(sender, instance, created, raw=False, **kwargs):
+    """メディアファイルの作成時に最初の版を作成"""
+    if not created or raw or not instance.file:
+        return
+    version = MediaFileVersion.objects.create(
+        media_file=instance,
+        number=1,
+        file=instance.file.name,
+        file_size=instance.file_size,
+        mime_type=instance.mime_type,
+        content_hash=instance.content_hash,
+        storage_tier=instance.storage_tier,
+        created_at=instance.created_at,
+    )
+    MediaFile.all_objects.filter(pk=instance.pk).update(current_version=version)
+    instance.current_version = version
+
+
+@receiver(post_delete, sender=MediaRendition)
+def delete_rendition_file(sender, instance, **kwargs):
+    """
+    変換済みファイルの削除時に物理ファイルを削除
+
+    版の切り替えなどがロールバックされた場合にレコードだけが残らないよう、
+    ファイルはトランザクションのコミット後に削除する。
+    """
+    transaction.on_commit(instance.delete_physical_file)
+
+
+@receiver(post_save, sender=MediaFile)
+@receiver(post_delete, sender=MediaFile)
+def invalidate_media_list_cache(sender, instance, **kwargs):
+    """
+    メディアファイルの追加・変更・削除時に一覧ページのキャッシュを無効化
+    """
+    if instance.project_id:
+        bump_media_list_version(instance.project_id)
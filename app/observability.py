@@ -0,0 +1,393 @@
+"""
+構造化ログ・リクエストID・トレース（スパン）
+
+スパンは OpenTelemetry のデータモデルに合わせた最小限の実装で、
+ルートスパンでサンプリングを決定し、記録対象のスパンのみを
+バックグラウンドスレッドでファイルまたは OTLP/HTTP（JSON）へ書き出す。
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import secrets
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+request_id_var = ContextVar("request_id", default=None)
+_current_span = ContextVar("current_span", default=None)
+
+# ログレコードの標準属性（JSON の追加フィールドから除外する）
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class RequestIdFilter(logging.Filter):
+    """ログレコードにリクエストIDとトレースIDを付与する"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        span = _current_span.get()
+        record.trace_id = span.trace_id if span is not None else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """ログを1行の JSON として出力するフォーマッター"""
+
+    def format(self, record):
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and value is not None:
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class QueueStreamHandler(logging.handlers.QueueHandler):
+    """
+    フォーマットまでを呼び出し元で行い、書き出しは別スレッドで行うハンドラー
+
+    リクエスト処理中に標準出力への書き込みで待たされないようにする。
+    fork 後のプロセスでは最初の出力時に書き出しスレッドを起動し直す。
+    """
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.target.setFormatter(logging.Formatter("%(message)s"))
+        self._listener = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+
+    def emit(self, record):
+        if self._listener_pid != os.getpid():
+            self._start_listener()
+        super().emit(record)
+
+    def _start_listener(self):
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+            self.queue = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(self.queue, self.target)
+            self._listener.start()
+            self._listener_pid = os.getpid()
+            atexit.register(self._listener.stop)
+
+
+class Span:
+    """トレースのスパン"""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "status",
+        "request_id",
+    )
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "OK"
+        self.request_id = request_id_var.get()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "request_id": self.request_id,
+            "attributes": self.attributes,
+        }
+
+
+class _NotSampled:
+    """サンプリング対象外のトレースを表すマーカー（子スパンも記録しない）"""
+
+    trace_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NOT_SAMPLED = _NotSampled()
+
+
+_STOP = object()
+
+
+class SpanExporter:
+    """
+    終了したスパンをバックグラウンドスレッドでまとめて書き出す
+
+    キューが一杯の場合はスパンを破棄し、リクエスト処理を待たせない。
+    """
+
+    def __init__(self, max_queue_size=10000, batch_size=512, interval=2.0):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, span):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="span-exporter", daemon=True
+            )
+            self._thread.start()
+            atexit.register(self._shutdown)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._export_safely(batch)
+
+    def _shutdown(self):
+        """終了時に残りのスパンを書き出す"""
+        if self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+    def _export_safely(self, batch):
+        try:
+            self.export(batch)
+        except Exception:
+            logging.getLogger(__name__).warning(
+                "スパンの書き出しに失敗しました", exc_info=True
+            )
+
+    def export(self, spans):
+        raise NotImplementedError
+
+
+class FileSpanExporter(SpanExporter):
+    """スパンを JSON Lines 形式でファイルに追記する"""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = str(path)
+
+    def export(self, spans):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str))
+                f.write("\n")
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """スパンを OTLP/HTTP（JSON エンコーディング）で送信する"""
+
+    def __init__(self, endpoint, service_name, timeout=5, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, spans):
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            _otlp_attribute("service.name", self.service_name)
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "app"},
+                            "spans": [self._otlp_span(s) for s in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload, default=str).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+    def _otlp_span(self, span):
+        attributes = dict(span.attributes)
+        if span.request_id:
+            attributes["request.id"] = span.request_id
+        data = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in attributes.items()],
+            "status": {"code": 1 if span.status == "OK" else 2},
+        }
+        if span.parent_id:
+            data["parentSpanId"] = span.parent_id
+        return data
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                if settings.TRACING_EXPORTER == "otlp":
+                    _exporter = OtlpHttpSpanExporter(
+                        settings.TRACING_OTLP_ENDPOINT, settings.TRACING_SERVICE_NAME
+                    )
+                else:
+                    _exporter = FileSpanExporter(settings.TRACING_FILE_PATH)
+    return _exporter
+
+
+def start_trace(traceparent=None):
+    """
+    ルートスパンの親となるトレースIDとサンプリング可否を決定する
+
+    W3C の traceparent ヘッダーが渡された場合はその値に従う。
+    """
+    if traceparent:
+        parts = traceparent.split("-")
+        if len(parts) == 4 and len(parts[1]) == 32:
+            return parts[1], parts[2], parts[3] == "01"
+    sampled = random.random() < settings.TRACING_SAMPLE_RATE
+    return secrets.token_hex(16), None, sampled
+
+
+@contextmanager
+def span(name, traceparent=None, **attributes):
+    """
+    処理をスパンとして記録するコンテキストマネージャー
+
+    トレーシングが無効な場合やサンプリング対象外の場合は何も記録しない。
+    """
+    if not settings.TRACING_ENABLED:
+        yield NOT_SAMPLED
+        return
+
+    parent = _current_span.get()
+    if parent is NOT_SAMPLED:
+        yield NOT_SAMPLED
+        return
+    if parent is None:
+        trace_id, parent_id, sampled = start_trace(traceparent)
+        if not sampled:
+            token = _current_span.set(NOT_SAMPLED)
+            try:
+                yield NOT_SAMPLED
+            finally:
+                _current_span.reset(token)
+            return
+    else:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+
+    current = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "ERROR"
+        current.set_attribute("exception.type", type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        get_exporter().submit(current)
+
+
+def db_span_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper 用の DB クエリのスパン"""
+    if _current_span.get() in (None, NOT_SAMPLED):
+        return execute(sql, params, many, context)
+    with span(
+        "db.query",
+        **{
+            "db.system": context["connection"].vendor,
+            "db.statement": sql[:1000],
+            "db.many": many,
+        },
+    ):
+        return execute(sql, params, many, context)
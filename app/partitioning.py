@@ -0,0 +1,516 @@
+"""
+メディアファイルのテーブル（app_mediafile）の宣言的パーティショニング（PostgreSQL のみ・任意）
+
+- hash: user_id のハッシュで分割する。ユーザーを指定した一覧・更新・削除は 1 つの
+  パーティションだけを対象にし、VACUUM やインデックスの肥大化もパーティションごとに進む
+- range: created_at の月ごとに分割する。古い月はパーティションごと切り離して一括削除できる
+
+パーティションキーを含まない一意制約は作れないため、主キーは (id, パーティションキー) になり、
+app_mediafile(id) を参照する外部キー制約は削除する。関連レコードの CASCADE / SET_NULL は
+もともと Django が行っているため、アプリケーションの動作は変わらない。
+
+変換はテーブルを長時間ロックせずに行う。
+1. 同じ列を持つパーティションテーブル（app_mediafile_part）を作り、元のテーブルへの変更を
+   トリガーで反映する
+2. 既存の行を id の範囲ごとに少しずつコピーする
+3. 短いトランザクションでテーブル名を入れ替える（元のテーブルは app_mediafile_unpartitioned
+   として残す）
+"""
+
+import re
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db import OperationalError, connection, transaction
+from django.db.models.deletion import Collector
+from django.utils import timezone
+
+from .models import MediaFile
+
+TABLE = MediaFile._meta.db_table
+SHADOW_TABLE = f"{TABLE}_part"
+UNPARTITIONED_TABLE = f"{TABLE}_unpartitioned"
+SYNC_FUNCTION = f"{TABLE}_part_sync"
+DEFAULT_PARTITION = f"{TABLE}_default"
+# 切り離した後、関連レコードとファイルの削除が終わるまでのパーティションの名前の末尾
+PURGING_SUFFIX = "_purging"
+STRATEGIES = ("hash", "range")
+PARTITION_KEYS = {"hash": "user_id", "range": "created_at"}
+STRATEGY_CODES = {"h": "hash", "r": "range"}
+# ATTACH PARTITION が親テーブルへの書き込みを止めなくなったバージョン
+MIN_SERVER_VERSION = 120000
+# 既存の行のコピーの進捗を表示する間隔（バッチ数）
+PROGRESS_INTERVAL = 100
+# ACCESS EXCLUSIVE ロックを待つ時間の上限（待っている間は後続のクエリも止まるため短くし、
+# 取れなければ少し待って再試行する）
+LOCK_TIMEOUT = "2s"
+LOCK_RETRIES = 10
+LOCK_NOT_AVAILABLE = "55P03"
+
+INDEX_RE = re.compile(r"^CREATE (?:UNIQUE )?INDEX \S+ ON \S+ (USING .+)$")
+RANGE_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _suffixed(name, suffix):
+    """PostgreSQL の識別子の長さ（63 バイト）に収まるよう末尾を付ける"""
+    return name[: 63 - len(suffix)] + suffix
+
+
+def _fetchall(sql, params=None):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _execute(*statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def _timestamp(value):
+    return f"'{value.isoformat()}'::timestamptz"
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _next_month(value):
+    return _month_start(value.replace(day=28) + timedelta(days=4))
+
+
+def _month_partition_name(start):
+    return f"{TABLE}_{start:%Y%m}"
+
+
+def check_server():
+    if connection.vendor != "postgresql":
+        raise PartitioningError("パーティショニングは PostgreSQL でのみ使えます")
+    connection.ensure_connection()
+    if connection.pg_version < MIN_SERVER_VERSION:
+        raise PartitioningError("PostgreSQL 12 以降が必要です")
+
+
+def get_strategy(table=TABLE):
+    """テーブルの分割方式（hash / range、分割されていなければ None）"""
+    if connection.vendor != "postgresql":
+        return None
+    rows = _fetchall(
+        "SELECT partstrat FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass(%s)",
+        [table],
+    )
+    return STRATEGY_CODES.get(rows[0][0]) if rows else None
+
+
+def _require_strategy(strategy):
+    check_server()
+    current = get_strategy()
+    if current != strategy:
+        raise PartitioningError(
+            f"{TABLE} は {strategy} で分割されていません（現在: {current or 'なし'}）"
+        )
+
+
+def list_partitions(table=TABLE):
+    """(名前, 範囲, 推定行数, サイズ) のリスト"""
+    return _fetchall(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), "
+        "greatest(c.reltuples, 0)::bigint, pg_total_relation_size(c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+        [table],
+    )
+
+
+def range_partitions(table=TABLE):
+    """range で分割したテーブルの (名前, 開始, 終了) のリスト（既定のパーティションを除く）"""
+    partitions = []
+    for name, bound, _rows, _size in list_partitions(table):
+        match = RANGE_BOUND_RE.search(bound)
+        if match:
+            start, end = (datetime.fromisoformat(value) for value in match.groups())
+            partitions.append((name, start, end))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def _run_with_lock_timeout(func):
+    """
+    ACCESS EXCLUSIVE ロックが必要な func を LOCK_TIMEOUT 付きのトランザクションで実行する
+
+    長いクエリが終わるのを待つ間に後続のクエリを止めないよう、ロックを取れなければ
+    いったん諦めて再試行する。
+    """
+    for attempt in range(LOCK_RETRIES):
+        try:
+            with transaction.atomic():
+                _execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                return func()
+        except OperationalError as e:
+            if getattr(e.__cause__, "sqlstate", None) != LOCK_NOT_AVAILABLE:
+                raise
+            time.sleep(attempt + 1)
+    raise PartitioningError(
+        "ロックを取得できませんでした。時間をおいて再実行してください"
+    )
+
+
+# --- 変換 ---
+
+
+def convert(strategy, partitions, months_ahead, batch_size, sleep, log):
+    """app_mediafile をパーティションテーブルに変換する（途中で止めても再実行できる）"""
+    check_server()
+    if get_strategy() is not None:
+        raise PartitioningError(f"{TABLE} は既に分割されています")
+    shadow_strategy = get_strategy(SHADOW_TABLE)
+    if shadow_strategy is None:
+        _create_shadow_table(strategy, partitions, months_ahead)
+        log(f"{SHADOW_TABLE} を作成し、変更の反映を開始しました")
+    elif shadow_strategy != strategy:
+        raise PartitioningError(
+            f"作成済みの {SHADOW_TABLE} の分割方式が {strategy} ではありません"
+        )
+    copied = backfill(batch_size, sleep, log)
+    log(f"既存の行をコピーしました: {copied}件")
+    _run_with_lock_timeout(_swap_tables)
+    _execute(f"ANALYZE {_quote(TABLE)}")
+    log(
+        f"{TABLE} を分割しました。元のテーブルは {UNPARTITIONED_TABLE} として"
+        "残しているため、確認後に削除してください"
+    )
+
+
+def _create_shadow_table(strategy, partitions, months_ahead):
+    key = PARTITION_KEYS[strategy]
+    table, shadow = _quote(TABLE), _quote(SHADOW_TABLE)
+    statements = [
+        f"CREATE TABLE {shadow} (LIKE {table} INCLUDING DEFAULTS "
+        "INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS) "
+        f"PARTITION BY {strategy.upper()} ({_quote(key)})",
+        f"ALTER TABLE {shadow} ADD CONSTRAINT "
+        f"{_quote(_suffixed(TABLE, '_part_pkey'))} PRIMARY KEY (id, {_quote(key)})",
+    ]
+
+    if strategy == "hash":
+        for remainder in range(partitions):
+            statements.append(
+                f"CREATE TABLE {_quote(f'{TABLE}_p{remainder:02d}')} "
+                f"PARTITION OF {shadow} "
+                f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            )
+    else:
+        ((oldest,),) = _fetchall(f"SELECT min(created_at) FROM {table}")
+        month = _month_start(oldest or timezone.now())
+        last = _month_start(timezone.now())
+        for _ in range(months_ahead):
+            last = _next_month(last)
+        while month <= last:
+            end = _next_month(month)
+            statements.append(
+                f"CREATE TABLE {_quote(_month_partition_name(month))} "
+                f"PARTITION OF {shadow} "
+                f"FOR VALUES FROM ({_timestamp(month)}) TO ({_timestamp(end)})"
+            )
+            month = end
+        # 月のパーティションの作成が遅れても INSERT が失敗しないようにする
+        statements.append(
+            f"CREATE TABLE {_quote(DEFAULT_PARTITION)} PARTITION OF {shadow} DEFAULT"
+        )
+
+    for name, unique, definition in _fetchall(
+        "SELECT c.relname, i.indisunique, pg_get_indexdef(i.indexrelid) "
+        "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = to_regclass(%s) AND NOT i.indisprimary",
+        [TABLE],
+    ):
+        if unique:
+            raise PartitioningError(
+                f"一意インデックス {name} はパーティションキーを含まないため作成できません"
+            )
+        statements.append(
+            f"CREATE INDEX {_quote(_suffixed(name, '_part'))} ON {shadow} "
+            + INDEX_RE.match(definition).group(1)
+        )
+    # 空のうちに作るため、外部キーの検証はすぐに終わる
+    for name, definition in _fetchall(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [TABLE],
+    ):
+        statements.append(
+            f"ALTER TABLE {shadow} ADD CONSTRAINT {_quote(name)} {definition}"
+        )
+
+    sequence = _quote(f"{SHADOW_TABLE}_id_seq")
+    statements += [
+        f"CREATE SEQUENCE {sequence} OWNED BY {shadow}.id",
+        f"ALTER TABLE {shadow} ALTER COLUMN id "
+        f"SET DEFAULT nextval('{sequence}'::regclass)",
+        # コピー中の INSERT / UPDATE / DELETE を反映する（UPDATE は削除して入れ直す）
+        f"""
+        CREATE FUNCTION {_quote(SYNC_FUNCTION)}() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {shadow}
+                WHERE id = OLD.id AND {_quote(key)} = OLD.{_quote(key)};
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {shadow} SELECT (NEW).*;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+        """,
+        # トリガーの作成は実行中の書き込みの完了を待つため、作成後に見える最大の id までを
+        # コピーすれば漏れはない
+        f"CREATE TRIGGER {_quote(SYNC_FUNCTION)} "
+        f"AFTER INSERT OR UPDATE OR DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {_quote(SYNC_FUNCTION)}()",
+    ]
+    with transaction.atomic():
+        _execute(*statements)
+
+
+def backfill(batch_size, sleep, log):
+    """
+    元のテーブルの行を id の範囲ごとにコピーする
+
+    コピー中の行は FOR SHARE でロックし、同時に行われた UPDATE / DELETE がコピーの後に
+    トリガーで反映されるようにする。トリガーで反映済みの行はそのまま残す。
+    """
+    table, shadow = _quote(TABLE), _quote(SHADOW_TABLE)
+    ((low, high),) = _fetchall(f"SELECT min(id), max(id) FROM {table}")
+    if low is None:
+        return 0
+    copied = batches = 0
+    start = low
+    while start <= high:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH batch AS (SELECT * FROM {table} WHERE id >= %s AND id < %s "
+                f"FOR SHARE) INSERT INTO {shadow} SELECT * FROM batch "
+                "ON CONFLICT DO NOTHING",
+                [start, start + batch_size],
+            )
+            copied += max(cursor.rowcount, 0)
+        start += batch_size
+        batches += 1
+        if batches % PROGRESS_INTERVAL == 0:
+            log(f"コピー中: id {start} / {high}")
+        if sleep:
+            time.sleep(sleep)
+    return copied
+
+
+def _swap_tables():
+    table, shadow = _quote(TABLE), _quote(SHADOW_TABLE)
+    _execute(
+        f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE",
+        f"DROP TRIGGER {_quote(SYNC_FUNCTION)} ON {table}",
+        f"DROP FUNCTION {_quote(SYNC_FUNCTION)}()",
+    )
+    # パーティションテーブルの id だけを参照する外部キーは作れない
+    for relation, name in _fetchall(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE confrelid = to_regclass(%s) AND contype = 'f'",
+        [TABLE],
+    ):
+        _execute(f"ALTER TABLE {relation} DROP CONSTRAINT {_quote(name)}")
+
+    # 元のテーブルのインデックス名を空け、新しいテーブルのインデックスに付け直す
+    index_names = [
+        name
+        for (name,) in _fetchall(
+            "SELECT c.relname FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE i.indrelid = to_regclass(%s)",
+            [TABLE],
+        )
+    ]
+    statements = [
+        f"ALTER INDEX {_quote(name)} RENAME TO {_quote(_suffixed(name, '_unpart'))}"
+        for name in index_names
+    ]
+    statements += [
+        f"ALTER TABLE {table} RENAME TO {_quote(UNPARTITIONED_TABLE)}",
+        f"ALTER TABLE {shadow} RENAME TO {table}",
+    ]
+    statements += [
+        f"ALTER INDEX {_quote(_suffixed(name, '_part'))} RENAME TO {_quote(name)}"
+        for name in index_names
+        if name != f"{TABLE}_pkey"
+    ]
+    statements.append(
+        f"ALTER INDEX {_quote(_suffixed(TABLE, '_part_pkey'))} "
+        f"RENAME TO {_quote(f'{TABLE}_pkey')}"
+    )
+    _execute(*statements)
+    _fetchall(
+        "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+        f"(SELECT coalesce(max(id), 0) + 1 FROM {table}), false)",
+        [TABLE],
+    )
+
+
+# --- range のパーティションの管理 ---
+
+
+def create_month_partitions(months_ahead, log):
+    """今月から months_ahead か月先までの、まだないパーティションを作成する"""
+    _require_strategy("range")
+    existing = {start for _name, start, _end in range_partitions()}
+    month = _month_start(timezone.now())
+    created = []
+    for _ in range(months_ahead + 1):
+        end = _next_month(month)
+        if month not in existing:
+            name = _month_partition_name(month)
+            _run_with_lock_timeout(lambda: _create_month_partition(name, month, end))
+            log(f"作成: {name}")
+            created.append(name)
+        month = end
+    return created
+
+
+def _create_month_partition(name, start, end):
+    """
+    空のテーブルを作り、既定のパーティションに入った同じ月の行を移してから追加する
+
+    ATTACH PARTITION は親テーブルへの読み書きを止めない。既定のパーティションの確認の
+    ための走査は、月のパーティションを先に作っていれば空のテーブルに対して行われる。
+    """
+    table, partition = _quote(TABLE), _quote(name)
+    bounds = f"created_at >= {_timestamp(start)} AND created_at < {_timestamp(end)}"
+    statements = [
+        f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS "
+        "INCLUDING CONSTRAINTS INCLUDING STORAGE)",
+    ]
+    if DEFAULT_PARTITION in {row[0] for row in list_partitions()}:
+        statements.append(
+            f"WITH moved AS (DELETE FROM {_quote(DEFAULT_PARTITION)} WHERE {bounds} "
+            f"RETURNING *) INSERT INTO {partition} SELECT * FROM moved"
+        )
+    statements += _attach_statements(name, start, end, validate=False)
+    _execute(*statements)
+
+
+def _attach_statements(name, start, end, validate):
+    partition = _quote(name)
+    check = _quote(_suffixed(name, "_bounds"))
+    bounds = f"created_at >= {_timestamp(start)} AND created_at < {_timestamp(end)}"
+    # 範囲の CHECK 制約があれば、ATTACH PARTITION は行の確認のための走査を省略する
+    statements = [
+        f"ALTER TABLE {partition} ADD CONSTRAINT {check} "
+        f"CHECK (created_at IS NOT NULL AND {bounds})"
+        + (" NOT VALID" if validate else ""),
+    ]
+    if validate:
+        statements.append(f"ALTER TABLE {partition} VALIDATE CONSTRAINT {check}")
+    return statements + [
+        f"ALTER TABLE {_quote(TABLE)} ATTACH PARTITION {partition} "
+        f"FOR VALUES FROM ({_timestamp(start)}) TO ({_timestamp(end)})",
+        f"ALTER TABLE {partition} DROP CONSTRAINT {check}",
+    ]
+
+
+def attach_partition(name, start, end):
+    """
+    同じ列を持つ既存のテーブル（アーカイブから戻したデータなど）をパーティションとして追加する
+
+    CHECK 制約の検証は NOT VALID で追加してから行うため、検証中も書き込みは止まらない。
+    親テーブルと同じインデックスがなければ ATTACH の中で作成されるため、大きなテーブルは
+    先に CREATE INDEX CONCURRENTLY で作っておく。
+    """
+    _require_strategy("range")
+    statements = _attach_statements(name, start, end, validate=True)
+    # 検証は時間がかかるため、ロックの短い ATTACH とは別のトランザクションで行う
+    _execute(*statements[:2])
+    _run_with_lock_timeout(lambda: _execute(*statements[2:]))
+
+
+# --- パーティション単位の一括削除 ---
+
+
+def purge_targets(before):
+    """終了日時が before 以前の月のパーティション"""
+    _require_strategy("range")
+    return [name for name, _start, end in range_partitions() if end <= before]
+
+
+def purge_partitions(before, batch_size, sleep, log):
+    """
+    created_at が before より前の月のパーティションを切り離して削除する
+
+    切り離した時点でアプリケーションからは見えなくなる。その後、関連レコード（版・変換済み
+    ファイル・指紋）と物理ファイルを Django の削除処理で少しずつ削除し、最後にテーブルを
+    削除する。途中で止めても、再実行すると残りを処理する。
+    """
+    for name in purge_targets(before):
+        purging = _suffixed(name, PURGING_SUFFIX)
+        _run_with_lock_timeout(
+            lambda: _execute(
+                f"ALTER TABLE {_quote(TABLE)} DETACH PARTITION {_quote(name)}",
+                f"ALTER TABLE {_quote(name)} RENAME TO {_quote(purging)}",
+            )
+        )
+        log(f"切り離し: {name}")
+
+    removed = 0
+    for name in purging_tables():
+        count = _delete_detached_rows(name, batch_size, sleep)
+        _execute(f"DROP TABLE {_quote(name)}")
+        log(f"削除: {name}（{count}件）")
+        removed += count
+    return removed
+
+
+def purging_tables():
+    """切り離し済みで、削除が終わっていないパーティション"""
+    # LIKE では "_" が任意の 1 文字になるためエスケープする
+    pattern = TABLE.replace("_", r"\_") + "%" + PURGING_SUFFIX.replace("_", r"\_")
+    return [
+        name
+        for (name,) in _fetchall(
+            "SELECT relname FROM pg_class WHERE relkind = 'r' "
+            "AND relname LIKE %s AND pg_table_is_visible(oid) ORDER BY relname",
+            [pattern],
+        )
+    ]
+
+
+def _delete_detached_rows(name, batch_size, sleep):
+    removed = 0
+    while True:
+        with transaction.atomic():
+            media_files = list(
+                MediaFile.all_objects.raw(
+                    f"SELECT * FROM {_quote(name)} ORDER BY id LIMIT %s", [batch_size]
+                )
+            )
+            if not media_files:
+                return removed
+            # 親テーブルの行は既にないが、関連レコードの削除とシグナルによる
+            # 物理ファイルの削除は通常の削除と同じように行われる
+            collector = Collector(using=connection.alias)
+            collector.collect(media_files)
+            collector.delete()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {_quote(name)} WHERE id = ANY(%s)",
+                    [[media_file.pk for media_file in media_files]],
+                )
+        removed += len(media_files)
+        if sleep:
+            time.sleep(sleep)
@@ -0,0 +1,459 @@
+"""
+アップロード後のメディアファイル処理
+
+登録されたステージを登録順に実行する。処理待ちのファイルは process_media コマンドの
+ワーカーが DB から取り出して処理する。
+"""
+
+import contextlib
+import logging
+import os
+import struct
+import subprocess
+import tempfile
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import analysis, fingerprint
+from .events import publish_stage, publish_status
+from .faststart import FASTSTART_TYPES, FaststartError, relocate_moov
+from .models import (
+    WEB_PLAYABLE_TYPES,
+    MediaFile,
+    MediaFingerprint,
+    MediaFingerprintKey,
+    MediaRendition,
+)
+from .observability import span
+from .versions import rehash_stored_file
+
+logger = logging.getLogger(__name__)
+
+STAGES = []
+
+
+class ProcessingError(Exception):
+    """処理ステージの失敗"""
+
+
+def stage(name):
+    """処理ステージを登録するデコレーター（登録順に実行される）"""
+
+    def decorator(func):
+        STAGES.append((name, func))
+        return func
+
+    return decorator
+
+
+def claim_next():
+    """
+    処理待ちのメディアファイルを1件取り出し、処理中にして返す
+
+    複数のワーカーが同じファイルを処理しないよう、対象行はロックしてから更新する。
+    一定時間を超えて処理中のままのファイルは、ワーカーが停止したものとみなして再処理する。
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.MEDIA_PROCESSING_STALE_SECONDS)
+    with transaction.atomic():
+        media_file = (
+            MediaFile.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(processing_status=MediaFile.PROCESSING_PENDING)
+                | Q(
+                    processing_status=MediaFile.PROCESSING_RUNNING,
+                    processing_started_at__lt=stale_before,
+                )
+            )
+            .order_by("created_at")
+            .first()
+        )
+        if media_file is None:
+            return None
+        MediaFile.objects.filter(pk=media_file.pk).update(
+            processing_status=MediaFile.PROCESSING_RUNNING, processing_started_at=now
+        )
+    media_file.processing_status = MediaFile.PROCESSING_RUNNING
+    media_file.processing_started_at = now
+    return media_file
+
+
+def process_media_file(media_file):
+    """メディアファイルに全ステージを実行し、成功したかどうかを返す"""
+    publish_status(media_file.pk, MediaFile.PROCESSING_RUNNING)
+    with span("media.process", **{"media.id": media_file.pk}):
+        try:
+            for name, func in STAGES:
+                publish_stage(media_file.pk, name, "started")
+                with span(f"media.process.{name}"):
+                    func(media_file)
+                publish_stage(media_file.pk, name, "finished")
+        except Exception as e:
+            logger.exception("メディア処理エラー: media_file_id=%s", media_file.pk)
+            status, error = MediaFile.PROCESSING_FAILED, str(e)
+        else:
+            status, error = MediaFile.PROCESSING_DONE, ""
+
+    # 変換済みファイルが増えると詳細ページの表示が変わるため updated_at も更新する
+    MediaFile.objects.filter(pk=media_file.pk).update(
+        processing_status=status, processing_error=error, updated_at=timezone.now()
+    )
+    media_file.processing_status = status
+    media_file.processing_error = error
+    publish_status(media_file.pk, status, error)
+    return status == MediaFile.PROCESSING_DONE
+
+
+def source_path(media_file):
+    """ffmpeg に渡す入力（ローカルファイルのパス、またはオブジェクトの署名付き URL）"""
+    storage = media_file.file.storage
+    if isinstance(storage, FileSystemStorage):
+        return media_file.get_physical_path()
+    return storage.presigned_url(media_file.file.name)
+
+
+def ffmpeg_command(args):
+    return [
+        settings.FFMPEG_BINARY,
+        "-nostdin",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        *args,
+    ]
+
+
+def run_ffmpeg(args, timeout=None):
+    """ffmpeg を実行する（失敗した場合は ProcessingError）"""
+    command = ffmpeg_command(args)
+    try:
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            timeout=timeout or settings.MEDIA_TRANSCODE_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise ProcessingError(f"ffmpeg を実行できません: {e}") from e
+    if result.returncode != 0:
+        raise ProcessingError(result.stderr.decode(errors="replace")[-2000:])
+    return result
+
+
+def read_wav_header(stream):
+    """
+    WAV のヘッダーを data チャンクの先頭まで読み、(サンプリング周波数, チャンネル数) を返す
+
+    パイプへの出力ではサイズが確定しないため、data チャンクのサイズは使わない。
+    """
+    if stream.read(12)[8:12] != b"WAVE":
+        raise ProcessingError("ffmpeg の出力を読み込めません")
+    sample_rate = channels = None
+    while True:
+        header = stream.read(8)
+        if len(header) < 8:
+            raise ProcessingError("ffmpeg の出力を読み込めません")
+        chunk_id, size = struct.unpack("<4sI", header)
+        if chunk_id == b"data":
+            break
+        data = stream.read(size + size % 2)
+        if chunk_id == b"fmt ":
+            channels, sample_rate = struct.unpack("<HI", data[2:8])
+    if not channels:
+        raise ProcessingError("ffmpeg の出力を読み込めません")
+    return sample_rate, channels
+
+
+@contextlib.contextmanager
+def open_pcm(args):
+    """
+    ffmpeg のデコード結果（32bit float の PCM）をパイプで読み込む
+
+    (サンプリング周波数, チャンネル数, ストリーム) を返す。ファイル全体を一時ファイルに
+    書き出さずに読み込み、MEDIA_TRANSCODE_TIMEOUT を超えた場合は ffmpeg を止める。
+    """
+    command = ffmpeg_command([*args, "-c:a", "pcm_f32le", "-f", "wav", "pipe:1"])
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+        except OSError as e:
+            raise ProcessingError(f"ffmpeg を実行できません: {e}") from e
+        timer = threading.Timer(settings.MEDIA_TRANSCODE_TIMEOUT, process.kill)
+        timer.start()
+        try:
+            try:
+                sample_rate, channels = read_wav_header(process.stdout)
+            except ProcessingError:
+                # デコードを開始できなかった（音声トラックがないなど）
+                process.wait()
+                raise ProcessingError(_ffmpeg_error(process, stderr)) from None
+            yield sample_rate, channels, process.stdout
+        finally:
+            timer.cancel()
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+        if process.returncode != 0:
+            raise ProcessingError(_ffmpeg_error(process, stderr))
+
+
+def _ffmpeg_error(process, stderr):
+    stderr.seek(0)
+    message = stderr.read().decode(errors="replace")[-2000:]
+    return message or f"ffmpeg が終了コード {process.returncode} で終了しました"
+
+
+def transcode_profile(media_file):
+    """変換プロファイル（名前, 拡張子, Content-Type, ffmpeg の出力オプション）"""
+    if media_file.file_type == "video":
+        max_height = settings.MEDIA_TRANSCODE_VIDEO_MAX_HEIGHT
+        return (
+            "mp4",
+            ".mp4",
+            "video/mp4",
+            [
+                "-map",
+                "0:v:0",
+                "-map",
+                "0:a:0?",
+                "-vf",
+                f"scale=-2:'min({max_height},trunc(ih/2)*2)'",
+                "-c:v",
+                "libx264",
+                "-preset",
+                "veryfast",
+                "-crf",
+                str(settings.MEDIA_TRANSCODE_VIDEO_CRF),
+                "-pix_fmt",
+                "yuv420p",
+                "-c:a",
+                "aac",
+                "-b:a",
+                "128k",
+                "-movflags",
+                "+faststart",
+            ],
+        )
+    if settings.MEDIA_TRANSCODE_AUDIO_CODEC == "opus":
+        return (
+            "opus",
+            ".webm",
+            "audio/webm",
+            ["-vn", "-map", "0:a:0", "-c:a", "libopus", "-b:a", "96k"],
+        )
+    return (
+        "aac",
+        ".m4a",
+        "audio/mp4",
+        [
+            "-vn",
+            "-map",
+            "0:a:0",
+            "-c:a",
+            "aac",
+            "-b:a",
+            "128k",
+            "-movflags",
+            "+faststart",
+        ],
+    )
+
+
+@stage("faststart")
+def faststart(media_file):
+    """
+    MP4 / QuickTime の moov アトムを先頭側へ移動し、再生開始までの読み込みを減らす
+
+    ファイルシステムストレージのファイルのみ対象とする。変換できない構造の場合は
+    元のファイルのまま後続のステージを続ける。
+    """
+    if media_file.get_mime_type() not in FASTSTART_TYPES:
+        return
+    if not isinstance(media_file.file.storage, FileSystemStorage):
+        return
+    try:
+        if relocate_moov(media_file.get_physical_path()):
+            logger.info("moov アトムを移動しました: %s", media_file.file.name)
+            # 保存されている内容のハッシュ（共有や重複の検出に使う）を書き換え後の内容に合わせる
+            rehash_stored_file(media_file)
+    except FaststartError as e:
+        logger.warning("faststart に変換できません: %s: %s", media_file.file.name, e)
+
+
+@stage("transcode")
+def transcode(media_file):
+    """
+    Web で再生しやすい形式（H.264/AAC の MP4、AAC または Opus の音声）に変換する
+
+    元ファイルがそのまま再生でき、変換後の方が大きくなる場合は保存しない。
+    """
+    if not settings.MEDIA_TRANSCODE_ENABLED:
+        return
+    profile, ext, mime_type, output_args = transcode_profile(media_file)
+    if media_file.renditions.filter(profile=profile).exists():
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output = os.path.join(tmp_dir, f"rendition{ext}")
+        run_ffmpeg(["-i", source_path(media_file), *output_args, output])
+        file_size = os.path.getsize(output)
+        if (
+            media_file.get_mime_type() in WEB_PLAYABLE_TYPES
+            and file_size >= media_file.file_size
+        ):
+            logger.info(
+                "変換後のファイルが元ファイルより大きいため保存しません: media_file_id=%s",
+                media_file.pk,
+            )
+            return
+
+        rendition = MediaRendition(
+            media_file=media_file,
+            profile=profile,
+            mime_type=mime_type,
+            file_size=file_size,
+        )
+        with open(output, "rb") as f:
+            rendition.file.save(f"rendition{ext}", File(f), save=False)
+        try:
+            rendition.save()
+        except Exception:
+            # レコードを作成できなかった場合（元ファイルの削除など）は保存したファイルを消す
+            rendition.delete_physical_file()
+            raise
+
+
+@stage("analyze")
+def analyze(media_file):
+    """
+    音声の統合ラウドネス・トゥルーピーク・RMS・無音区間を求めて保存する
+
+    デコードした PCM をパイプからブロック単位で読み込むため、長いファイルでも
+    メモリ使用量は一定に保たれる。音声トラックのない動画などは解析せずに続ける。
+    """
+    if not settings.MEDIA_ANALYSIS_ENABLED:
+        return
+    if not analysis.is_available():
+        logger.warning("numpy がインストールされていないため音声を解析しません")
+        return
+    args = [
+        "-i",
+        source_path(media_file),
+        "-filter_complex",
+        analysis.filter_graph(),
+        "-map",
+        "[analysis]",
+    ]
+    try:
+        with open_pcm(args) as (sample_rate, channels, stream):
+            # 出力のチャンネルは元の信号と K 特性を適用した信号の 2 組
+            analyzer = analysis.AudioAnalyzer(channels // 2, sample_rate)
+            analyzer.feed_stream(stream)
+    except ProcessingError as e:
+        logger.warning("音声を解析できません: %s: %s", media_file.file.name, e)
+        return
+
+    values = analyzer.result(
+        settings.MEDIA_ANALYSIS_SILENCE_THRESHOLD_DB,
+        settings.MEDIA_ANALYSIS_SILENCE_MIN_SECONDS,
+    )
+    if media_file.duration is None and analyzer.frames:
+        values["duration"] = timedelta(seconds=analyzer.frames / sample_rate)
+    MediaFile.objects.filter(pk=media_file.pk).update(**values)
+    for name, value in values.items():
+        setattr(media_file, name, value)
+
+
+@stage("fingerprint")
+def detect_duplicates(media_file):
+    """
+    音声の指紋を保存し、同じユーザーの類似ファイル（形式やビットレートだけが違う
+    同じ録音など）を探す
+
+    内容のハッシュが同じファイルの指紋があれば、デコードせずにその指紋を使う。
+    """
+    if not settings.MEDIA_FINGERPRINT_ENABLED:
+        return
+    if not fingerprint.is_available():
+        logger.warning("numpy がインストールされていないため指紋を計算しません")
+        return
+
+    exact = None
+    if media_file.content_hash:
+        exact = (
+            MediaFingerprint.objects.filter(
+                user_id=media_file.user_id,
+                version=fingerprint.VERSION,
+                media_file__content_hash=media_file.content_hash,
+                media_file__deleted_at__isnull=True,
+            )
+            .exclude(media_file_id=media_file.pk)
+            .first()
+        )
+    if exact is not None:
+        values = {
+            "codes": bytes(exact.codes),
+            "duration": exact.duration,
+            "similar_to_id": exact.media_file_id,
+            "similarity": 1.0,
+        }
+    else:
+        try:
+            with open_pcm(fingerprint.ffmpeg_args(source_path(media_file))) as (
+                _sample_rate,
+                _channels,
+                stream,
+            ):
+                builder = fingerprint.FingerprintBuilder()
+                builder.feed_stream(stream)
+        except ProcessingError as e:
+            logger.warning("指紋を計算できません: %s: %s", media_file.file.name, e)
+            return
+        if not builder.is_informative():
+            # 無音など、どのファイルとも一致してしまう指紋は保存しない
+            MediaFingerprint.objects.filter(media_file_id=media_file.pk).delete()
+            return
+        values = {
+            "codes": builder.codes().tobytes(),
+            "duration": builder.frames * fingerprint.HOP_SIZE / fingerprint.SAMPLE_RATE,
+            "similar_to": None,
+            "similarity": None,
+        }
+
+    keys = fingerprint.index_codes(values["codes"])
+    with transaction.atomic():
+        record, _ = MediaFingerprint.objects.update_or_create(
+            media_file_id=media_file.pk,
+            defaults={
+                "user_id": media_file.user_id,
+                "version": fingerprint.VERSION,
+                **values,
+            },
+        )
+        record.keys.all().delete()
+        MediaFingerprintKey.objects.bulk_create(
+            MediaFingerprintKey(
+                fingerprint=record, user_id=media_file.user_id, code=code
+            )
+            for code in keys
+        )
+    if exact is None:
+        record.similar_to, record.similarity = fingerprint.find_similar(
+            record, builder.query_codes()
+        )
+        record.save(update_fields=["similar_to", "similarity"])
+    if record.similar_to_id:
+        logger.info(
+            "類似ファイルが見つかりました: media_file_id=%s similar_to=%s similarity=%s",
+            media_file.pk,
+            record.similar_to_id,
+            record.similarity,
+        )
@@ -0,0 +1,244 @@
+"""
+レート制限・同時実行数制限
+
+ストアは Django のキャッシュ（複数ワーカーで共有）を使い、
+キャッシュが利用できない場合はプロセス内のストアにフォールバックする。
+"""
+
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+RATE_PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+SLIDING_WINDOW = "sliding_window"
+TOKEN_BUCKET = "token_bucket"
+
+
+def parse_rate(rate):
+    """
+    "10/m" や "5/10s" 形式のレートを (回数, 秒数) に変換する
+    """
+    count, period = rate.split("/")
+    multiplier = period[:-1] or "1"
+    return int(count), int(multiplier) * RATE_PERIODS[period[-1]]
+
+
+class LocalStore:
+    """プロセス内のストア（キャッシュが使えない場合のフォールバック）"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def _purge(self, now):
+        if now < self._next_purge:
+            return
+        self._data = {k: v for k, v in self._data.items() if v[1] > now}
+        self._next_purge = now + 60
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            value, expires = self._data.get(key, (default, 0))
+            return value if expires > now else default
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            self._data[key] = (value, now + ttl)
+
+    def incr(self, key, ttl, delta=1):
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            value, expires = self._data.get(key, (0, 0))
+            if expires <= now:
+                value, expires = 0, now + ttl
+            value += delta
+            self._data[key] = (value, expires)
+            return value
+
+
+class CacheStore:
+    """Django キャッシュを使った共有ストア"""
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key, default=None):
+        return self.cache.get(key, default)
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, value, timeout=math.ceil(ttl))
+
+    def incr(self, key, ttl, delta=1):
+        self.cache.add(key, 0, timeout=math.ceil(ttl))
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            # add と incr の間にキーが失効した場合
+            self.cache.set(key, delta, timeout=math.ceil(ttl))
+            return delta
+
+
+class FallbackStore:
+    """共有ストアを使い、失敗した場合はプロセス内ストアで代替する"""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+
+    def _call(self, method, *args, **kwargs):
+        try:
+            return getattr(self.primary, method)(*args, **kwargs)
+        except Exception:
+            return getattr(self.fallback, method)(*args, **kwargs)
+
+    def get(self, key, default=None):
+        return self._call("get", key, default)
+
+    def set(self, key, value, ttl):
+        return self._call("set", key, value, ttl)
+
+    def incr(self, key, ttl, delta=1):
+        return self._call("incr", key, ttl, delta)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = FallbackStore(CacheStore(settings.RATELIMIT_CACHE), LocalStore())
+    return _store
+
+
+def get_client_ip(request):
+    """クライアントの IP アドレスを返す（プロキシのヘッダーは設定で指定）"""
+    ip = request.META.get(settings.RATELIMIT_IP_META_KEY) or request.META.get(
+        "REMOTE_ADDR", ""
+    )
+    return ip.split(",")[0].strip()
+
+
+def get_identity(request, key):
+    """レート制限のキーとなるクライアントの識別子を返す"""
+    if key == "ip":
+        return f"ip:{get_client_ip(request)}"
+    if key in ("user", "user_or_ip"):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        if key == "user_or_ip":
+            return f"ip:{get_client_ip(request)}"
+        return None
+    raise ValueError(f"不明なキー種別です: {key}")
+
+
+class Rule:
+    """
+    エンドポイントごとのレート制限ルール
+
+    rate は "10/m" 形式。algorithm は sliding_window（スライディングウィンドウ）
+    または token_bucket（トークンバケット）。
+    """
+
+    def __init__(
+        self, scope, rate, key="ip", methods=("POST",), algorithm=SLIDING_WINDOW
+    ):
+        self.scope = scope
+        self.limit, self.period = parse_rate(rate)
+        self.key = key
+        self.methods = methods
+        self.algorithm = algorithm
+
+    def applies(self, request):
+        return request.method in self.methods
+
+    def hit(self, request, store=None):
+        """
+        リクエストを1回分記録し、(許可するか, 再試行までの秒数) を返す
+        """
+        identity = get_identity(request, self.key)
+        if identity is None:
+            return True, 0
+        store = store or get_store()
+        base_key = f"rl:{self.scope}:{identity}"
+        if self.algorithm == TOKEN_BUCKET:
+            return self._token_bucket(store, base_key)
+        return self._sliding_window(store, base_key)
+
+    def _sliding_window(self, store, base_key):
+        # 直前のウィンドウの件数を経過割合で按分して現在の件数に加える
+        now = time.time()
+        window = int(now // self.period)
+        elapsed = (now % self.period) / self.period
+        current = store.incr(f"{base_key}:{window}", self.period * 2)
+        previous = store.get(f"{base_key}:{window - 1}", 0) or 0
+        estimated = previous * (1 - elapsed) + current
+        if estimated > self.limit:
+            return False, math.ceil(self.period * (1 - elapsed))
+        return True, 0
+
+    def _token_bucket(self, store, base_key):
+        # GCRA（理論到着時刻のみを保持するトークンバケット）
+        now = time.time()
+        interval = self.period / self.limit
+        key = f"{base_key}:tat"
+        tat = max(store.get(key, now) or now, now)
+        new_tat = tat + interval
+        if new_tat - now > self.period:
+            return False, math.ceil(new_tat - self.period - now)
+        store.set(key, new_tat, new_tat - now)
+        return True, 0
+
+
+class ConcurrencyLimit:
+    """
+    同時実行数の制限（例: ユーザーごとのアップロード数）
+
+    ワーカーが異常終了してスロットが解放されなかった場合に備え、
+    カウンターは ttl 秒で失効する。
+    """
+
+    def __init__(self, scope, limit, key="user", methods=("POST",), ttl=3600):
+        self.scope = scope
+        self.limit = limit
+        self.key = key
+        self.methods = methods
+        self.ttl = ttl
+
+    def applies(self, request):
+        return request.method in self.methods
+
+    def _key(self, request):
+        identity = get_identity(request, self.key)
+        if identity is None:
+            return None
+        return f"cl:{self.scope}:{identity}"
+
+    def acquire(self, request, store=None):
+        """スロットを確保できた場合はスロットのキーを、できなければ False を返す"""
+        key = self._key(request)
+        if key is None:
+            return None
+        store = store or get_store()
+        if store.incr(key, self.ttl) > self.limit:
+            store.incr(key, self.ttl, delta=-1)
+            return False
+        return key
+
+    def release(self, key, store=None):
+        store = store or get_store()
+        store.incr(key, self.ttl, delta=-1)
@@ -0,0 +1,235 @@
+"""
+Nginx を使わない構成でのメディアファイル配信（MEDIA_SERVE_MODE=asgi）
+
+protected_media ビューは配信するファイルを X-Accel-Redirect ヘッダーで指示する。
+通常は Nginx がこのヘッダーを解釈するが、asgi モードでは ASGI アプリケーションを
+包む MediaResponder が Nginx の代わりにファイルを送る。
+
+- サーバーが ASGI の pathsend 拡張に対応していれば、ファイル全体の送信はサーバーに
+  任せる（サーバー側で sendfile によるゼロコピー送信が使われる）
+- 対応していない場合や Range リクエストの場合は、スレッドプールで os.pread した
+  大きめのチャンクを順に送る
+"""
+
+import asyncio
+import email.utils
+import os
+import stat
+from urllib.parse import unquote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+# 読み込みの単位。2 番目以降のチャンクはこの境界に揃えて読む
+CHUNK_SIZE = 512 * 1024
+
+# Content-Type が分からないファイルに使う値
+DEFAULT_CONTENT_TYPE = b"application/octet-stream"
+
+
+def accel_locations():
+    """X-Accel-Redirect のパスの接頭辞と、対応するディレクトリ（nginx.conf と同じ）"""
+    return {
+        "/protected_media/": os.path.realpath(settings.MEDIA_ROOT),
+        "/protected_media_cold/": os.path.realpath(settings.MEDIA_COLD_ROOT),
+    }
+
+
+def resolve_accel_path(location, locations):
+    """X-Accel-Redirect の値をファイルのパスにする（ディレクトリ外は None）"""
+    for prefix, root in locations.items():
+        if location.startswith(prefix):
+            path = os.path.realpath(
+                os.path.join(root, unquote(location[len(prefix) :]))
+            )
+            if path.startswith(root + os.sep):
+                return path
+    return None
+
+
+def open_regular_file(path):
+    """
+    通常のファイルを開いて (ファイル記述子, stat の結果) を返す
+
+    ファイルがない場合や通常のファイルでない場合は None。
+    ディスクを待つことがあるため、イベントループからはスレッドで呼び出す。
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        info = os.fstat(fd)
+    except OSError:
+        os.close(fd)
+        return None
+    if not stat.S_ISREG(info.st_mode):
+        os.close(fd)
+        return None
+    return fd, info
+
+
+def parse_range(header, size):
+    """
+    Range ヘッダーを (開始, 終了) にする（終了を含む）
+
+    ヘッダーがない場合や複数範囲の場合は None（ファイル全体を返す）、
+    範囲が満たせない場合は ValueError。
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[len("bytes=") :].strip().partition("-")
+    try:
+        if start:
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        else:
+            # bytes=-500 は末尾の 500 バイト
+            suffix = int(end)
+            if suffix <= 0:
+                raise ValueError
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError("範囲外です")
+    return start, end
+
+
+async def send_file_range(send, fd, start, end):
+    """start から end までをチャンクに分けて送る（読み込みはスレッドプールで行う）"""
+    loop = asyncio.get_running_loop()
+    offset = start
+    while offset <= end:
+        # 最初のチャンクで境界に揃え、以降は CHUNK_SIZE 単位で読む
+        size = min(CHUNK_SIZE - offset % CHUNK_SIZE, end - offset + 1)
+        data = await loop.run_in_executor(None, os.pread, fd, size, offset)
+        if not data:
+            break
+        offset += len(data)
+        await send(
+            {"type": "http.response.body", "body": data, "more_body": offset <= end}
+        )
+    if offset <= end:
+        # 送信中にファイルが短くなった
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class MediaResponder:
+    """X-Accel-Redirect を含むレスポンスを、指示されたファイルの内容に置き換える"""
+
+    def __init__(self, app):
+        self.app = app
+        self.locations = accel_locations()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start_message = None
+
+        async def intercept(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                if _header(message, b"x-accel-redirect") is not None:
+                    start_message = message
+                    return
+            elif start_message is not None:
+                # Django が送る空の本文は捨て、代わりにファイルを送る
+                return
+            await send(message)
+
+        await self.app(scope, receive, intercept)
+        if start_message is not None:
+            # Django の処理を終えて DB の接続と同時実行数の枠を返してから送る
+            # （遅いクライアントへの送信中に枠を占有しない）
+            await self.respond(scope, send, start_message)
+
+    async def respond(self, scope, send, start_message):
+        location = _header(start_message, b"x-accel-redirect").decode("latin-1")
+        path = resolve_accel_path(location, self.locations)
+        opened = (
+            await sync_to_async(open_regular_file, thread_sensitive=False)(path)
+            if path
+            else None
+        )
+        if opened is None:
+            return await _send_empty(send, 404)
+
+        fd, info = opened
+        try:
+            size = info.st_size
+            last_modified = email.utils.formatdate(info.st_mtime, usegmt=True)
+            etag = f'"{info.st_mtime_ns:x}-{size:x}"'
+            request_headers = dict(scope.get("headers", []))
+
+            if request_headers.get(b"if-none-match", b"").decode("latin-1") == etag:
+                return await _send_empty(send, 304, [(b"etag", etag.encode())])
+
+            byte_range = None
+            if_range = request_headers.get(b"if-range", b"").decode("latin-1")
+            if not if_range or if_range in (etag, last_modified):
+                try:
+                    byte_range = parse_range(
+                        request_headers.get(b"range", b"").decode("latin-1"), size
+                    )
+                except ValueError:
+                    return await _send_empty(
+                        send, 416, [(b"content-range", f"bytes */{size}".encode())]
+                    )
+
+            headers = [
+                (name, value)
+                for name, value in start_message.get("headers", [])
+                if name.lower()
+                not in (b"x-accel-redirect", b"content-length", b"content-type")
+            ]
+            headers += [
+                (
+                    b"content-type",
+                    _header(start_message, b"content-type") or DEFAULT_CONTENT_TYPE,
+                ),
+                (b"accept-ranges", b"bytes"),
+                (b"last-modified", last_modified.encode()),
+                (b"etag", etag.encode()),
+            ]
+            if byte_range is None:
+                status, (first, last) = 200, (0, size - 1)
+            else:
+                status, (first, last) = 206, byte_range
+                headers.append(
+                    (b"content-range", f"bytes {first}-{last}/{size}".encode())
+                )
+            headers.append((b"content-length", str(last - first + 1).encode()))
+            await send(
+                {"type": "http.response.start", "status": status, "headers": headers}
+            )
+
+            if scope["method"] == "HEAD" or size == 0:
+                await send({"type": "http.response.body", "body": b""})
+            elif byte_range is None and "http.response.pathsend" in scope.get(
+                "extensions", {}
+            ):
+                await send({"type": "http.response.pathsend", "path": path})
+            else:
+                await send_file_range(send, fd, first, last)
+        finally:
+            os.close(fd)
+
+
+def _header(message, name):
+    for key, value in message.get("headers", []):
+        if key.lower() == name:
+            return value
+    return None
+
+
+async def _send_empty(send, status, headers=()):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-length", b"0"), *headers],
+        }
+    )
+    await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,277 @@
+"""
+ストレージ定義
+"""
+
+import gzip
+import os
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage, storages
+
+from .observability import span
+
+try:
+    import brotli
+except ImportError:  # brotli は任意依存
+    brotli = None
+
+try:
+    from botocore.exceptions import ClientError
+    from storages.backends.s3 import S3Storage
+    from storages.utils import clean_name
+except ImportError:  # S3 互換ストレージを使う場合のみ django-storages[s3] が必要
+    S3Storage = None
+
+
+class MultipartUploadError(Exception):
+    """マルチパートアップロードを完了できない（パートの不足、完了済みなど）"""
+
+
+class SafeFilenameMixin:
+    """
+    ファイル名をタイムスタンプベースの安全な形式に変換するストレージ用ミックスイン
+    """
+
+    def get_available_name(self, name, max_length=None):
+        """
+        ファイル名を安全な形式に変換し、重複を避ける
+        """
+        # 絶対パスを相対パスに変換
+        if os.path.isabs(name):
+            name = os.path.basename(name)
+
+        # ディレクトリとファイル名に分割
+        dir_name = os.path.dirname(name)
+        base_name = os.path.basename(name)
+        safe_base_name = self._get_safe_filename(base_name)
+        # ディレクトリが存在する場合は結合、そうでなければファイル名のみ
+        safe_name = (
+            os.path.join(dir_name, safe_base_name) if dir_name else safe_base_name
+        )
+
+        # 重複チェックのため元のget_available_nameメソッドを呼び出し
+        return super().get_available_name(safe_name, max_length)
+
+    def _get_safe_filename(self, filename):
+        """
+        ファイル名をタイムスタンプベースの安全な形式に変換
+        """
+        # ファイル拡張子を取得
+        _, ext = os.path.splitext(filename)
+
+        # タイムスタンプベースのファイル名を生成
+        timestamp = int(time.time() * 1000)  # ミリ秒のタイムスタンプ
+
+        # 安全なファイル名を生成
+        safe_name = f"media_{timestamp}{ext}"
+
+        return safe_name
+
+
+class TracedStorageMixin:
+    """ストレージの読み書き・削除をスパンとして記録するミックスイン"""
+
+    def _save(self, name, content):
+        with span("storage.save", **{"storage.name": name}):
+            return super()._save(name, content)
+
+    def _open(self, name, mode="rb"):
+        with span("storage.open", **{"storage.name": name}):
+            return super()._open(name, mode)
+
+    def delete(self, name):
+        with span("storage.delete", **{"storage.name": name}):
+            return super().delete(name)
+
+
+class SafeMediaFileStorage(SafeFilenameMixin, TracedStorageMixin, FileSystemStorage):
+    """
+    安全なメディアファイルストレージ
+    """
+
+
+if S3Storage is not None:
+
+    class SafeS3MediaStorage(SafeFilenameMixin, TracedStorageMixin, S3Storage):
+        """
+        S3 互換オブジェクトストレージ上の安全なメディアファイルストレージ
+
+        url() はアクセス制御を行う protected_media の URL を返し、
+        実際のダウンロードは presigned_url() で発行した署名付き URL へ
+        リダイレクトして行う。アップロードはクライアントが署名付きの
+        マルチパートアップロード URL へ直接送信する。
+        """
+
+        def url(self, name, parameters=None, expire=None, http_method=None):
+            return settings.MEDIA_URL + name.lstrip("/")
+
+        def presigned_url(self, name, expire=None):
+            """ダウンロード用の署名付き URL を返す"""
+            return super().url(name, expire=expire)
+
+        def _key(self, name):
+            return self._normalize_name(clean_name(name))
+
+        @property
+        def client(self):
+            return self.connection.meta.client
+
+        def create_multipart_upload(self, name, content_type, part_count):
+            """
+            マルチパートアップロードを開始し、(アップロードID, パートごとの署名付き URL) を返す
+            """
+            key = self._key(name)
+            upload = self.client.create_multipart_upload(
+                Bucket=self.bucket_name, Key=key, ContentType=content_type
+            )
+            upload_id = upload["UploadId"]
+            part_urls = [
+                self.client.generate_presigned_url(
+                    "upload_part",
+                    Params={
+                        "Bucket": self.bucket_name,
+                        "Key": key,
+                        "UploadId": upload_id,
+                        "PartNumber": part_number,
+                    },
+                    ExpiresIn=self.querystring_expire,
+                )
+                for part_number in range(1, part_count + 1)
+            ]
+            return upload_id, part_urls
+
+        def complete_multipart_upload(self, name, upload_id, parts):
+            """
+            マルチパートアップロードを完了し、オブジェクトのサイズを返す
+
+            parts は (パート番号, ETag) のリスト。S3 が完了を拒否した場合
+            （InvalidPart、NoSuchUpload など）は MultipartUploadError を送出する。
+            """
+            try:
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=self._key(name),
+                    UploadId=upload_id,
+                    MultipartUpload={
+                        "Parts": [
+                            {"PartNumber": number, "ETag": etag}
+                            for number, etag in sorted(parts)
+                        ]
+                    },
+                )
+            except ClientError as e:
+                raise MultipartUploadError(e.response["Error"].get("Code", "")) from e
+            return self.size(name)
+
+        def read_head(self, name, size):
+            """オブジェクトの先頭 size バイトを Range 指定で取得する"""
+            response = self.client.get_object(
+                Bucket=self.bucket_name,
+                Key=self._key(name),
+                Range=f"bytes=0-{size - 1}",
+            )
+            return response["Body"].read()
+
+        def set_storage_class(self, name, storage_class):
+            """オブジェクトをコピーし直してストレージクラスを変更する"""
+            key = self._key(name)
+            self.client.copy_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                CopySource={"Bucket": self.bucket_name, "Key": key},
+                StorageClass=storage_class,
+                MetadataDirective="COPY",
+            )
+
+        def abort_multipart_upload(self, name, upload_id):
+            """
+            マルチパートアップロードを中止し、アップロード済みのパートを削除する
+
+            既に完了・中止されている場合は何もしない。
+            """
+            try:
+                self.client.abort_multipart_upload(
+                    Bucket=self.bucket_name, Key=self._key(name), UploadId=upload_id
+                )
+            except ClientError as e:
+                if e.response["Error"].get("Code") != "NoSuchUpload":
+                    raise
+
+
+def select_media_storage():
+    """MediaFile.file が使うストレージ（settings.STORAGES["media"]）を返す"""
+    return storages["media"]
+
+
+def supports_direct_upload(storage):
+    """クライアントからストレージへの直接アップロードに対応しているか"""
+    return hasattr(storage, "create_multipart_upload")
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ハッシュ付きファイル名とマニフェストに加え、事前圧縮ファイルを出力する静的ファイルストレージ
+
+    collectstatic 時に gzip（.gz）と、brotli が利用可能な場合は Brotli（.br）の
+    圧縮済みファイルをハッシュ付きファイルの隣に書き出す。
+    既に最新の圧縮済みファイルがある場合は再生成しない。
+    """
+
+    compress_extensions = (
+        ".css",
+        ".js",
+        ".map",
+        ".svg",
+        ".txt",
+        ".html",
+        ".json",
+        ".xml",
+    )
+    compress_min_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            yield name, hashed_name, processed
+            if dry_run or isinstance(processed, Exception) or not hashed_name:
+                continue
+            self._compress(name)
+            if hashed_name != name:
+                self._compress(hashed_name)
+
+    def _compress(self, name):
+        """ファイルの gzip / Brotli 圧縮版を書き出す"""
+        if not name.endswith(self.compress_extensions):
+            return
+        path = self.path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+        if stat.st_size < self.compress_min_size:
+            return
+
+        with open(path, "rb") as f:
+            content = None
+            for suffix, compress in self._compressors():
+                target = path + suffix
+                # 圧縮済みファイルが元ファイルより新しければ再生成しない
+                if os.path.exists(target) and os.stat(target).st_mtime >= stat.st_mtime:
+                    continue
+                if content is None:
+                    content = f.read()
+                compressed = compress(content)
+                if len(compressed) >= len(content):
+                    continue
+                tmp_path = target + ".tmp"
+                with open(tmp_path, "wb") as out:
+                    out.write(compressed)
+                os.replace(tmp_path, target)
+
+    def _compressors(self):
+        yield ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli is not None:
+            yield ".br", lambda data: brotli.compress(data, quality=11)
@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..admin import EstimatedCountPaginator
+from ..models import MediaFile, Project
+from .utils import create_media_file, create_project, create_user, use_temporary_media
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_temporary_media(self)
+        self.admin = create_user("admin", is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+        self.owners = 0
+
+    def create_projects(self, count):
+        for i in range(count):
+            self.owners += 1
+            owner = create_user(f"owner{self.owners}")
+            project = create_project(owner)
+            create_media_file(owner, project, b"a" * 10, title=f"a{i}")
+            create_media_file(owner, project, b"b" * 20, title=f"b{i}")
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(context)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for name in ("admin:app_project_changelist", "admin:app_mediafile_changelist"):
+            with self.subTest(name=name):
+                Project.all_objects.all().delete()
+                self.create_projects(1)
+                few = self.count_queries(reverse(name))
+                self.create_projects(5)
+                self.assertEqual(self.count_queries(reverse(name)), few)
+
+    def test_project_changelist_shows_counts_and_sizes(self):
+        self.create_projects(1)
+        response = self.client.get(reverse("admin:app_project_changelist"))
+        self.assertContains(response, '<td class="field-media_count">2</td>', html=True)
+        self.assertContains(response, "0.00MB")
+
+    def test_move_to_trash_action(self):
+        self.create_projects(1)
+        media_file = MediaFile.objects.first()
+        url = reverse("admin:app_mediafile_changelist")
+        self.assertNotContains(self.client.get(url), "delete_selected")
+
+        self.client.post(
+            url, {"action": "move_to_trash", "_selected_action": [media_file.pk]}
+        )
+        self.assertFalse(MediaFile.objects.filter(pk=media_file.pk).exists())
+        # ゴミ箱内のファイルも一覧に表示する
+        self.assertContains(self.client.get(url), media_file.title)
+
+    def test_paginator_counts_exactly_without_statistics(self):
+        self.create_projects(2)
+        paginator = EstimatedCountPaginator(MediaFile.all_objects.order_by("pk"), 1)
+        self.assertEqual(paginator.count, 4)
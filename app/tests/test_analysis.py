@@ -0,0 +1,58 @@
+import math
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+
+from .. import analysis
+
+try:
+    import numpy as np
+except ImportError:  # numpy は任意依存
+    np = None
+
+
+def sine(seconds, amplitude, frequency=997):
+    t = np.arange(int(analysis.SAMPLE_RATE * seconds)) / analysis.SAMPLE_RATE
+    return amplitude * np.sin(2 * np.pi * frequency * t)
+
+
+def analyze(signal):
+    analyzer = analysis.AudioAnalyzer(1)
+    # K 特性を適用したチャンネルにも同じ信号を渡す（フィルターは ffmpeg が適用する）
+    samples = np.stack([signal, signal], axis=1).astype(np.float32)
+    for start in range(0, len(samples), 48000):
+        analyzer.feed(samples[start : start + 48000])
+    return analyzer
+
+
+@skipUnless(analysis.is_available(), "numpy が必要です")
+class AudioAnalysisTests(SimpleTestCase):
+    def test_levels_of_a_sine(self):
+        result = analyze(sine(5, 0.5)).result(-50, 1.0)
+        mean_square_db = 20 * math.log10(0.5 / 2**0.5)
+        self.assertAlmostEqual(result["rms_dbfs"], mean_square_db, delta=0.1)
+        self.assertAlmostEqual(result["loudness_lufs"], mean_square_db - 0.691, 1)
+        self.assertAlmostEqual(result["true_peak_dbtp"], -6.0, delta=0.2)
+        self.assertEqual(result["audio_analysis"]["duration"], 5.0)
+
+    def test_gating_ignores_quiet_parts(self):
+        loud = sine(5, 0.5)
+        signal = np.concatenate([loud, sine(5, 0.001), loud])
+        loudness = analyze(signal).integrated_loudness()
+        # 静かな部分も平均すると 1.8 dB 下がる。境界をまたぐブロックの分だけ少し下がる
+        expected = 20 * math.log10(0.5 / 2**0.5) - 0.691
+        self.assertAlmostEqual(loudness, expected, delta=0.3)
+
+    def test_silences_and_envelope(self):
+        signal = np.concatenate(
+            [sine(2, 0.5), np.zeros(analysis.SAMPLE_RATE * 3), sine(2, 0.5)]
+        )
+        analyzer = analyze(signal)
+        regions, total = analyzer.silences(-50, 1.0)
+        self.assertEqual(regions, [(2.0, 5.0)])
+        self.assertEqual(total, 3.0)
+        self.assertEqual(analyzer.silences(-50, 4.0), ([], 0.0))
+
+        envelope, interval = analyzer.envelope()
+        self.assertLessEqual(len(envelope), analysis.ENVELOPE_POINTS)
+        self.assertAlmostEqual(len(envelope) * interval, 7.0, 1)
@@ -0,0 +1,110 @@
+import base64
+import json
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .utils import (
+    collect,
+    create_media_file,
+    create_project,
+    create_user,
+    use_temporary_media,
+)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_temporary_media(self)
+        self.user = create_user()
+        self.project = create_project(self.user)
+        self.client.force_login(self.user)
+
+    def list_url(self):
+        return reverse("api:project_media_list", args=[self.project.pk])
+
+    def get_json(self, url, data=None, **headers):
+        response = self.client.get(url, data, headers=headers)
+        if response.status_code != 200:
+            return response, None
+        # 一覧の本文は非同期イテレータで書き出される
+        body = async_to_sync(collect)(response.streaming_content)
+        return response, json.loads(body)
+
+    def test_keyset_cursor_pages_through_every_item_once(self):
+        created_at = timezone.now()
+        ids = {
+            create_media_file(
+                self.user, self.project, title=f"media{i}", created_at=created_at
+            ).pk
+            for i in range(5)
+        }
+
+        seen, cursor = [], None
+        while True:
+            data = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            _, body = self.get_json(self.list_url(), data)
+            seen += [item["id"] for item in body["results"]]
+            cursor = body["next"]
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(ids))
+        self.assertEqual(len(seen), len(ids))
+
+    def test_invalid_cursor_is_rejected(self):
+        cursor = base64.urlsafe_b64encode(b"[1]").decode()
+        response = self.client.get(self.list_url(), {"cursor": cursor})
+        self.assertEqual(response.status_code, 400)
+
+    def test_etag_returns_304_until_the_list_changes(self):
+        create_media_file(self.user, self.project, title="first")
+        response, _ = self.get_json(self.list_url())
+        etag = response["ETag"]
+
+        response = self.client.get(self.list_url(), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        create_media_file(self.user, self.project, title="second")
+        response = self.client.get(self.list_url(), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_etag(self):
+        media_file = create_media_file(self.user, self.project)
+        url = reverse("api:media_detail", args=[media_file.pk])
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        media_file.title = "renamed"
+        media_file.save()
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "renamed")
+
+    def test_fields_limits_the_returned_keys(self):
+        media_file = create_media_file(self.user, self.project)
+        _, body = self.get_json(self.list_url(), {"fields": "id,title"})
+        self.assertEqual(body["results"], [{"id": media_file.pk, "title": "audio"}])
+
+        url = reverse("api:media_detail", args=[media_file.pk])
+        response = self.client.get(url, {"fields": "url"})
+        self.assertEqual(
+            response.json(), {"url": f"{settings.MEDIA_URL}{media_file.file.name}"}
+        )
+
+        response = self.client.get(self.list_url(), {"fields": "id,password"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_users_media_is_not_found(self):
+        other = create_user("bob")
+        media_file = create_media_file(other, create_project(other))
+
+        response = self.client.get(reverse("api:media_detail", args=[media_file.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn("error", response.json())
@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.template import engines
+from django.test import TestCase
+from django.urls import reverse
+
+from ..cache import get_media_list_version
+from ..warmup import warm_templates
+from .utils import create_media_file, create_project, create_user, use_temporary_media
+
+
+class MediaListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_temporary_media(self)
+        self.user = create_user()
+        self.project = create_project(self.user)
+        self.client.force_login(self.user)
+
+    def test_media_changes_bump_the_list_version(self):
+        version = get_media_list_version(self.project.pk)
+        self.assertEqual(get_media_list_version(self.project.pk), version)
+
+        media_file = create_media_file(self.user, self.project)
+        created = get_media_list_version(self.project.pk)
+        self.assertNotEqual(created, version)
+
+        media_file.delete()
+        self.assertNotEqual(get_media_list_version(self.project.pk), created)
+
+    def test_cached_list_shows_renamed_media(self):
+        media_file = create_media_file(self.user, self.project, title="before")
+        url = reverse("app:project_media_list", args=[self.project.pk])
+        self.assertContains(self.client.get(url), "before")
+
+        media_file.title = "after"
+        media_file.save()
+        response = self.client.get(url)
+        self.assertContains(response, "after")
+        self.assertNotContains(response, "before")
+
+
+class WarmupTests(TestCase):
+    def test_warm_templates_fills_the_cached_loader(self):
+        self.assertGreater(warm_templates(), 0)
+        loader = engines["django"].engine.template_loaders[0]
+        self.assertIn("multimedia/list.html", loader.get_template_cache)
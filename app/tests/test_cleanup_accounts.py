@@ -0,0 +1,71 @@
+import io
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import User
+from .utils import create_user
+
+
+class CleanupAccountsTests(TestCase):
+    def create_user(self, name, days=30, **kwargs):
+        user = create_user(name, is_active=False, **kwargs)
+        User.objects.filter(pk=user.pk).update(
+            date_joined=timezone.now() - timedelta(days=days)
+        )
+        return user
+
+    def cleanup(self, **options):
+        output = io.StringIO()
+        call_command(
+            "cleanup_accounts",
+            days=7,
+            batch_size=2,
+            sleep=0,
+            stdout=output,
+            **options,
+        )
+        return output.getvalue()
+
+    def test_deletes_only_stale_unactivated_users_in_batches(self):
+        for i in range(5):
+            self.create_user(f"stale{i}")
+        kept = [
+            self.create_user("recent", days=0),
+            self.create_user("staff", is_staff=True),
+            self.create_user("disabled", last_login=timezone.now()),
+        ]
+
+        output = self.cleanup()
+
+        self.assertIn("ユーザー 5件", output)
+        self.assertIn("3バッチ", output)
+        self.assertQuerySetEqual(
+            User.objects.order_by("pk"), kept, transform=lambda user: user
+        )
+
+    def test_max_batches_limits_one_run(self):
+        for i in range(5):
+            self.create_user(f"stale{i}")
+
+        self.cleanup(max_batches=1)
+        self.assertEqual(User.objects.count(), 3)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.db")
+    def test_deletes_expired_database_sessions(self):
+        now = timezone.now()
+        for i in range(3):
+            Session.objects.create(
+                session_key=f"expired{i}",
+                session_data="",
+                expire_date=now - timedelta(days=1),
+            )
+        Session.objects.create(
+            session_key="live", session_data="", expire_date=now + timedelta(days=1)
+        )
+
+        self.assertIn("セッション 3件", self.cleanup())
+        self.assertEqual(list(Session.objects.values_list("pk", flat=True)), ["live"])
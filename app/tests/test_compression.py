@@ -0,0 +1,103 @@
+import gzip
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.views import View
+
+from ..compression import choose_encoding
+from ..middleware import CompressionMiddleware
+from ..views import PrivatePageCacheMixin
+from .utils import create_media_file, create_project, create_user, use_temporary_media
+
+HTML = b"<p>" + b"media " * 1000 + b"</p>"
+
+
+@override_settings(COMPRESSION_ENABLED=True, COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def compress(self, response, accept_encoding="gzip"):
+        request = RequestFactory().get(
+            "/", headers={"accept-encoding": accept_encoding}
+        )
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_html(self):
+        response = HttpResponse(HTML)
+        response["ETag"] = '"abc"'
+
+        response = self.compress(response)
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), HTML)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_compresses_streaming_responses(self):
+        response = self.compress(StreamingHttpResponse([HTML[:100], b"", HTML[100:]]))
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), HTML)
+
+    def test_leaves_other_responses_alone(self):
+        accel = HttpResponse(HTML)
+        accel["X-Accel-Redirect"] = "/protected_media/a.html"
+        for response in (
+            HttpResponse(b"<p>short</p>"),
+            HttpResponse(HTML, content_type="image/jpeg"),
+            HttpResponse(HTML, status=206),
+            accel,
+        ):
+            with self.subTest(response=response):
+                self.assertFalse(self.compress(response).has_header("Content-Encoding"))
+
+        response = self.compress(HttpResponse(HTML), accept_encoding="identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(choose_encoding("*"), choose_encoding("br, gzip"))
+        self.assertIsNone(choose_encoding("gzip;q=0"))
+        self.assertIsNone(choose_encoding(""))
+
+
+class PrivatePageCacheTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = create_user()
+        self.project = create_project(self.user)
+        self.client.force_login(self.user)
+
+    def test_detail_page_returns_304_until_the_media_file_changes(self):
+        media_file = create_media_file(self.user, self.project)
+        url = reverse("app:media_detail", args=[self.project.pk, media_file.pk])
+
+        response = self.client.get(url)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        self.assertIn("Cookie", response["Vary"])
+        etag = response["ETag"]
+
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        media_file.title = "renamed"
+        media_file.save()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "renamed")
+
+    def test_pages_without_etag_parts_are_revalidated_without_etag(self):
+        class PageView(View):
+            def get(self, request):
+                return HttpResponse("page")
+
+        class CachedPageView(PrivatePageCacheMixin, PageView):
+            pass
+
+        request = RequestFactory().get("/", headers={"if-none-match": "*"})
+        response = CachedPageView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("ETag"))
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import threading
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..events import (
+    MemoryBroker,
+    Subscription,
+    format_sse,
+    get_broker,
+    media_channel,
+    publish_status,
+    status_event,
+)
+from ..websocket import websocket_application
+from .utils import (
+    collect,
+    create_media_file,
+    create_project,
+    create_user,
+    use_temporary_media,
+)
+
+
+class BrokerTests(SimpleTestCase):
+    async def test_delivers_events_published_from_other_threads(self):
+        broker = MemoryBroker()
+        subscription = broker.subscribe("media:1")
+        other = broker.subscribe("media:2")
+
+        thread = threading.Thread(
+            target=broker.publish, args=("media:1", status_event("ready"))
+        )
+        thread.start()
+        thread.join()
+
+        self.assertEqual(await subscription.get(1), status_event("ready"))
+        self.assertIsNone(await other.get(0.01))
+
+    async def test_unsubscribe_removes_the_channel(self):
+        broker = MemoryBroker()
+        subscription = broker.subscribe("media:1")
+        broker.unsubscribe(subscription)
+        broker.publish("media:1", status_event("ready"))
+
+        self.assertEqual(broker._subscriptions, {})
+        self.assertIsNone(await subscription.get(0.01))
+
+    async def test_slow_reader_keeps_the_newest_events(self):
+        subscription = Subscription("media:1", asyncio.get_running_loop(), maxsize=2)
+        for i in range(3):
+            subscription.deliver({"type": "stage", "n": i})
+        await asyncio.sleep(0)
+
+        self.assertEqual((await subscription.get(1))["n"], 1)
+        self.assertEqual((await subscription.get(1))["n"], 2)
+
+    def test_format_sse(self):
+        self.assertEqual(
+            format_sse(status_event("failed", "エラー")),
+            'event: status\ndata: {"type": "status", "status": "failed", '
+            '"error": "エラー"}\n\n',
+        )
+
+
+# 購読は EVENTS_STREAM_TIMEOUT 秒で終わるため、0 にすると最初のイベントだけを送って終わる
+@override_settings(EVENTS_STREAM_TIMEOUT=0)
+class ProgressEventsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_temporary_media(self)
+        self.user = create_user()
+        self.media_file = create_media_file(self.user, create_project(self.user))
+
+    def url(self, media_file):
+        return reverse("app:media_events", args=[media_file.pk])
+
+    def test_streams_the_current_status(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url(self.media_file))
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["X-Accel-Buffering"], "no")
+        body = async_to_sync(collect)(response.streaming_content).decode()
+        self.assertEqual(
+            body,
+            f"retry: {settings.EVENTS_RETRY_MILLISECONDS}\n\n"
+            + format_sse(status_event(self.media_file.processing_status)),
+        )
+
+    def test_requires_the_owner(self):
+        self.assertEqual(self.client.get(self.url(self.media_file)).status_code, 401)
+
+        self.client.force_login(create_user("bob"))
+        self.assertEqual(self.client.get(self.url(self.media_file)).status_code, 404)
+
+
+class WebSocketTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = create_user()
+        self.media_file = create_media_file(self.user, create_project(self.user))
+        self.client.force_login(self.user)
+
+    def scope(self, path=None, origin="http://testserver"):
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME]
+        return {
+            "type": "websocket",
+            "path": path or f"/ws/media/{self.media_file.pk}/",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"origin", origin.encode()),
+                (b"cookie", f"{cookie.key}={cookie.value}".encode()),
+            ],
+        }
+
+    async def run_application(self, scope, events=()):
+        """接続してイベントを送り、切断されるまでに送られたメッセージを返す"""
+        incoming = asyncio.Queue()
+        await incoming.put({"type": "websocket.connect"})
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def publish_when_subscribed():
+            while media_channel(self.media_file.pk) not in get_broker()._subscriptions:
+                await asyncio.sleep(0.01)
+            for event in events:
+                publish_status(self.media_file.pk, *event)
+
+        publisher = asyncio.create_task(publish_when_subscribed())
+        try:
+            await asyncio.wait_for(websocket_application(scope, incoming.get, send), 5)
+        finally:
+            publisher.cancel()
+        return sent
+
+    async def test_rejects_other_origins_and_users(self):
+        sent = await self.run_application(self.scope(origin="http://evil.example"))
+        self.assertEqual(sent, [{"type": "websocket.close", "code": 4403}])
+
+        other = await sync_to_async(create_user)("bob")
+        media_file = await sync_to_async(create_media_file)(other, title="bob")
+        sent = await self.run_application(self.scope(f"/ws/media/{media_file.pk}/"))
+        self.assertEqual(sent, [{"type": "websocket.close", "code": 4404}])
+
+        sent = await self.run_application(self.scope("/ws/media/abc/"))
+        self.assertEqual(sent, [{"type": "websocket.close", "code": 4404}])
+
+    @override_settings(EVENTS_STREAM_TIMEOUT=1, EVENTS_HEARTBEAT_SECONDS=1)
+    async def test_sends_the_current_status_and_published_events(self):
+        sent = await self.run_application(self.scope(), events=[("ready",)])
+
+        self.assertEqual(sent[0], {"type": "websocket.accept"})
+        texts = [json.loads(m["text"]) for m in sent if m["type"] == "websocket.send"]
+        self.assertEqual(
+            texts,
+            [status_event(self.media_file.processing_status), status_event("ready")],
+        )
+        self.assertEqual(sent[-1], {"type": "websocket.close", "code": 1000})
@@ -0,0 +1,113 @@
+import io
+import os
+import shutil
+import struct
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from ..faststart import iter_atoms, needs_faststart, relocate_moov
+from .utils import (
+    create_media_file,
+    create_project,
+    create_user,
+    sha256,
+    use_temporary_media,
+)
+
+
+def _atom(kind, body):
+    return struct.pack(">I4s", 8 + len(body), kind) + body
+
+
+def build_mp4(offset_kind=b"stco", large_mdat=False):
+    """moov が mdat の後ろにある MP4 と、各チャンクの内容を返す"""
+    ftyp = _atom(b"ftyp", b"isom\0\0\0\0isom")
+    chunks = [b"CHUNK-A" * 10, b"CHUNK-B" * 20, b"CHUNK-C" * 5]
+    body = b"".join(chunks)
+    if large_mdat:
+        mdat = struct.pack(">I4sQ", 1, b"mdat", 16 + len(body)) + body
+        header_size = 16
+    else:
+        mdat = _atom(b"mdat", body)
+        header_size = 8
+    offsets, offset = [], len(ftyp) + header_size
+    for chunk in chunks:
+        offsets.append(offset)
+        offset += len(chunk)
+    entry_format = ">I" if offset_kind == b"stco" else ">Q"
+    table = _atom(
+        offset_kind,
+        b"\0\0\0\0"
+        + struct.pack(">I", len(offsets))
+        + b"".join(struct.pack(entry_format, value) for value in offsets),
+    )
+    stbl = _atom(b"stbl", _atom(b"stsd", b"\0" * 8) + table)
+    moov = _atom(
+        b"moov",
+        _atom(b"mvhd", b"\0" * 20)
+        + _atom(b"trak", _atom(b"mdia", _atom(b"minf", stbl))),
+    )
+    free = _atom(b"free", b"x" * 13)
+    return ftyp + mdat + free + moov + _atom(b"udta", b"meta"), chunks
+
+
+class RelocateMoovTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "movie.mp4")
+
+    def assertRelocated(self, offset_kind, large_mdat=False):
+        data, chunks = build_mp4(offset_kind, large_mdat)
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+        self.assertTrue(needs_faststart(self.path))
+        self.assertTrue(relocate_moov(self.path))
+
+        with open(self.path, "rb") as f:
+            result = f.read()
+            kinds = [kind for kind, *_ in iter_atoms(f, 0, len(result))]
+        self.assertEqual(len(result), len(data))
+        self.assertLess(kinds.index(b"moov"), kinds.index(b"mdat"))
+        table = result.index(offset_kind)
+        entry_format, entry_size = (">I", 4) if offset_kind == b"stco" else (">Q", 8)
+        for i, chunk in enumerate(chunks):
+            (offset,) = struct.unpack_from(
+                entry_format, result, table + 12 + i * entry_size
+            )
+            self.assertEqual(result[offset : offset + len(chunk)], chunk)
+
+        # 変換済みのファイルは変更しない
+        self.assertFalse(needs_faststart(self.path))
+        self.assertFalse(relocate_moov(self.path))
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["movie.mp4"])
+
+    def test_stco_offsets_are_shifted_by_the_moov_size(self):
+        self.assertRelocated(b"stco")
+
+    def test_co64_offsets_with_a_64bit_mdat(self):
+        self.assertRelocated(b"co64", large_mdat=True)
+
+
+class MediaFaststartCommandTests(TestCase):
+    def test_converts_existing_files_and_updates_the_hash(self):
+        use_temporary_media(self)
+        user = create_user()
+        data, _ = build_mp4()
+        media_file = create_media_file(
+            user, create_project(user), data, file_type="video", mime_type="video/mp4"
+        )
+
+        output = io.StringIO()
+        call_command("media_faststart", stdout=output)
+
+        self.assertIn("変換: 1件, 変換不要: 0件, 失敗: 0件", output.getvalue())
+        self.assertFalse(needs_faststart(media_file.get_physical_path()))
+        with open(media_file.get_physical_path(), "rb") as f:
+            content_hash = sha256(f.read())
+        media_file.refresh_from_db()
+        self.assertEqual(media_file.content_hash, content_hash)
+        self.assertNotEqual(content_hash, sha256(data))
@@ -0,0 +1,130 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.test import TestCase
+
+from .. import fingerprint
+from ..models import MediaFingerprint, MediaFingerprintKey
+from .utils import create_media_file, create_project, create_user, use_temporary_media
+
+try:
+    import numpy as np
+except ImportError:  # numpy は任意依存
+    np = None
+
+
+def synthetic_music(seed, seconds=30):
+    """ランダムな長さ・周波数の音を重ねた、指紋の比較用の信号"""
+    rng = np.random.default_rng(seed)
+    rate = fingerprint.SAMPLE_RATE
+    count = rate * seconds
+    t = np.arange(count) / rate
+    signal = 0.01 * rng.standard_normal(count)
+    for _ in range(10 * seconds):
+        length = int(rng.integers(rate // 4, rate * 2))
+        start = int(rng.integers(0, count - length))
+        signal[start : start + length] += (
+            rng.uniform(0.05, 0.3)
+            * np.hanning(length)
+            * np.sin(2 * np.pi * rng.uniform(100, 2500) * t[start : start + length])
+        )
+    return (signal / np.abs(signal).max() * 0.8).astype(np.float32)
+
+
+def degrade(signal):
+    """音量・雑音・簡単な低域通過・30ms のずれを加える（別形式への変換の代わり）"""
+    noisy = 0.6 * signal + 0.003 * np.random.default_rng(9).standard_normal(len(signal))
+    filtered = noisy + 0.15 * np.concatenate([[0], noisy[:-1]])
+    shift = np.zeros(int(fingerprint.SAMPLE_RATE * 0.03))
+    return np.concatenate([shift, filtered])[: len(signal)].astype(np.float32)
+
+
+def build_fingerprint(signal):
+    builder = fingerprint.FingerprintBuilder()
+    block = fingerprint.SAMPLE_RATE * 7
+    for start in range(0, len(signal), block):
+        builder.feed(signal[start : start + block])
+    return builder
+
+
+@skipUnless(fingerprint.is_available(), "numpy が必要です")
+class FingerprintTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.original = build_fingerprint(synthetic_music(1))
+        cls.degraded = build_fingerprint(degrade(synthetic_music(1)))
+        cls.unrelated = build_fingerprint(synthetic_music(2))
+
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = create_user()
+        self.project = create_project(self.user)
+
+    def test_codes_do_not_depend_on_block_boundaries(self):
+        builder = fingerprint.FingerprintBuilder()
+        builder.feed(synthetic_music(1))
+        self.assertTrue(np.array_equal(builder.codes(), self.original.codes()))
+        self.assertEqual(builder.query_codes(), self.original.query_codes())
+
+    def test_bit_error_rate(self):
+        codes = self.original.codes()
+        self.assertEqual(fingerprint.bit_error_rate(codes, codes), 0.0)
+        self.assertLess(
+            fingerprint.bit_error_rate(codes, self.degraded.codes()),
+            settings.MEDIA_FINGERPRINT_MAX_BIT_ERROR_RATE,
+        )
+        self.assertGreater(
+            fingerprint.bit_error_rate(codes, self.unrelated.codes()), 0.4
+        )
+        # 重なりが短すぎる場合は比べない
+        self.assertEqual(fingerprint.bit_error_rate(codes, codes[:50]), 1.0)
+
+    def test_silence_is_not_informative(self):
+        builder = build_fingerprint(np.zeros(fingerprint.SAMPLE_RATE * 30, "f4"))
+        self.assertFalse(builder.is_informative())
+        self.assertTrue(self.original.is_informative())
+
+    def test_keys_match_by_exact_sub_fingerprints(self):
+        keys = set(fingerprint.index_codes(self.original.codes().tobytes()))
+        self.assertLessEqual(
+            len(keys), fingerprint.KEY_FRAMES // fingerprint.KEY_STRIDE + 1
+        )
+        self.assertTrue(keys & set(self.degraded.query_codes()))
+        self.assertFalse(keys & set(self.unrelated.query_codes()))
+
+    def store(self, builder, title):
+        media_file = create_media_file(
+            self.user, self.project, title.encode(), title=title
+        )
+        codes = builder.codes().tobytes()
+        record = MediaFingerprint.objects.create(
+            media_file=media_file,
+            user=self.user,
+            version=fingerprint.VERSION,
+            codes=codes,
+            duration=30.0,
+        )
+        MediaFingerprintKey.objects.bulk_create(
+            MediaFingerprintKey(fingerprint=record, user=self.user, code=code)
+            for code in fingerprint.index_codes(codes)
+        )
+        return record
+
+    def test_find_similar(self):
+        original = self.store(self.original, "original")
+        self.store(self.unrelated, "unrelated")
+        degraded = self.store(self.degraded, "degraded")
+
+        similar, similarity = fingerprint.find_similar(
+            degraded, self.degraded.query_codes()
+        )
+        self.assertEqual(similar.pk, original.media_file_id)
+        self.assertGreater(similarity, 0.7)
+
+        # ゴミ箱内のファイルは候補にしない
+        original.media_file.soft_delete()
+        self.assertEqual(
+            fingerprint.find_similar(degraded, self.degraded.query_codes()),
+            (None, None),
+        )
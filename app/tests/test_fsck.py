@@ -0,0 +1,72 @@
+import io
+import os
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import MediaFile
+from .utils import create_media_file, create_project, create_user, use_temporary_media
+
+
+class MediaFsckTests(TestCase):
+    def setUp(self):
+        self.media_root = use_temporary_media(self)
+        self.user = create_user()
+        self.project = create_project(self.user)
+
+    def fsck(self, *args):
+        output = io.StringIO()
+        call_command(
+            "media_fsck", *args, tier=["hot"], stdout=output, stderr=io.StringIO()
+        )
+        return output.getvalue()
+
+    def write(self, name, data=b"orphan"):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_reports_orphans_and_missing_files_in_path_order(self):
+        kept = create_media_file(self.user, self.project, title="kept")
+        lost = create_media_file(self.user, self.project, title="lost")
+        os.remove(os.path.join(self.media_root, lost.file.name))
+        # 名前の順序がディレクトリの深さと一致しないファイル
+        self.write("a/b.mp3")
+        self.write("a.b/c.mp3")
+        self.write("a-z.mp3")
+
+        output = self.fsck("--workers", "2", "--chunk-size", "1")
+
+        # メディアファイルとその版がそれぞれファイルを参照する
+        self.assertIn("一致: 2件, レコードなし: 3件, ファイルなし: 2件", output)
+        self.assertIn(
+            f"ファイルなし: {lost.file.name} (mediafile id={lost.pk})", output
+        )
+        self.assertIn(
+            f"ファイルなし: {lost.file.name} "
+            f"(mediafileversion id={lost.current_version_id})",
+            output,
+        )
+        self.assertNotIn(kept.file.name, output)
+        orphans = [
+            line.removeprefix("レコードなし: ")
+            for line in output.splitlines()
+            if line.startswith("レコードなし: ")
+        ]
+        self.assertEqual(orphans, ["a-z.mp3", "a.b/c.mp3", "a/b.mp3"])
+
+    def test_delete_options(self):
+        lost = create_media_file(self.user, self.project, title="lost")
+        os.remove(os.path.join(self.media_root, lost.file.name))
+        old = self.write("old.mp3")
+        os.utime(old, (0, 0))
+        recent = self.write("recent.mp3")
+
+        self.fsck("--delete-orphans", "--delete-missing")
+
+        self.assertFalse(os.path.exists(old))
+        # アップロード中の可能性がある新しいファイルは残す
+        self.assertTrue(os.path.exists(recent))
+        self.assertFalse(MediaFile.all_objects.filter(pk=lost.pk).exists())
@@ -0,0 +1,94 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .. import hashers
+from ..hashers import PasswordHashingBusy, run_hashing
+from .utils import TEST_STORAGES, create_user
+
+
+@override_settings(
+    PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_SIZE=1, PASSWORD_HASH_TIMEOUT=0.2
+)
+class RunHashingTests(SimpleTestCase):
+    def setUp(self):
+        # 設定を反映したプールとセマフォをテストごとに作り直す
+        for name in ("_executor", "_slots"):
+            patcher = mock.patch.object(hashers, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: hashers._executor and hashers._executor.shutdown())
+
+    def test_returns_the_result(self):
+        self.assertEqual(run_hashing(pow, 2, 10), 1024)
+
+    def test_full_queue_is_rejected_immediately(self):
+        slots = hashers._get_slots()
+        for _ in range(2):
+            slots.acquire()
+        try:
+            with self.assertRaises(PasswordHashingBusy):
+                run_hashing(pow, 2, 10)
+        finally:
+            slots.release()
+            slots.release()
+        self.assertEqual(run_hashing(pow, 2, 10), 1024)
+
+    def test_timeout_keeps_the_slot_until_the_running_hash_finishes(self):
+        started, finish = threading.Event(), threading.Event()
+
+        def slow_hash():
+            started.set()
+            finish.wait(5)
+
+        with self.assertRaises(PasswordHashingBusy):
+            run_hashing(slow_hash)
+        self.assertTrue(started.is_set())
+
+        # 実行中の計算が終わるまでは、待機した計算も時間切れになる（取り消して枠を返す）
+        for _ in range(3):
+            with self.assertRaises(PasswordHashingBusy):
+                run_hashing(pow, 2, 10)
+
+        finish.set()
+        hashers._executor.submit(lambda: None).result(5)
+        self.assertEqual(run_hashing(pow, 2, 10), 1024)
+
+
+@override_settings(STORAGES=TEST_STORAGES, RATELIMIT_ENABLED=False)
+class HashingBusyViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        busy = mock.patch("app.backends.run_hashing", side_effect=PasswordHashingBusy)
+        busy.start()
+        self.addCleanup(busy.stop)
+
+    def test_login_returns_503_instead_of_invalid_credentials(self):
+        create_user("alice")
+        for username in ("alice", "nobody"):
+            with self.subTest(username=username):
+                response = self.client.post(
+                    reverse("app:login"),
+                    {"username": username, "password": "password"},
+                )
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response["Retry-After"], "30")
+                self.assertContains(response, "混雑しています", status_code=503)
+                self.assertNotContains(response, "正しくありません", status_code=503)
+
+    def test_signup_returns_503(self):
+        with mock.patch("app.forms.run_hashing", side_effect=PasswordHashingBusy):
+            response = self.client.post(
+                reverse("app:signup"),
+                {
+                    "username": "alice",
+                    "email": "alice@example.com",
+                    "password1": "a-long-password-1",
+                    "password2": "a-long-password-1",
+                },
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertContains(response, "混雑しています", status_code=503)
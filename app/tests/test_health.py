@@ -0,0 +1,57 @@
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..warmup import warm
+from .utils import TEST_STORAGES, use_temporary_media
+
+
+class HealthCheckTests(TestCase):
+    def setUp(self):
+        self.media_root = use_temporary_media(self)
+
+    def test_healthz_skips_host_validation(self):
+        response = self.client.get("/healthz", headers={"host": "unknown.example"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "ok"})
+
+    def test_readyz_reports_each_check(self):
+        response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["checks"],
+            {"database": "ok", "migrations": "ok", "storage": "ok"},
+        )
+
+    def test_readyz_is_unavailable_until_storage_and_migrations_are_ready(self):
+        missing = os.path.join(self.media_root, "missing")
+        with (
+            override_settings(MEDIA_ROOT=missing),
+            mock.patch(
+                "app.middleware.MigrationExecutor.migration_plan", return_value=[None]
+            ),
+        ):
+            response = self.client.get("/readyz")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(
+            response.json(),
+            {
+                "status": "unavailable",
+                "checks": {
+                    "database": "ok",
+                    "migrations": "error",
+                    "storage": "error",
+                },
+            },
+        )
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class WarmupTests(SimpleTestCase):
+    def test_warm_loads_templates_and_urls(self):
+        counts = warm()
+        self.assertGreater(counts["templates"], 0)
+        self.assertGreater(counts["urls"], 0)
+        self.assertEqual(counts["static"], 0)
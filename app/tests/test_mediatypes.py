@@ -0,0 +1,88 @@
+import io
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..mediatypes import coerce_content_type, sniff_content_type
+from ..models import MediaFile
+from .utils import create_media_file, create_project, create_user, use_temporary_media
+
+
+class SniffContentTypeTests(SimpleTestCase):
+    def test_signatures(self):
+        cases = {
+            b"ID3\x04\x00": "audio/mpeg",
+            b"\xff\xfb\x90\x00": "audio/mpeg",
+            b"\xff\xf1\x50\x80": "audio/aac",
+            b"RIFF\x00\x00\x00\x00WAVEfmt ": "audio/wav",
+            b"RIFF\x00\x00\x00\x00AVI LIST": "video/x-msvideo",
+            b"\x00\x00\x00\x20ftypM4A \x00\x00\x00\x00": "audio/mp4",
+            b"\x00\x00\x00\x20ftypisom\x00\x00\x02\x00": "video/mp4",
+            b"\x00\x00\x00\x14ftypqt  \x00\x00\x00\x00": "video/quicktime",
+            b"OggS\x00\x02" + b"\x01vorbis": "audio/ogg",
+            b"OggS\x00\x02" + b"\x80theora": "video/ogg",
+            b"\x1a\x45\xdf\xa3\x9f\x42\x82\x84webm": "video/webm",
+            b"fLaC\x00\x00\x00\x22": "audio/flac",
+            b"<html><body>": None,
+            b"": None,
+        }
+        for head, expected in cases.items():
+            with self.subTest(head=head):
+                self.assertEqual(sniff_content_type(head), expected)
+
+    def test_coerce_containers_to_the_selected_file_type(self):
+        self.assertEqual(coerce_content_type("video/mp4", "audio"), "audio/mp4")
+        self.assertEqual(coerce_content_type("audio/mp4", "video"), "video/mp4")
+        self.assertEqual(coerce_content_type("audio/mpeg", "audio"), "audio/mpeg")
+        self.assertIsNone(coerce_content_type("audio/mpeg", "video"))
+        self.assertIsNone(coerce_content_type(None, "audio"))
+
+
+class UploadContentTypeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_temporary_media(self)
+        self.user = create_user()
+        self.project = create_project(self.user)
+        self.client.force_login(self.user)
+
+    def upload(self, name, data, content_type="audio/mpeg"):
+        return self.client.post(
+            reverse("app:project_media_upload", args=[self.project.pk]),
+            {
+                "project": self.project.pk,
+                "title": name,
+                "file_type": "audio",
+                "file": SimpleUploadedFile(name, data, content_type=content_type),
+            },
+        )
+
+    def test_upload_stores_the_detected_type(self):
+        # ブラウザの申告ではなく先頭バイトで判定する
+        self.upload("song.bin", b"fLaC\x00\x00\x00\x22", "application/octet-stream")
+        self.assertEqual(MediaFile.objects.get().mime_type, "audio/flac")
+
+    def test_upload_with_a_mismatched_signature_is_rejected(self):
+        response = self.upload("fake.mp3", b"<html>not audio</html>")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(MediaFile.all_objects.exists())
+
+    def test_media_detect_types_backfills_legacy_rows(self):
+        legacy = create_media_file(
+            self.user, self.project, b"OggS\x00\x02\x01vorbis", mime_type=""
+        )
+        unknown = create_media_file(
+            self.user, self.project, b"unknown", title="unknown", mime_type=""
+        )
+
+        output = io.StringIO()
+        call_command("media_detect_types", stdout=output, stderr=io.StringIO())
+
+        self.assertIn("判定: 1件, 失敗: 1件", output.getvalue())
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.mime_type, "audio/ogg")
+        unknown.refresh_from_db()
+        self.assertEqual(unknown.mime_type, "")
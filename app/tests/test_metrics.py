@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ..concurrency import ConcurrencyLimiter, wrap
+from ..metrics import (
+    MetricsMiddleware,
+    WorkerMetrics,
+    read_snapshots,
+    render_metrics,
+    write_snapshot,
+)
+
+
+def request_receive(*chunks):
+    """チャンクに分けたリクエストボディを返し、その後は切断を待つ receive"""
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks or [b""])
+    ]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()
+
+    return receive
+
+
+async def collect_messages(app, receive):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await app({"type": "http"}, receive, send)
+    return messages
+
+
+def response_app(content_type=b"text/plain", on_body=None):
+    """ボディをすべて受信してから応答するアプリケーション"""
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            if not message.get("more_body"):
+                break
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", content_type)],
+            }
+        )
+        if on_body is not None:
+            on_body()
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return app
+
+
+class ConcurrencyLimiterTests(SimpleTestCase):
+    async def test_holds_the_slot_from_the_last_body_chunk_to_the_response(self):
+        held = []
+        limiter = ConcurrencyLimiter(None, 1, 1)
+        limiter.app = response_app(
+            on_body=lambda: held.append(limiter.semaphore.locked())
+        )
+        receive = request_receive(b"a", b"b")
+
+        async def receive_and_check():
+            message = await receive()
+            # 受信中の（最後でない）チャンクでは枠を取らない
+            held.append(limiter.semaphore.locked())
+            return message
+
+        await limiter({"type": "http"}, receive_and_check, mock.AsyncMock())
+
+        self.assertEqual(held, [False, False, True])
+        self.assertFalse(limiter.semaphore.locked())
+
+    @override_settings(RATELIMIT_RETRY_AFTER=7)
+    async def test_returns_503_when_no_slot_becomes_free(self):
+        limiter = ConcurrencyLimiter(response_app(), 1, 0.01)
+        await limiter.semaphore.acquire()
+
+        messages = await collect_messages(limiter, request_receive())
+
+        self.assertEqual(messages[0]["status"], 503)
+        self.assertIn((b"retry-after", b"7"), messages[0]["headers"])
+        limiter.semaphore.release()
+        self.assertFalse(limiter.semaphore.locked())
+
+    async def test_event_streams_release_the_slot_when_they_start(self):
+        held = []
+        limiter = ConcurrencyLimiter(None, 1, 1)
+        limiter.app = response_app(
+            b"text/event-stream",
+            on_body=lambda: held.append(limiter.semaphore.locked()),
+        )
+
+        await collect_messages(limiter, request_receive())
+
+        self.assertEqual(held, [False])
+
+    @override_settings(DB_CONCURRENCY_LIMIT=0)
+    def test_wrap_is_disabled_by_default(self):
+        app = response_app()
+        self.assertIs(wrap(app), app)
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        override = override_settings(METRICS_DIR=metrics_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.metrics_dir = metrics_dir
+        self.worker_metrics = WorkerMetrics()
+        patcher = mock.patch("app.metrics.worker_metrics", self.worker_metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_middleware_counts_requests_until_the_response_is_sent(self):
+        in_flight = []
+        app = MetricsMiddleware(
+            response_app(
+                on_body=lambda: in_flight.append(self.worker_metrics.in_flight)
+            )
+        )
+
+        with mock.patch.object(self.worker_metrics, "ensure_monitor"):
+            await collect_messages(app, request_receive())
+
+        self.assertEqual(in_flight, [1])
+        self.assertEqual(self.worker_metrics.in_flight, 0)
+        self.assertEqual(self.worker_metrics.requests_total, 1)
+
+    def test_render_metrics_includes_every_worker(self):
+        write_snapshot({**WorkerMetrics().snapshot(), "pid": 1, "in_flight": 3})
+        with open(os.path.join(self.metrics_dir, "broken.json"), "w") as f:
+            f.write("{")
+        self.worker_metrics.requests_total = 2
+
+        self.assertEqual(
+            [snapshot["pid"] for snapshot in read_snapshots()], [1, os.getpid()]
+        )
+        text = render_metrics()
+        self.assertIn('app_worker_in_flight_requests{pid="1"} 3', text)
+        self.assertIn(f'app_worker_requests_total{{pid="{os.getpid()}"}} 2', text)
+        self.assertIn("app_workers 2", text)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_metrics_endpoint(self):
+        with open(os.path.join(self.metrics_dir, "1.json"), "w") as f:
+            json.dump({**WorkerMetrics().snapshot(), "pid": 1}, f)
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4")
+        self.assertIn(b"app_workers 1", response.content)
@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .. import observability
+from ..observability import FileSpanExporter, JsonFormatter, RequestIdFilter, span
+from .utils import TEST_STORAGES, create_user
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def submit(self, span):
+        self.spans.append(span)
+
+
+class JsonLoggingTests(SimpleTestCase):
+    def test_records_are_formatted_as_json_with_the_request_id(self):
+        record = logging.makeLogRecord(
+            {"name": "app", "levelname": "WARNING", "msg": "遅い: %s", "args": ("/",)}
+        )
+        record.duration_ms = 12.5
+        token = observability.request_id_var.set("abc123")
+        try:
+            RequestIdFilter().filter(record)
+        finally:
+            observability.request_id_var.reset(token)
+
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual(data["message"], "遅い: /")
+        self.assertEqual(data["level"], "WARNING")
+        self.assertEqual(data["request_id"], "abc123")
+        self.assertEqual(data["duration_ms"], 12.5)
+        self.assertNotIn("trace_id", data)
+
+
+@override_settings(TRACING_ENABLED=True, TRACING_SAMPLE_RATE=1.0)
+class SpanTests(SimpleTestCase):
+    def setUp(self):
+        self.exporter = CollectingExporter()
+        patcher = mock.patch.object(observability, "_exporter", self.exporter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_child_spans_share_the_trace(self):
+        with span("parent") as parent:
+            with span("child", key="value"):
+                pass
+        child, root = self.exporter.spans
+        self.assertEqual(child.trace_id, parent.trace_id)
+        self.assertEqual(child.parent_id, root.span_id)
+        self.assertEqual(child.attributes, {"key": "value"})
+        self.assertIsNone(root.parent_id)
+
+    def test_errors_are_recorded(self):
+        with self.assertRaises(ValueError), span("failing"):
+            raise ValueError
+        self.assertEqual(self.exporter.spans[0].status, "ERROR")
+        self.assertEqual(
+            self.exporter.spans[0].attributes["exception.type"], "ValueError"
+        )
+
+    def test_traceparent_decides_sampling(self):
+        trace_id = "0af7651916cd43dd8448eb211c80319c"
+        with span("sampled", traceparent=f"00-{trace_id}-b7ad6b7169203331-01"):
+            pass
+        with span("ignored", traceparent=f"00-{trace_id}-b7ad6b7169203331-00"):
+            with span("child"):
+                pass
+        (recorded,) = self.exporter.spans
+        self.assertEqual(recorded.trace_id, trace_id)
+        self.assertEqual(recorded.parent_id, "b7ad6b7169203331")
+
+    @override_settings(TRACING_SAMPLE_RATE=0.0)
+    def test_unsampled_traces_record_nothing(self):
+        with span("root"), span("child"):
+            pass
+        self.assertEqual(self.exporter.spans, [])
+
+    def test_file_exporter_writes_json_lines(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "traces", "spans.jsonl")
+        with span("root"):
+            pass
+
+        FileSpanExporter(path).export(self.exporter.spans)
+        with open(path, encoding="utf-8") as f:
+            (line,) = f.readlines()
+        self.assertEqual(json.loads(line)["name"], "root")
+
+
+@override_settings(
+    STORAGES=TEST_STORAGES, TRACING_ENABLED=True, TRACING_SAMPLE_RATE=1.0
+)
+class RequestTracingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.exporter = CollectingExporter()
+        patcher = mock.patch.object(observability, "_exporter", self.exporter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_request_spans(self):
+        self.client.force_login(create_user())
+        self.exporter.spans.clear()
+
+        response = self.client.get(reverse("app:index"), headers={"X-Request-ID": "r1"})
+
+        self.assertEqual(response["X-Request-ID"], "r1")
+        spans = self.exporter.spans
+        (root,) = [s for s in spans if s.parent_id is None]
+        self.assertEqual(root.name, "http.request")
+        self.assertEqual(root.attributes["http.status_code"], 200)
+        self.assertEqual(root.request_id, "r1")
+        # DB クエリとテンプレート描画は同じトレースのスパンの子になる
+        self.assertLessEqual({"db.query", "template.render"}, {s.name for s in spans})
+        span_ids = {s.span_id for s in spans}
+        for child in spans:
+            self.assertEqual(child.trace_id, root.trace_id)
+            self.assertTrue(child is root or child.parent_id in span_ids)
+
+    def test_request_id_is_generated(self):
+        response = self.client.get(reverse("app:login"))
+        self.assertEqual(len(response["X-Request-ID"]), 32)
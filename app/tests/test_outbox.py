@@ -0,0 +1,74 @@
+import io
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..forms import SignUpForm
+from ..mail import deliver_outbox_batch, enqueue_email
+from ..models import EmailOutbox
+
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("SMTP サーバーに接続できません")
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    EMAIL_OUTBOX_RATE_PER_SECOND=0,
+    EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+)
+class OutboxTests(TestCase):
+    def test_signup_queues_the_activation_email_without_sending(self):
+        form = SignUpForm(
+            {
+                "username": "alice",
+                "email": "alice@example.com",
+                "password1": "a-long-password-1",
+                "password2": "a-long-password-1",
+            }
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        user = form.save()
+
+        self.assertEqual(mail.outbox, [])
+        item = EmailOutbox.objects.get()
+        self.assertEqual(item.user, user)
+        self.assertEqual(item.to_email, "alice@example.com")
+        self.assertEqual(item.status, EmailOutbox.STATUS_PENDING)
+
+    def test_send_outbox_delivers_pending_emails(self):
+        for i in range(3):
+            enqueue_email(f"user{i}@example.com", "subject", "body")
+
+        output = io.StringIO()
+        call_command("send_outbox", once=True, stdout=output)
+
+        self.assertIn("送信: 3件, 失敗: 0件", output.getvalue())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(
+            EmailOutbox.objects.exclude(status=EmailOutbox.STATUS_SENT).exists()
+        )
+
+    def test_failed_emails_are_retried_with_backoff(self):
+        item = enqueue_email("alice@example.com", "subject", "body")
+
+        self.assertEqual(deliver_outbox_batch(FailingBackend()), (0, 1))
+        item.refresh_from_db()
+        self.assertEqual(item.status, EmailOutbox.STATUS_PENDING)
+        self.assertEqual(item.attempts, 1)
+        self.assertIn("SMTP", item.last_error)
+        self.assertGreater(item.next_attempt_at, timezone.now())
+
+        # 再送時刻までは送らない
+        self.assertEqual(deliver_outbox_batch(get_connection()), (0, 0))
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now() - timedelta(1))
+        self.assertEqual(deliver_outbox_batch(FailingBackend()), (0, 1))
+        item.refresh_from_db()
+        self.assertEqual(item.status, EmailOutbox.STATUS_FAILED)
@@ -0,0 +1,81 @@
+import io
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from unittest import skipIf
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from .. import partitioning
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class PartitionNameTests(SimpleTestCase):
+    def test_months(self):
+        self.assertEqual(
+            partitioning._month_start(utc(2024, 3, 31, 12)), utc(2024, 3, 1)
+        )
+        self.assertEqual(partitioning._next_month(utc(2024, 1, 31)), utc(2024, 2, 1))
+        self.assertEqual(partitioning._next_month(utc(2024, 12, 1)), utc(2025, 1, 1))
+        self.assertEqual(
+            partitioning._month_partition_name(utc(2024, 3, 1)), "app_mediafile_202403"
+        )
+
+    def test_suffixed_names_fit_in_an_identifier(self):
+        name = partitioning._suffixed("x" * 70, "_purging")
+        self.assertEqual(len(name), 63)
+        self.assertTrue(name.endswith("_purging"))
+        self.assertEqual(partitioning._suffixed("short", "_part"), "short_part")
+
+    def test_attach_statements(self):
+        start, end = utc(2024, 3, 1), utc(2024, 4, 1)
+        quick = partitioning._attach_statements("archive", start, end, validate=False)
+        checked = partitioning._attach_statements("archive", start, end, validate=True)
+
+        self.assertEqual(len(quick), 3)
+        self.assertNotIn("NOT VALID", quick[0])
+        self.assertIn("ATTACH PARTITION", quick[1])
+        self.assertIn(
+            "FOR VALUES FROM ('2024-03-01T00:00:00+00:00'::timestamptz) "
+            "TO ('2024-04-01T00:00:00+00:00'::timestamptz)",
+            quick[1],
+        )
+        self.assertTrue(checked[0].endswith("NOT VALID"))
+        self.assertIn("VALIDATE CONSTRAINT", checked[1])
+        # 範囲の確認が済んだら CHECK 制約は不要になる
+        self.assertIn("DROP CONSTRAINT", checked[-1])
+
+
+class MediaPartitionsCommandTests(TestCase):
+    def run_command(self, *args):
+        call_command("media_partitions", *args, stdout=io.StringIO())
+
+    def test_validates_arguments(self):
+        for args, message in (
+            (["convert", "--strategy", "hash", "--partitions", "1"], "--partitions"),
+            (["purge", "--before", "2024/01/01"], "YYYY-MM-DD"),
+            (
+                ["attach", "archive", "--from", "2024-02-01", "--to", "2024-01-01"],
+                "--to",
+            ),
+        ):
+            with self.subTest(args=args):
+                with self.assertRaisesMessage(CommandError, message):
+                    self.run_command(*args)
+
+    @skipIf(connection.vendor == "postgresql", "PostgreSQL 以外の DB で確認する")
+    def test_requires_postgresql(self):
+        self.assertIsNone(partitioning.get_strategy())
+        for args in (
+            ["status"],
+            ["convert", "--strategy", "range"],
+            ["create"],
+            ["purge", "--before", "2024-01-01", "--dry-run"],
+        ):
+            with self.subTest(args=args):
+                with self.assertRaisesMessage(CommandError, "PostgreSQL"):
+                    self.run_command(*args)
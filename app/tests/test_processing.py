@@ -0,0 +1,90 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import MediaFile
+from ..processing import ProcessingError, claim_next, process_media_file
+from .utils import create_media_file, create_project, create_user, use_temporary_media
+
+
+def fake_ffmpeg(output_size):
+    """出力先（最後の引数）に output_size バイトを書き出す ffmpeg の代わり"""
+
+    def run_ffmpeg(args, timeout=None):
+        with open(args[-1], "wb") as f:
+            f.write(b"\0" * output_size)
+
+    return mock.patch("app.processing.run_ffmpeg", side_effect=run_ffmpeg)
+
+
+@override_settings(
+    MEDIA_TRANSCODE_ENABLED=True,
+    MEDIA_TRANSCODE_AUDIO_CODEC="aac",
+    MEDIA_ANALYSIS_ENABLED=False,
+    MEDIA_FINGERPRINT_ENABLED=False,
+)
+class ProcessingTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = create_user()
+        self.project = create_project(self.user)
+
+    def test_claim_next_takes_pending_and_stale_files(self):
+        pending = create_media_file(self.user, self.project, title="pending")
+        stale = create_media_file(self.user, self.project, title="stale")
+        running = create_media_file(self.user, self.project, title="running")
+        MediaFile.objects.filter(pk=stale.pk).update(
+            processing_status=MediaFile.PROCESSING_RUNNING,
+            processing_started_at=timezone.now() - timedelta(days=1),
+        )
+        MediaFile.objects.filter(pk=running.pk).update(
+            processing_status=MediaFile.PROCESSING_RUNNING,
+            processing_started_at=timezone.now(),
+        )
+
+        claimed = {claim_next().pk, claim_next().pk}
+        self.assertEqual(claimed, {pending.pk, stale.pk})
+        self.assertIsNone(claim_next())
+        self.assertEqual(
+            MediaFile.objects.get(pk=pending.pk).processing_status,
+            MediaFile.PROCESSING_RUNNING,
+        )
+
+    def test_unplayable_audio_gets_a_rendition(self):
+        media_file = create_media_file(
+            self.user, self.project, b"RIFF" + b"\0" * 100, mime_type="audio/x-aiff"
+        )
+        with fake_ffmpeg(50):
+            self.assertTrue(process_media_file(media_file))
+
+        rendition = media_file.renditions.get()
+        self.assertEqual(rendition.profile, "aac")
+        self.assertEqual(rendition.mime_type, "audio/mp4")
+        self.assertEqual(rendition.file_size, 50)
+        media_file.refresh_from_db()
+        self.assertEqual(media_file.processing_status, MediaFile.PROCESSING_DONE)
+        self.assertEqual(media_file.get_playback_source(), rendition)
+
+        # 変換済みのプロファイルは変換し直さない
+        with fake_ffmpeg(50) as run_ffmpeg:
+            process_media_file(media_file)
+        run_ffmpeg.assert_not_called()
+
+    def test_larger_rendition_of_a_playable_file_is_discarded(self):
+        media_file = create_media_file(self.user, self.project, b"ID3" + b"\0" * 10)
+        with fake_ffmpeg(100):
+            self.assertTrue(process_media_file(media_file))
+        self.assertFalse(media_file.renditions.exists())
+        self.assertEqual(media_file.get_playback_source(), media_file)
+
+    def test_ffmpeg_errors_mark_the_file_failed(self):
+        media_file = create_media_file(self.user, self.project)
+        with mock.patch(
+            "app.processing.run_ffmpeg", side_effect=ProcessingError("invalid data")
+        ):
+            self.assertFalse(process_media_file(media_file))
+        media_file.refresh_from_db()
+        self.assertEqual(media_file.processing_status, MediaFile.PROCESSING_FAILED)
+        self.assertEqual(media_file.processing_error, "invalid data")
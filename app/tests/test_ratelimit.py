@@ -0,0 +1,43 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..views import LoginView
+from .utils import TEST_STORAGES
+
+
+@override_settings(STORAGES=TEST_STORAGES, RATELIMIT_ENABLED=True)
+class RateLimitTests(TestCase):
+    url = reverse("app:login")
+    data = {"username": "nobody", "password": "wrong"}
+
+    def setUp(self):
+        cache.clear()
+
+    def exhaust_login_limit(self, **extra):
+        for _ in range(LoginView.ratelimit_rules[0].limit):
+            self.assertEqual(
+                self.client.post(self.url, self.data, **extra).status_code, 200
+            )
+
+    def test_login_attempts_over_the_limit_get_429(self):
+        self.exhaust_login_limit()
+
+        response = self.client.post(self.url, self.data)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+
+        # 他のクライアントと GET は制限しない
+        response = self.client.post(self.url, self.data, REMOTE_ADDR="192.0.2.1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(RATELIMIT_IP_META_KEY="HTTP_X_REAL_IP")
+    def test_clients_behind_the_proxy_are_limited_separately(self):
+        self.exhaust_login_limit(HTTP_X_REAL_IP="198.51.100.1")
+        response = self.client.post(self.url, self.data, HTTP_X_REAL_IP="198.51.100.1")
+        self.assertEqual(response.status_code, 429)
+
+        # プロキシのアドレス（REMOTE_ADDR）が同じでも別のクライアントとして数える
+        response = self.client.post(self.url, self.data, HTTP_X_REAL_IP="198.51.100.2")
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,126 @@
+import asyncio
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.signals import request_finished
+from django.db import close_old_connections
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..concurrency import ConcurrencyLimiter
+from ..serving import CHUNK_SIZE, MediaResponder, parse_range, resolve_accel_path
+from .utils import create_media_file, create_project, create_user, use_temporary_media
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range("bytes=100-199", 1000), (100, 199))
+        self.assertEqual(parse_range("bytes=900-", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-10", 1000), (990, 999))
+        self.assertEqual(parse_range("bytes=0-5000", 1000), (0, 999))
+        # 複数範囲や不正な値はファイル全体を返す
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 1000))
+        self.assertIsNone(parse_range("bytes=a-b", 1000))
+        self.assertIsNone(parse_range("", 1000))
+        with self.assertRaises(ValueError):
+            parse_range("bytes=1000-", 1000)
+
+    def test_resolve_accel_path_stays_inside_the_root(self):
+        locations = {"/protected_media/": "/srv/media"}
+        self.assertEqual(
+            resolve_accel_path("/protected_media/a%20b.mp3", locations),
+            "/srv/media/a b.mp3",
+        )
+        self.assertIsNone(resolve_accel_path("/protected_media/../etc", locations))
+        self.assertIsNone(resolve_accel_path("/other/a.mp3", locations))
+
+
+@override_settings(MEDIA_SERVE_MODE="asgi")
+class MediaResponderTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        # テストのトランザクション内の接続をリクエストの終了時に閉じない
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+        self.user = create_user()
+        self.data = os.urandom(CHUNK_SIZE * 2 + 100)
+        self.media_file = create_media_file(
+            self.user, create_project(self.user), self.data
+        )
+        self.client.force_login(self.user)
+        self.limiter = ConcurrencyLimiter(get_asgi_application(), 1, 1)
+        self.application = MediaResponder(self.limiter)
+
+    async def request(self, headers=(), on_body=None):
+        """ASGI アプリケーションを呼び出し、(開始メッセージ, 本文, 本文のメッセージ数) を返す"""
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME]
+        path = f"{settings.MEDIA_URL}{self.media_file.file.name}"
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": quote(path).encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"cookie", f"{cookie.key}={cookie.value}".encode()),
+                *headers,
+            ],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 1),
+        }
+        received = False
+        messages = []
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.body" and on_body is not None:
+                on_body()
+            messages.append(message)
+
+        await asyncio.wait_for(self.application(scope, receive, send), 5)
+        start, *body = messages
+        return start, b"".join(m["body"] for m in body), len(body)
+
+    async def test_sends_the_file_in_chunks(self):
+        start, body, count = await self.request()
+
+        self.assertEqual(start["status"], 200)
+        headers = dict(start["headers"])
+        self.assertNotIn(b"x-accel-redirect", headers)
+        self.assertEqual(headers[b"content-type"], b"audio/mpeg")
+        self.assertEqual(headers[b"content-length"], str(len(self.data)).encode())
+        self.assertEqual(body, self.data)
+        self.assertEqual(count, 3)
+
+    async def test_range_and_conditional_requests(self):
+        start, body, _ = await self.request([(b"range", b"bytes=100-199")])
+        self.assertEqual(start["status"], 206)
+        self.assertEqual(body, self.data[100:200])
+
+        start, _, _ = await self.request([(b"range", b"bytes=99999999-")])
+        self.assertEqual(start["status"], 416)
+
+        etag = dict((await self.request())[0]["headers"])[b"etag"]
+        start, body, _ = await self.request([(b"if-none-match", etag)])
+        self.assertEqual(start["status"], 304)
+        self.assertEqual(body, b"")
+
+    async def test_releases_the_concurrency_slot_before_sending_the_file(self):
+        locked = []
+        await self.request(
+            on_body=lambda: locked.append(self.limiter.semaphore.locked())
+        )
+
+        self.assertEqual(locked, [False, False, False])
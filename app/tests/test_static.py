@@ -0,0 +1,66 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+
+class CompressedManifestStaticFilesStorageTests(SimpleTestCase):
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, self.static_root)
+        self.style = b"body { color: #333; }\n" * 50
+        with open(os.path.join(source, "style.css"), "wb") as f:
+            f.write(self.style)
+        with open(os.path.join(source, "small.js"), "wb") as f:
+            f.write(b"console.log(1);")
+
+        override = override_settings(
+            STATICFILES_DIRS=[source],
+            STATIC_ROOT=self.static_root,
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+            STORAGES={
+                **settings.STORAGES,
+                "staticfiles": {
+                    "BACKEND": "app.storage.CompressedManifestStaticFilesStorage"
+                },
+            },
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def collectstatic(self):
+        call_command("collectstatic", interactive=False, stdout=io.StringIO())
+
+    def test_hashed_files_are_precompressed(self):
+        self.collectstatic()
+
+        with open(os.path.join(self.static_root, "staticfiles.json")) as f:
+            hashed_name = json.load(f)["paths"]["style.css"]
+        self.assertNotEqual(hashed_name, "style.css")
+        with gzip.open(os.path.join(self.static_root, hashed_name + ".gz")) as f:
+            self.assertEqual(f.read(), self.style)
+        # 小さいファイルは圧縮しない
+        files = os.listdir(self.static_root)
+        self.assertFalse(
+            [
+                name
+                for name in files
+                if name.startswith("small") and name.endswith(".gz")
+            ]
+        )
+
+    def test_up_to_date_files_are_not_recompressed(self):
+        self.collectstatic()
+        path = os.path.join(self.static_root, "style.css.gz")
+        mtime = os.stat(path).st_mtime_ns
+
+        self.collectstatic()
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
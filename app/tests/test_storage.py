@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import MediaFile
+from ..storage import MultipartUploadError, SafeMediaFileStorage
+from ..views import _parse_parts
+from .utils import create_project, create_user, use_temporary_media
+
+
+class FakeMultipartStorage(SafeMediaFileStorage):
+    """パートを手元に保持し、完了時に連結して保存する直接アップロード対応ストレージ"""
+
+    uploads = {}
+
+    def create_multipart_upload(self, name, content_type, part_count):
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = {}
+        part_urls = [
+            f"https://storage.example/{upload_id}/{number}"
+            for number in range(1, part_count + 1)
+        ]
+        return upload_id, part_urls
+
+    def upload_part(self, upload_id, part_number, data):
+        """クライアントによるパートの送信の代わり（ETag を返す）"""
+        etag = hashlib.md5(data).hexdigest()
+        self.uploads[upload_id][part_number] = (etag, data)
+        return etag
+
+    def complete_multipart_upload(self, name, upload_id, parts):
+        uploaded = self.uploads.pop(upload_id, None)
+        if uploaded is None:
+            raise MultipartUploadError("NoSuchUpload")
+        if any(uploaded.get(number, (None,))[0] != etag for number, etag in parts):
+            raise MultipartUploadError("InvalidPart")
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            for number, _ in sorted(parts):
+                f.write(uploaded[number][1])
+        return self.size(name)
+
+    def abort_multipart_upload(self, name, upload_id):
+        self.uploads.pop(upload_id, None)
+
+
+class ParsePartsTests(SimpleTestCase):
+    def test_valid_parts(self):
+        parts = [{"part_number": 2, "etag": "b"}, {"part_number": 1, "etag": "a"}]
+        self.assertEqual(_parse_parts(parts), [(2, "b"), (1, "a")])
+
+    def test_invalid_parts(self):
+        cases = [
+            None,
+            [],
+            ["1"],
+            [{"part_number": "1", "etag": "a"}],
+            [{"part_number": True, "etag": "a"}],
+            [{"part_number": 10001, "etag": "a"}],
+            [{"part_number": 1}],
+            [{"part_number": 1, "etag": "a"}, {"part_number": 1, "etag": "b"}],
+        ]
+        for parts in cases:
+            with self.subTest(parts=parts), self.assertRaises(ValueError):
+                _parse_parts(parts)
+
+
+@override_settings(MEDIA_UPLOAD_PART_SIZE_MB=1)
+class DirectUploadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = use_temporary_media(self)
+        override = override_settings(
+            STORAGES={
+                **settings.STORAGES,
+                "media": {
+                    "BACKEND": "app.tests.test_storage.FakeMultipartStorage",
+                    "OPTIONS": {"location": media_root},
+                },
+            }
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = create_user()
+        self.project = create_project(self.user)
+        self.client.force_login(self.user)
+
+    def post_json(self, name, data):
+        return self.client.post(
+            reverse(name, args=[self.project.pk]),
+            json.dumps(data),
+            content_type="application/json",
+        )
+
+    def start(self, data):
+        response = self.post_json(
+            "app:media_upload_session",
+            {
+                "filename": "song.mp3",
+                "file_size": len(data),
+                "content_type": "audio/mpeg",
+                "file_type": "audio",
+                "title": "song",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def upload_parts(self, session, data):
+        storage, size = FakeMultipartStorage(), session["part_size"]
+        parts = []
+        for part in session["parts"]:
+            _, upload_id, number = part["url"].rsplit("/", 2)
+            chunk = data[(int(number) - 1) * size :][:size]
+            etag = storage.upload_part(upload_id, int(number), chunk)
+            parts.append({"part_number": part["part_number"], "etag": etag})
+        return parts
+
+    def test_parts_are_completed_into_a_media_file(self):
+        data = b"ID3" + os.urandom(1024 * 1024 + 100)
+        session = self.start(data)
+        self.assertEqual(len(session["parts"]), 2)
+        parts = self.upload_parts(session, data)
+
+        response = self.post_json(
+            "app:media_upload_complete", {"token": session["token"], "parts": parts}
+        )
+        self.assertEqual(response.status_code, 201)
+        media_file = MediaFile.objects.get(pk=response.json()["id"])
+        self.assertEqual(media_file.file_size, len(data))
+        self.assertEqual(media_file.mime_type, "audio/mpeg")
+        with media_file.file.open("rb") as f:
+            self.assertEqual(f.read(), data)
+
+        # 同じトークンで二重に登録しない
+        response = self.post_json(
+            "app:media_upload_complete", {"token": session["token"], "parts": parts}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejected_parts_abort_the_upload(self):
+        data = b"ID3 audio"
+        session = self.start(data)
+        self.upload_parts(session, data)
+
+        response = self.post_json(
+            "app:media_upload_complete",
+            {"token": session["token"], "parts": [{"part_number": 1, "etag": "x"}]},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(FakeMultipartStorage.uploads, {})
+        self.assertFalse(MediaFile.objects.exists())
+
+    def test_content_is_sniffed_after_completion(self):
+        data = b"<html>not audio</html>"
+        session = self.start(data)
+        parts = self.upload_parts(session, data)
+
+        response = self.post_json(
+            "app:media_upload_complete", {"token": session["token"], "parts": parts}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MediaFile.objects.exists())
+
+    def test_token_is_bound_to_the_user(self):
+        session = self.start(b"ID3 audio")
+        self.client.force_login(create_user("mallory"))
+        response = self.post_json(
+            "app:media_upload_complete",
+            {"token": session["token"], "parts": [{"part_number": 1, "etag": "x"}]},
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,104 @@
+import io
+import os
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+
+from ..models import MediaFile, MediaFileVersion
+from ..tiering import AccessRecorder, move_to_tier
+from .utils import create_media_file, create_project, create_user, use_temporary_media
+
+
+def tier_path(media_file, tier):
+    root = (
+        settings.MEDIA_COLD_ROOT if tier == MediaFile.TIER_COLD else settings.MEDIA_ROOT
+    )
+    return os.path.join(root, media_file.file.name)
+
+
+class TieringTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_temporary_media(self)
+        # バックグラウンドスレッドは起動せず、反映はテストから呼び出す
+        patcher = mock.patch.object(AccessRecorder, "_start")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = create_user()
+        self.project = create_project(self.user)
+        self.client.force_login(self.user)
+        self.media_file = create_media_file(self.user, self.project)
+
+    def move(self, tier):
+        with self.captureOnCommitCallbacks(execute=True):
+            return move_to_tier(self.media_file, tier)
+
+    def test_move_to_tier_moves_the_file_and_shared_rows(self):
+        self.assertTrue(self.move(MediaFile.TIER_COLD))
+
+        self.assertTrue(os.path.exists(tier_path(self.media_file, MediaFile.TIER_COLD)))
+        self.assertFalse(os.path.exists(tier_path(self.media_file, MediaFile.TIER_HOT)))
+        self.assertEqual(
+            MediaFileVersion.objects.get(media_file=self.media_file).storage_tier,
+            MediaFile.TIER_COLD,
+        )
+        self.assertFalse(self.move(MediaFile.TIER_COLD))
+
+    def test_failed_update_keeps_the_source_file(self):
+        with mock.patch.object(
+            MediaFileVersion.objects, "filter", side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                self.move(MediaFile.TIER_COLD)
+
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.storage_tier, MediaFile.TIER_HOT)
+        self.assertTrue(os.path.exists(tier_path(self.media_file, MediaFile.TIER_HOT)))
+
+    def test_flush_adds_up_access_counts(self):
+        other = create_media_file(self.user, self.project, title="other")
+        updated_at = self.media_file.updated_at
+        recorder = AccessRecorder()
+        for pk in (self.media_file.pk, self.media_file.pk, other.pk):
+            recorder.record(pk)
+
+        self.assertEqual(recorder.flush(), 2)
+        self.assertEqual(recorder.flush(), 0)
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.access_count, 2)
+        self.assertIsNotNone(self.media_file.last_accessed_at)
+        self.assertEqual(self.media_file.updated_at, updated_at)
+        self.assertEqual(MediaFile.objects.get(pk=other.pk).access_count, 1)
+
+    def test_accessing_a_cold_file_promotes_it(self):
+        self.move(MediaFile.TIER_COLD)
+        recorder = AccessRecorder()
+
+        with mock.patch("app.views.access_recorder", recorder):
+            response = self.client.get(f"/media/{self.media_file.file.name}")
+        self.assertTrue(
+            response["X-Accel-Redirect"].startswith("/protected_media_cold/")
+        )
+        # 反映を待たずにバックグラウンドスレッドを起こす
+        self.assertTrue(recorder._wakeup.is_set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(recorder.promote(), 1)
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.storage_tier, MediaFile.TIER_HOT)
+        self.assertTrue(os.path.exists(tier_path(self.media_file, MediaFile.TIER_HOT)))
+        self.assertFalse(
+            os.path.exists(tier_path(self.media_file, MediaFile.TIER_COLD))
+        )
+
+    def test_media_tiering_demotes_files_without_recent_access(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("media_tiering", demote_after_days=0, stdout=io.StringIO())
+
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.storage_tier, MediaFile.TIER_COLD)
+        self.assertTrue(os.path.exists(tier_path(self.media_file, MediaFile.TIER_COLD)))
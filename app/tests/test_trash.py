@@ -0,0 +1,74 @@
+import io
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import MediaFile
+from .utils import create_media_file, create_project, create_user, use_temporary_media
+
+
+class TrashTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = use_temporary_media(self)
+        self.user = create_user()
+        self.project = create_project(self.user)
+        self.client.force_login(self.user)
+
+    def test_soft_delete_and_restore(self):
+        media_file = create_media_file(self.user, self.project)
+
+        media_file.soft_delete()
+        self.assertFalse(MediaFile.objects.filter(pk=media_file.pk).exists())
+        self.assertTrue(MediaFile.all_objects.trashed().filter(pk=media_file.pk))
+
+        response = self.client.post(reverse("app:media_restore", args=[media_file.pk]))
+        self.assertRedirects(response, reverse("app:trash"))
+        self.assertTrue(MediaFile.objects.filter(pk=media_file.pk).exists())
+
+    def test_project_restore_brings_back_only_media_deleted_with_it(self):
+        earlier = create_media_file(self.user, self.project, title="earlier")
+        earlier.soft_delete()
+        together = create_media_file(self.user, self.project, title="together")
+
+        self.assertEqual(self.project.soft_delete(), 1)
+        self.assertFalse(MediaFile.objects.filter(project=self.project).exists())
+
+        self.client.post(reverse("app:project_restore", args=[self.project.pk]))
+        self.assertTrue(MediaFile.objects.filter(pk=together.pk).exists())
+        self.assertFalse(MediaFile.objects.filter(pk=earlier.pk).exists())
+
+    def test_trash_lists_only_own_items(self):
+        mine = create_media_file(self.user, self.project, title="mine")
+        mine.soft_delete()
+        other = create_user("bob")
+        theirs = create_media_file(other, create_project(other), title="theirs")
+        theirs.soft_delete()
+
+        response = self.client.get(reverse("app:trash"))
+        self.assertContains(response, "mine")
+        self.assertNotContains(response, "theirs")
+
+    def test_purge_trash_deletes_expired_items_and_files(self):
+        expired = create_media_file(self.user, self.project, b"expired", "expired")
+        recent = create_media_file(self.user, self.project, b"recent", "recent")
+        live = create_media_file(self.user, self.project, b"live", "live")
+        old = timezone.now() - timedelta(days=settings.TRASH_RETENTION_DAYS + 1)
+        MediaFile.all_objects.filter(pk=expired.pk).update(deleted_at=old)
+        recent.soft_delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("purge_trash", sleep=0, stdout=io.StringIO())
+
+        self.assertFalse(MediaFile.all_objects.filter(pk=expired.pk).exists())
+        self.assertFalse(
+            os.path.exists(os.path.join(self.media_root, expired.file.name))
+        )
+        self.assertTrue(MediaFile.all_objects.filter(pk=recent.pk).exists())
+        self.assertTrue(MediaFile.objects.filter(pk=live.pk).exists())
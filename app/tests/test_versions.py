@@ -0,0 +1,147 @@
+import os
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import MediaFile, MediaFileVersion, MediaRendition
+from ..versions import replace_content, restore_version
+from .utils import (
+    create_media_file,
+    create_project,
+    create_user,
+    sha256,
+    use_temporary_media,
+)
+
+
+def replace(media_file, data, name="new.mp3"):
+    upload = SimpleUploadedFile(name, data, content_type="audio/mpeg")
+    return replace_content(media_file, upload, "audio/mpeg", sha256(data))
+
+
+class MediaVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = use_temporary_media(self)
+        self.user = create_user()
+        self.project = create_project(self.user)
+        self.client.force_login(self.user)
+
+    def test_replace_and_restore_switch_current_version(self):
+        media_file = create_media_file(self.user, self.project, b"first")
+        first = media_file.current_version
+        MediaRendition.objects.create(
+            media_file=media_file,
+            profile="mp3",
+            file=ContentFile(b"rendition", name="a.mp3"),
+            file_size=9,
+            mime_type="audio/mpeg",
+        )
+
+        second = replace(media_file, b"second")
+        media_file.refresh_from_db()
+        self.assertEqual(second.number, 2)
+        self.assertEqual(media_file.current_version, second)
+        self.assertEqual(media_file.file.name, second.file.name)
+        self.assertEqual(media_file.content_hash, sha256(b"second"))
+        self.assertEqual(media_file.processing_status, MediaFile.PROCESSING_PENDING)
+        self.assertFalse(media_file.renditions.exists())
+
+        restore_version(media_file, first)
+        media_file.refresh_from_db()
+        self.assertEqual(media_file.current_version, first)
+        self.assertEqual(media_file.file.name, first.file.name)
+        self.assertEqual(media_file.file_size, len(b"first"))
+
+    def test_rendition_files_are_deleted_only_after_commit(self):
+        media_file = create_media_file(self.user, self.project, b"first")
+        rendition = MediaRendition.objects.create(
+            media_file=media_file,
+            profile="mp3",
+            file=ContentFile(b"rendition", name="a.mp3"),
+            file_size=9,
+            mime_type="audio/mpeg",
+        )
+        path = os.path.join(self.media_root, rendition.file.name)
+
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                replace(media_file, b"second")
+                raise RuntimeError
+        self.assertTrue(os.path.exists(path))
+        self.assertTrue(media_file.renditions.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            replace(media_file, b"second")
+        self.assertFalse(os.path.exists(path))
+
+    def test_same_content_shares_the_stored_file(self):
+        media_file = create_media_file(self.user, self.project, b"shared")
+        directory = os.path.dirname(os.path.join(self.media_root, media_file.file.name))
+        files_before = sorted(os.listdir(directory))
+
+        replace(media_file, b"other")
+        third = replace(media_file, b"shared")
+
+        self.assertEqual(third.file.name, media_file.current_version.file.name)
+        self.assertEqual(len(os.listdir(directory)), len(files_before) + 1)
+
+    def test_shared_file_is_deleted_only_when_unreferenced(self):
+        media_file = create_media_file(self.user, self.project, b"shared")
+        first = media_file.current_version
+        path = os.path.join(self.media_root, first.file.name)
+        replace(media_file, b"other")
+        third = replace(media_file, b"shared")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MediaFile.all_objects.filter(pk=media_file.pk).delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaFileVersion.objects.filter(pk=third.pk).exists())
+
+    def test_replace_view_for_a_file_without_project(self):
+        media_file = create_media_file(self.user, data=b"ID3 first")
+        replace(media_file, b"ID3 second")
+        url = reverse("app:media_replace", args=[0, media_file.pk])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(
+            response, reverse("app:media_detail", args=[0, media_file.pk])
+        )
+
+        upload = SimpleUploadedFile(
+            "third.mp3", b"ID3 third", content_type="audio/mpeg"
+        )
+        response = self.client.post(url, {"file": upload})
+        self.assertRedirects(
+            response,
+            reverse("app:media_detail", args=[0, media_file.pk]),
+            fetch_redirect_response=False,
+        )
+        media_file.refresh_from_db()
+        self.assertEqual(media_file.current_version.number, 3)
+
+    def test_protected_media_serves_old_versions(self):
+        media_file = create_media_file(self.user, self.project, b"first")
+        old_name = media_file.file.name
+        replace(media_file, b"second")
+
+        response = self.client.get(f"/media/{old_name}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "audio/mpeg")
+        self.assertTrue(response["X-Accel-Redirect"].startswith("/protected_media/"))
+
+    def test_protected_media_hides_trashed_files(self):
+        media_file = create_media_file(self.user, self.project, b"first")
+        media_file.soft_delete()
+
+        response = self.client.get(f"/media/{media_file.file.name}")
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,64 @@
+"""テストで共通に使う補助関数"""
+
+import hashlib
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import override_settings
+
+from ..models import MediaFile, Project, User
+
+# テンプレートの {% static %} がマニフェストなしで動くようにする
+TEST_STORAGES = {
+    **settings.STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+def use_temporary_media(testcase):
+    """テストの間だけ一時ディレクトリをメディアの保存先にし、そのパスを返す"""
+    media_root = tempfile.mkdtemp()
+    cold_root = tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    testcase.addCleanup(shutil.rmtree, cold_root, ignore_errors=True)
+    override = override_settings(
+        MEDIA_ROOT=media_root, MEDIA_COLD_ROOT=cold_root, STORAGES=TEST_STORAGES
+    )
+    override.enable()
+    testcase.addCleanup(override.disable)
+    return media_root
+
+
+def create_user(username="alice", **kwargs):
+    return User.objects.create_user(
+        username, email=f"{username}@example.com", password="password", **kwargs
+    )
+
+
+def create_project(owner, name="project"):
+    return Project.objects.create(owner=owner, name=name)
+
+
+def create_media_file(user, project=None, data=b"ID3 audio", title="audio", **kwargs):
+    values = {
+        "user": user,
+        "project": project,
+        "title": title,
+        "file_type": "audio",
+        "file": ContentFile(data, name=f"{title}.mp3"),
+        "file_size": len(data),
+        "mime_type": "audio/mpeg",
+        "content_hash": sha256(data),
+    }
+    values.update(kwargs)
+    return MediaFile.objects.create(**values)
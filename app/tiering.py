@@ -0,0 +1,224 @@
+"""
+ストレージ階層（ホット/コールド）の管理とアクセス頻度の記録
+"""
+
+import atexit
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .models import MediaFile, MediaFileVersion
+from .observability import span
+
+logger = logging.getLogger(__name__)
+
+
+class AccessRecorder:
+    """
+    メディアファイルへのアクセスをプロセス内で集計し、まとめて DB に反映する
+
+    リクエストでは集計だけを行い、DB への反映はバックグラウンドスレッドが
+    MEDIA_ACCESS_FLUSH_INTERVAL 秒ごと、または未反映の件数が
+    MEDIA_ACCESS_FLUSH_MAX_PENDING を超えた時点で行う。
+    コールド階層のファイルがアクセスされた場合は、同じスレッドがホット階層へ戻す。
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._last_accessed = {}
+        self._promotions = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+    def record(self, media_file_id, tier=MediaFile.TIER_HOT):
+        if self._pid != os.getpid():
+            self._start()
+        with self._lock:
+            self._counts[media_file_id] += 1
+            self._last_accessed[media_file_id] = timezone.now()
+            if tier == MediaFile.TIER_COLD:
+                self._promotions.add(media_file_id)
+            urgent = (
+                tier == MediaFile.TIER_COLD
+                or len(self._counts) >= settings.MEDIA_ACCESS_FLUSH_MAX_PENDING
+            )
+        if urgent:
+            self._wakeup.set()
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(
+                target=self._run, name="media-access-recorder", daemon=True
+            ).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(settings.MEDIA_ACCESS_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                self.promote()
+            except Exception:
+                logger.exception("アクセス回数の反映・階層の移動に失敗しました")
+            finally:
+                # 次の反映まで接続を保持しない
+                connection.close()
+
+    def flush(self):
+        """集計済みのアクセス回数と最終アクセス日時を DB に反映する"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            last_accessed, self._last_accessed = self._last_accessed, {}
+        if not counts:
+            return 0
+
+        ids = list(counts)
+        batch_size = 500
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start : start + batch_size]
+            # 1バッチを1回の UPDATE で反映する（updated_at は変更しない）
+            MediaFile.objects.filter(pk__in=batch).update(
+                access_count=F("access_count")
+                + Case(
+                    *[When(pk=pk, then=Value(counts[pk])) for pk in batch],
+                    default=Value(0),
+                ),
+                last_accessed_at=Case(
+                    *[When(pk=pk, then=Value(last_accessed[pk])) for pk in batch],
+                    default=F("last_accessed_at"),
+                ),
+            )
+        return len(ids)
+
+    def promote(self):
+        """アクセスされたコールド階層のメディアファイルをホット階層へ戻す"""
+        with self._lock:
+            ids, self._promotions = self._promotions, set()
+        promoted = 0
+        for media_file in MediaFile.objects.filter(
+            pk__in=ids, storage_tier=MediaFile.TIER_COLD
+        ):
+            try:
+                promoted += move_to_tier(media_file, MediaFile.TIER_HOT)
+            except (OSError, KeyError):
+                logger.warning(
+                    "ホット階層へ移動できません: %s",
+                    media_file.file.name,
+                    exc_info=True,
+                )
+        return promoted
+
+
+access_recorder = AccessRecorder()
+atexit.register(access_recorder.flush)
+
+
+def tier_root(tier):
+    """ファイルシステムストレージでの階層ごとのルートディレクトリ"""
+    if tier == MediaFile.TIER_COLD:
+        return str(settings.MEDIA_COLD_ROOT)
+    return str(settings.MEDIA_ROOT)
+
+
+def move_to_tier(media_file, tier):
+    """
+    メディアファイルの実体を指定した階層へ移動し、レコードの階層を更新する
+
+    ファイルシステムでは MEDIA_ROOT と MEDIA_COLD_ROOT の間で移動し、
+    S3 互換ストレージではオブジェクトのストレージクラスを変更する。
+    ファイル名（file.name）は変わらない。
+    ファイルシステムでは移動先へコピーしてからレコードを更新し、移動元は
+    コミット後に削除するため、途中で失敗してもレコードが指すファイルは残る。
+    """
+    source_tier = media_file.storage_tier
+    if source_tier == tier:
+        return False
+    name = media_file.file.name
+
+    with span("storage.move_to_tier", **{"storage.name": name, "storage.tier": tier}):
+        copied = _copy_blob(media_file, tier)
+
+    now = timezone.now()
+    with transaction.atomic():
+        # 同じファイルを共有するメディアファイルと版の階層もまとめて更新する
+        # （表示内容は変わらないため updated_at は更新しない）
+        moved = MediaFile.all_objects.filter(
+            file=name, storage_tier=source_tier
+        ).update(storage_tier=tier, tier_changed_at=now)
+        MediaFileVersion.objects.filter(file=name, storage_tier=source_tier).update(
+            storage_tier=tier
+        )
+        # 他のプロセスが先に移動した場合、移動元はそのプロセスが削除する
+        if copied and moved:
+            transaction.on_commit(lambda: _delete_blob(source_tier, name))
+    media_file.storage_tier = tier
+    media_file.tier_changed_at = now
+    return bool(moved)
+
+
+def _copy_blob(media_file, tier):
+    """移動先の階層にファイルを用意する（移動元の削除が必要なら True）"""
+    storage = media_file.file.storage
+    if not isinstance(storage, FileSystemStorage):
+        storage.set_storage_class(
+            media_file.file.name, settings.MEDIA_S3_STORAGE_CLASSES[tier]
+        )
+        return False
+    source = os.path.join(tier_root(media_file.storage_tier), media_file.file.name)
+    target = os.path.join(tier_root(tier), media_file.file.name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # 書きかけのファイルが移動先に見えないよう、一時ファイルにコピーしてから置き換える
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+def _delete_blob(tier, name):
+    path = os.path.join(tier_root(tier), name)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return
+    directory = os.path.dirname(path)
+    if not os.listdir(directory):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+
+def demotion_candidates(demote_after_days):
+    """一定期間アクセスのないホット階層のメディアファイル"""
+    cutoff = timezone.now() - timedelta(days=demote_after_days)
+    return MediaFile.objects.filter(storage_tier=MediaFile.TIER_HOT).filter(
+        Q(last_accessed_at__lt=cutoff)
+        | Q(last_accessed_at__isnull=True, created_at__lt=cutoff)
+    )
+
+
+def promotion_candidates():
+    """コールド階層へ移動した後にアクセスされたメディアファイル"""
+    return MediaFile.objects.filter(
+        storage_tier=MediaFile.TIER_COLD,
+        last_accessed_at__gt=F("tier_changed_at"),
+    )
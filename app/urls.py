@@ -23,6 +23,24 @@ urlpatterns = [
     ),
     # メディアファイル保護
     path("media/<path:path>", views.protected_media, name="protected_media"),
+    # 進捗イベント（SSE）
+    path(
+        "events/media/<int:key>/",
+        views.ProgressEventsView.as_view(kind="media"),
+        name="media_events",
+    ),
+    # ゴミ箱
+    path("trash/", views.TrashView.as_view(), name="trash"),
+    path(
+        "trash/projects/<int:pk>/restore/",
+        views.ProjectRestoreView.as_view(),
+        name="project_restore",
+    ),
+    path(
+        "trash/media/<int:pk>/restore/",
+        views.MediaFileRestoreView.as_view(),
+        name="media_restore",
+    ),
     # プロジェクト関連
     path("projects/create/", views.ProjectCreateView.as_view(), name="project_create"),
     path(
@@ -41,6 +59,16 @@ urlpatterns = [
         views.ProjectMediaFileUploadView.as_view(),
         name="project_media_upload",
     ),
+    path(
+        "projects/<int:project_id>/media/uploads/",
+        views.MediaUploadSessionView.as_view(),
+        name="media_upload_session",
+    ),
+    path(
+        "projects/<int:project_id>/media/uploads/complete/",
+        views.MediaUploadCompleteView.as_view(),
+        name="media_upload_complete",
+    ),
     path(
         "projects/<int:project_id>/media/<int:pk>/",
         views.MediaFileDetailView.as_view(),
@@ -56,4 +84,14 @@ urlpatterns = [
         views.MediaFileRenameView.as_view(),
         name="media_rename",
     ),
+    path(
+        "projects/<int:project_id>/media/<int:pk>/replace/",
+        views.MediaFileReplaceView.as_view(),
+        name="media_replace",
+    ),
+    path(
+        "projects/<int:project_id>/media/<int:pk>/versions/<int:number>/restore/",
+        views.MediaFileVersionRestoreView.as_view(),
+        name="media_version_restore",
+    ),
 ]
@@ -0,0 +1,162 @@
+"""
+メディアファイルの版の管理（内容の差し替え・復元・古い版の整理）
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import bump_media_list_version
+from .models import MediaFile, MediaFileVersion, media_upload_to
+from .observability import span
+
+
+def compute_content_hash(file):
+    """アップロードされたファイルの SHA-256 を計算する（読み込み位置は元に戻す）"""
+    digest = hashlib.sha256()
+    position = file.tell()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(position)
+    return digest.hexdigest()
+
+
+def rehash_stored_file(media_file):
+    """
+    ローカルで書き換えたファイル（faststart）の内容のハッシュを計算し直して保存する
+
+    同じファイルを共有するメディアファイルと版もまとめて更新し、新しいハッシュを返す。
+    """
+    with open(media_file.get_physical_path(), "rb") as f:
+        content_hash = compute_content_hash(File(f))
+    name = media_file.file.name
+    MediaFile.all_objects.filter(file=name).update(content_hash=content_hash)
+    MediaFileVersion.objects.filter(file=name).update(content_hash=content_hash)
+    media_file.content_hash = content_hash
+    return content_hash
+
+
+def find_shared_version(user, content_hash):
+    """
+    同じ内容の既存の版を返す（ない場合は None）
+
+    ファイルを共有するのは同じユーザーのメディアファイルの間に限る。
+    """
+    if not content_hash:
+        return None
+    return (
+        MediaFileVersion.objects.filter(
+            media_file__user=user, content_hash=content_hash
+        )
+        .only("file", "storage_tier")
+        .first()
+    )
+
+
+def find_exact_duplicates(user, content_hash, exclude_pk=None):
+    """内容が同じ、同じユーザーのメディアファイル（ゴミ箱内のものを除く）"""
+    if not content_hash:
+        return MediaFile.objects.none()
+    return (
+        MediaFile.objects.filter(user=user, content_hash=content_hash)
+        .exclude(pk=exclude_pk)
+        .select_related("project")
+    )
+
+
+def replace_content(media_file, file, mime_type, content_hash):
+    """
+    アップロードされたファイルで新しい版を作成し、現在の版を切り替える
+
+    同じ内容の版が既にあればそのファイルを共有し、ストレージには保存しない。
+    """
+    shared = find_shared_version(media_file.user_id, content_hash)
+    if shared is not None:
+        name, tier = shared.file.name, shared.storage_tier
+    else:
+        storage = media_file.file.storage
+        name = storage.save(media_upload_to(media_file, file.name), file)
+        tier = MediaFile.TIER_HOT
+
+    try:
+        with transaction.atomic():
+            locked = MediaFile.objects.select_for_update().get(pk=media_file.pk)
+            number = (locked.versions.aggregate(Max("number"))["number__max"] or 0) + 1
+            version = MediaFileVersion.objects.create(
+                media_file=locked,
+                number=number,
+                file=name,
+                file_size=file.size,
+                mime_type=mime_type,
+                content_hash=content_hash,
+                storage_tier=tier,
+            )
+            switch_version(locked, version)
+    except Exception:
+        if shared is None:
+            media_file.file.storage.delete(name)
+        raise
+    return version
+
+
+def restore_version(media_file, version):
+    """過去の版を現在の版に戻す"""
+    with transaction.atomic():
+        locked = MediaFile.objects.select_for_update().get(pk=media_file.pk)
+        switch_version(locked, version)
+
+
+def switch_version(media_file, version):
+    """
+    メディアファイルが指す版を切り替える
+
+    1行の UPDATE で現在の版の値をまとめて書き換えるため、読み手からは
+    切り替え前後のどちらかの状態だけが見える。変換済みファイルは内容が
+    変わるため削除し、アップロード後の処理をやり直す。
+    """
+    with span(
+        "media.switch_version",
+        **{"media.id": media_file.pk, "media.version": version.number},
+    ):
+        media_file.renditions.all().delete()
+        MediaFile.objects.filter(pk=media_file.pk).update(
+            current_version=version,
+            file=version.file.name,
+            file_size=version.file_size,
+            mime_type=version.mime_type,
+            content_hash=version.content_hash,
+            storage_tier=version.storage_tier,
+            processing_status=MediaFile.PROCESSING_PENDING,
+            processing_error="",
+            updated_at=timezone.now(),
+        )
+    if media_file.project_id:
+        bump_media_list_version(media_file.project_id)
+
+
+def prunable_versions(media_file, keep=None, keep_days=None):
+    """
+    保持ポリシーを超えた古い版
+
+    現在の版を除いて新しい順に keep 件を残し、それより古い版のうち
+    作成から keep_days 日を超えたものを対象とする。
+    """
+    keep = settings.MEDIA_VERSION_KEEP if keep is None else keep
+    keep_days = settings.MEDIA_VERSION_KEEP_DAYS if keep_days is None else keep_days
+    cutoff = timezone.now() - timedelta(days=keep_days)
+    recent = (
+        media_file.versions.exclude(pk=media_file.current_version_id)
+        .order_by("-number")
+        .values_list("pk", flat=True)[:keep]
+    )
+    return (
+        media_file.versions.exclude(pk=media_file.current_version_id)
+        .exclude(pk__in=list(recent))
+        .filter(created_at__lt=cutoff)
+    )
@@ -1,22 +1,103 @@
-import mimetypes
+import json
+import math
 import os
+from urllib.parse import quote
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.views import LoginView as AuthLoginView
-from django.http import Http404, HttpResponse
-from django.shortcuts import redirect, render
-from django.urls import reverse_lazy
+from django.core import signing
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Count, F
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_decode
-from django.views.generic import (CreateView, DeleteView, ListView,
-                                  TemplateView, UpdateView)
-
-from .forms import MediaFileRenameForm, MediaFileUploadForm, SignUpForm
-from .models import MediaFile, Project, User
+from django.views import View
+from django.views.generic import (CreateView, DeleteView, FormView,
+                                  ListView, TemplateView, UpdateView)
+
+from .cache import get_media_list_version, page_etag, weak_etag
+from .events import close_connection, resolve_channel, sse_stream
+from .forms import (
+    HASHING_BUSY_MESSAGE,
+    LoginForm,
+    MediaFileRenameForm,
+    MediaFileReplaceForm,
+    MediaFileUploadForm,
+    SignUpForm,
+)
+from .hashers import PasswordHashingBusy
+from .mediatypes import (
+    coerce_content_type,
+    guess_content_type,
+    read_file_head,
+    sniff_content_type,
+)
+from .models import (
+    MediaFile,
+    MediaFileVersion,
+    MediaRendition,
+    Project,
+    User,
+    media_upload_to,
+)
+from .ratelimit import TOKEN_BUCKET, ConcurrencyLimit, Rule
+from .storage import (
+    MultipartUploadError,
+    select_media_storage,
+    supports_direct_upload,
+)
+from .tiering import access_recorder, tier_root
+from .versions import (
+    find_exact_duplicates,
+    find_shared_version,
+    replace_content,
+    restore_version,
+)
+
+
+class PrivatePageCacheMixin:
+    """
+    ログインユーザー専用ページの HTTP キャッシュ
+
+    Cache-Control: private, no-cache で共有キャッシュには保存させず、ブラウザには
+    保存したうえで毎回再検証させる。get_etag_parts() の値が前回と同じなら、
+    ページを描画せずに 304 を返す。get_etag_parts() が空の場合は ETag を付けず、
+    再検証のたびに描画する。
+    """
+
+    def get_etag_parts(self):
+        """ページの内容を決める値（ETag を使わない場合は空）"""
+        return ()
+
+    def get(self, request, *args, **kwargs):
+        parts = self.get_etag_parts()
+        etag = page_etag(request, *parts) if parts else None
+        response = etag and get_conditional_response(request, etag=etag)
+        if not response:
+            response = super().get(request, *args, **kwargs)
+            if etag:
+                response.headers["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("Cookie",))
+        return response
 
 
 class IndexView(LoginRequiredMixin, ListView):
@@ -45,12 +126,22 @@ class IndexView(LoginRequiredMixin, ListView):
 class LoginView(AuthLoginView):
     """カスタムログインビュー"""
 
+    form_class = LoginForm
     template_name = "auth/login.html"
     redirect_authenticated_user = True
+    ratelimit_rules = [
+        Rule("login", settings.RATELIMIT_LOGIN_RATE, key="ip"),
+    ]
 
     def get_success_url(self):
         return reverse_lazy("app:index")
 
+    def form_invalid(self, form):
+        response = super().form_invalid(form)
+        if form.hashing_busy:
+            return _service_unavailable(response)
+        return response
+
 
 class SignUpView(CreateView):
     """サインアップビュー"""
@@ -58,9 +149,17 @@ class SignUpView(CreateView):
     form_class = SignUpForm
     template_name = "auth/signup.html"
     success_url = reverse_lazy("app:signup_done")
+    ratelimit_rules = [
+        Rule("signup", settings.RATELIMIT_SIGNUP_RATE, key="ip"),
+    ]
 
     def form_valid(self, form):
-        user = form.save()  # メール送信も含む
+        try:
+            user = form.save()  # メール送信も含む
+        except PasswordHashingBusy:
+            # パスワードのハッシュ計算が混雑している（ユーザーはまだ保存していない）
+            form.add_error(None, HASHING_BUSY_MESSAGE)
+            return _service_unavailable(self.form_invalid(form))
         # ログインはしない（アクティベーションが必要）
         return redirect(self.success_url)
 
@@ -96,6 +195,9 @@ class ActivateView(TemplateView):
     """アクティベーションビュー"""
 
     template_name = "auth/activate.html"
+    ratelimit_rules = [
+        Rule("activate", settings.RATELIMIT_ACTIVATE_RATE, key="ip", methods=("GET",)),
+    ]
 
     def get(self, request, uidb64, token, *args, **kwargs):
         result = activate_user(uidb64, token)
@@ -116,36 +218,126 @@ def protected_media(request, path):
 
         return redirect_to_login(request.get_full_path())
 
-    file_path = os.path.join(settings.MEDIA_ROOT, path)
+    media_file = (
+        MediaFile.all_objects.filter(file=path)
+        .only("storage_tier", "mime_type", "file", "deleted_at")
+        # 内容が同じファイルは複数のレコードが共有するため、ゴミ箱にないものを優先する
+        .order_by(F("deleted_at").asc(nulls_first=True))
+        .first()
+    )
+    if media_file is not None and media_file.deleted_at is None:
+        # アクセス回数はまとめて DB に反映され、コールド階層のファイルはホット階層へ戻る
+        access_recorder.record(media_file.pk, media_file.storage_tier)
+    else:
+        # 過去の版だけが参照するファイル
+        version = (
+            MediaFileVersion.objects.filter(
+                file=path, media_file__deleted_at__isnull=True
+            )
+            .only("storage_tier", "mime_type", "file")
+            .first()
+        )
+        if version is not None:
+            media_file = version
+        elif (
+            media_file is not None
+            or MediaFileVersion.objects.filter(file=path).exists()
+        ):
+            # ゴミ箱内のファイルは配信しない
+            raise Http404()
+        else:
+            # 変換済みファイルは常にホット階層に置かれる
+            media_file = (
+                MediaRendition.objects.filter(file=path)
+                .only("mime_type", "file")
+                .first()
+            )
+
+    storage = select_media_storage()
+    if not isinstance(storage, FileSystemStorage):
+        # オブジェクトストレージは署名付き URL へリダイレクトし、Web ワーカーを経由させない
+        return HttpResponseRedirect(storage.presigned_url(path))
+
+    tier = getattr(media_file, "storage_tier", MediaFile.TIER_HOT)
+    file_path = os.path.join(tier_root(tier), path)
     if not os.path.exists(file_path):
         raise Http404()
 
     response = HttpResponse()
-    content_type, _ = mimetypes.guess_type(file_path)
-    if content_type:
-        response["Content-Type"] = content_type
-    response["X-Accel-Redirect"] = f"/protected_media/{path}"
+    # アップロード時に判定した Content-Type を使う
+    if media_file is not None:
+        content_type = media_file.get_mime_type()
+    else:
+        content_type = guess_content_type(path)
+    # 種類が分からない場合も text/html として扱われないようにする
+    response["Content-Type"] = content_type or "application/octet-stream"
+    # 日本語などのファイル名もヘッダーに入れられるよう URL エンコードする
+    # （MEDIA_SERVE_MODE=asgi の場合は app.serving.MediaResponder が配信する）
+    if tier == MediaFile.TIER_COLD:
+        response["X-Accel-Redirect"] = f"/protected_media_cold/{quote(path)}"
+    else:
+        response["X-Accel-Redirect"] = f"/protected_media/{quote(path)}"
     return response
 
 
-class MediaFileDetailView(LoginRequiredMixin, TemplateView):
+class MediaFileDetailView(LoginRequiredMixin, PrivatePageCacheMixin, TemplateView):
     """メディアファイル詳細ビュー"""
 
     template_name = "multimedia/detail.html"
     login_url = "app:login"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        media_file = MediaFile.objects.select_related("project", "user").get(
-            pk=kwargs["pk"]
-        )
+    def get_media_file(self):
+        if not hasattr(self, "_media_file_cache"):
+            media_file = get_object_or_404(
+                MediaFile.objects.select_related(
+                    "project", "user", "fingerprint__similar_to"
+                )
+                .defer("fingerprint__codes")
+                .prefetch_related("renditions"),
+                # ユーザーが所有するファイルのみ（user_id で分割したテーブルでは
+                # 1 つのパーティションだけを読む）
+                pk=self.kwargs["pk"],
+                user=self.request.user,
+            )
+            self._media_file_cache = media_file
+        return self._media_file_cache
+
+    def get_content_version(self):
+        """
+        ページの内容を決める値（フラグメントキャッシュのキーと ETag に使う）
+
+        プロジェクト名の変更、変換済みファイルの追加、類似ファイルのゴミ箱への
+        移動ではメディアファイルの updated_at が変わらないため、それぞれの状態も含める。
+        """
+        if not hasattr(self, "_content_version_cache"):
+            media_file = self.get_media_file()
+            fingerprint = getattr(media_file, "fingerprint", None)
+            similar = fingerprint.similar_to if fingerprint else None
+            self._content_version_cache = weak_etag(
+                media_file.pk,
+                media_file.updated_at,
+                media_file.processing_status,
+                # プロジェクトに属さないファイルもある
+                media_file.project.updated_at if media_file.project_id else None,
+                [
+                    (rendition.pk, rendition.file_size)
+                    for rendition in media_file.renditions.all()
+                ],
+                similar and (similar.pk, similar.updated_at, fingerprint.similarity),
+            )
+        return self._content_version_cache
 
-        # ユーザーが所有するファイルかチェック
-        if media_file.user != self.request.user:
-            raise Http404("ファイルが見つかりません。")
+    def get_etag_parts(self):
+        return (self.get_content_version(),)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        media_file = self.get_media_file()
         context["media_file"] = media_file
+        context["content_version"] = self.get_content_version()
+        context["playback"] = media_file.get_playback_source()
         context["project"] = media_file.project
+        context["fragment_cache_timeout"] = settings.TEMPLATE_FRAGMENT_CACHE_TIMEOUT
         return context
 
 
@@ -163,11 +355,13 @@ class MediaFileDeleteView(LoginRequiredMixin, DeleteView):
             "project", "user"
         )
 
-    def delete(self, request, *args, **kwargs):
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        # ゴミ箱に移動する（ファイルの削除は purge_trash コマンドで行う）
+        self.object.soft_delete()
+        return HttpResponseRedirect(self.get_success_url())
 
     def get_success_url(self):
-        messages.success(self.request, "ファイルを削除しました。")
+        messages.success(self.request, "ファイルをゴミ箱に移動しました。")
         project = getattr(self.object, "project", None)
         if project:
             return reverse_lazy(
@@ -195,6 +389,76 @@ class MediaFileRenameView(LoginRequiredMixin, UpdateView):
         return reverse_lazy("app:media_detail", kwargs={"pk": self.object.pk})
 
 
+class MediaFileReplaceView(LoginRequiredMixin, FormView):
+    """メディアファイルの内容の差し替え（新しい版の作成）と版の一覧"""
+
+    form_class = MediaFileReplaceForm
+    template_name = "multimedia/replace.html"
+    login_url = "app:login"
+    ratelimit_rules = [
+        Rule(
+            "upload",
+            settings.RATELIMIT_UPLOAD_RATE,
+            key="user_or_ip",
+            algorithm=TOKEN_BUCKET,
+        ),
+    ]
+    concurrency_limits = [
+        ConcurrencyLimit("upload", settings.UPLOAD_CONCURRENCY_PER_USER),
+    ]
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            self.media_file = get_object_or_404(
+                MediaFile.objects.select_related("project"),
+                pk=kwargs["pk"],
+                user=request.user,
+            )
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["media_file"] = self.media_file
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["media_file"] = self.media_file
+        context["project_id"] = self.kwargs["project_id"]
+        context["versions"] = self.media_file.versions.all()
+        context["max_file_size_mb"] = settings.MAX_MEDIA_FILE_SIZE_MB
+        return context
+
+    def form_valid(self, form):
+        version = replace_content(
+            self.media_file,
+            form.cleaned_data["file"],
+            form.mime_type,
+            form.content_hash,
+        )
+        messages.success(
+            self.request, f"ファイルを差し替えました（版 {version.number}）。"
+        )
+        return redirect(
+            "app:media_detail",
+            project_id=self.kwargs["project_id"],
+            pk=self.media_file.pk,
+        )
+
+
+class MediaFileVersionRestoreView(LoginRequiredMixin, View):
+    """過去の版を現在の版に戻す"""
+
+    login_url = "app:login"
+
+    def post(self, request, project_id, pk, number):
+        media_file = get_object_or_404(MediaFile, pk=pk, user=request.user)
+        version = get_object_or_404(media_file.versions, number=number)
+        restore_version(media_file, version)
+        messages.success(request, f"版 {version.number} に戻しました。")
+        return redirect("app:media_replace", project_id=project_id, pk=pk)
+
+
 class ProjectCreateView(LoginRequiredMixin, CreateView):
     """プロジェクト作成"""
 
@@ -218,28 +482,20 @@ class ProjectDeleteView(LoginRequiredMixin, DeleteView):
     login_url = "app:login"
 
     def get_queryset(self):
-        return Project.objects.filter(owner=self.request.user).prefetch_related(
-            "media_files"
-        )
+        return Project.objects.filter(owner=self.request.user)
 
-    def delete(self, request, *args, **kwargs):
-        """プロジェクト削除時にメディアファイルも削除"""
-        project = self.get_object()
-        project_name = project.name
-        media_count = project.media_files.count()
-
-        # メディアファイルのレコードを削除（シグナルで物理ファイルも削除される）
-        project.media_files.all().delete()
-
-        # プロジェクトを削除
+    def form_valid(self, form):
+        """プロジェクトとその中のメディアファイルをゴミ箱に移動"""
+        project = self.object
+        media_count = project.soft_delete()
         messages.success(
-            request,
-            f"プロジェクト「{project_name}」とその中のメディアファイル{media_count}件を削除しました。",
+            self.request,
+            f"プロジェクト「{project.name}」とその中のメディアファイル{media_count}件をゴミ箱に移動しました。",
         )
-        return super().delete(request, *args, **kwargs)
+        return HttpResponseRedirect(self.get_success_url())
 
 
-class ProjectMediaFileListView(LoginRequiredMixin, ListView):
+class ProjectMediaFileListView(LoginRequiredMixin, PrivatePageCacheMixin, ListView):
     """特定プロジェクトのメディアファイル一覧"""
 
     model = MediaFile
@@ -259,6 +515,15 @@ class ProjectMediaFileListView(LoginRequiredMixin, ListView):
                 raise Http404("プロジェクトが見つかりません。")
         return self._project_cache
 
+    def get_etag_parts(self):
+        project = self._get_project()
+        return (
+            project.pk,
+            project.updated_at,
+            get_media_list_version(project.id),
+            self.request.GET.urlencode(),
+        )
+
     def get_queryset(self):
         project = self._get_project()
         return MediaFile.objects.filter(
@@ -271,6 +536,8 @@ class ProjectMediaFileListView(LoginRequiredMixin, ListView):
         context["current_project_id"] = str(project.id)
         context["current_project"] = project
         context["hide_project_filter"] = True
+        context["media_list_version"] = get_media_list_version(project.id)
+        context["fragment_cache_timeout"] = settings.TEMPLATE_FRAGMENT_CACHE_TIMEOUT
         return context
 
 
@@ -281,6 +548,17 @@ class ProjectMediaFileUploadView(LoginRequiredMixin, CreateView):
     form_class = MediaFileUploadForm
     template_name = "multimedia/upload.html"
     login_url = "app:login"
+    ratelimit_rules = [
+        Rule(
+            "upload",
+            settings.RATELIMIT_UPLOAD_RATE,
+            key="user_or_ip",
+            algorithm=TOKEN_BUCKET,
+        ),
+    ]
+    concurrency_limits = [
+        ConcurrencyLimit("upload", settings.UPLOAD_CONCURRENCY_PER_USER),
+    ]
 
     def _get_project(self):
         project_id = self.kwargs.get("project_id")
@@ -307,7 +585,35 @@ class ProjectMediaFileUploadView(LoginRequiredMixin, CreateView):
         form.instance.user = self.request.user
         form.instance.project = project
         form.instance.file_size = form.instance.file.size
-        return super().form_valid(form)
+        # 同じ内容のファイルが既にあれば保存せずに共有する
+        shared = find_shared_version(self.request.user, form.instance.content_hash)
+        if shared is not None:
+            form.instance.file = shared.file.name
+            form.instance.storage_tier = shared.storage_tier
+        response = super().form_valid(form)
+        if shared is not None:
+            self._warn_duplicate()
+        return response
+
+    def _warn_duplicate(self):
+        """
+        同じ内容のファイルが既にあれば知らせる
+
+        形式やビットレートだけが違うファイルは、アップロード後の処理で音声の指紋から
+        検出し、詳細ページに表示する。
+        """
+        duplicate = find_exact_duplicates(
+            self.request.user, self.object.content_hash, exclude_pk=self.object.pk
+        ).first()
+        if duplicate is None:
+            return
+        location = (
+            f"プロジェクト「{duplicate.project.name}」の" if duplicate.project else ""
+        )
+        messages.warning(
+            self.request,
+            f"同じ内容のファイルが{location}「{duplicate.title}」として既にあります。",
+        )
 
     def get_success_url(self):
         messages.success(self.request, "ファイルが正常にアップロードされました。")
@@ -320,4 +626,301 @@ class ProjectMediaFileUploadView(LoginRequiredMixin, CreateView):
         context = super().get_context_data(**kwargs)
         context["fixed_project"] = self._get_project()
         context["max_file_size_mb"] = settings.MAX_MEDIA_FILE_SIZE_MB
+        context["direct_upload"] = supports_direct_upload(select_media_storage())
+        return context
+
+
+UPLOAD_SESSION_SALT = "app.upload_session"
+
+
+class MediaUploadSessionView(LoginRequiredMixin, View):
+    """
+    ストレージへの直接アップロードのセッションを作成する
+
+    マルチパートアップロードを開始し、パートごとの署名付き URL と、
+    完了時に送り返すトークンを返す。メディアのバイト列は Web ワーカーを経由しない。
+    """
+
+    login_url = "app:login"
+    ratelimit_rules = ProjectMediaFileUploadView.ratelimit_rules
+    complete_url_name = "app:media_upload_complete"
+
+    def post(self, request, project_id):
+        project = _get_owned_project(request.user, project_id)
+        storage = select_media_storage()
+        if not supports_direct_upload(storage):
+            return JsonResponse(
+                {"error": "このストレージは直接アップロードに対応していません。"},
+                status=400,
+            )
+
+        try:
+            data = json.loads(request.body)
+            filename = str(data["filename"])
+            file_size = int(data["file_size"])
+            content_type = str(data["content_type"])
+            file_type = str(data["file_type"])
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({"error": "リクエストが不正です。"}, status=400)
+
+        title = str(data.get("title", "")).strip()[:200]
+        description = str(data.get("description", ""))
+        if not title:
+            return JsonResponse({"error": "タイトルを入力してください。"}, status=400)
+        if file_size <= 0 or file_size > settings.MAX_MEDIA_FILE_SIZE_BYTES:
+            return JsonResponse(
+                {
+                    "error": f"ファイルサイズが大きすぎます。{settings.MAX_MEDIA_FILE_SIZE_MB}MB以下のファイルを選択してください。"
+                },
+                status=400,
+            )
+        if file_type not in dict(MediaFile.FILE_TYPE_CHOICES):
+            return JsonResponse({"error": "ファイル種別が不正です。"}, status=400)
+        if not content_type.startswith(f"{file_type}/"):
+            message = (
+                "音声ファイルを選択してください。"
+                if file_type == "audio"
+                else "動画ファイルを選択してください。"
+            )
+            return JsonResponse({"error": message}, status=400)
+
+        instance = MediaFile(user=request.user, project=project)
+        name = storage.get_available_name(media_upload_to(instance, filename))
+        part_size = settings.MEDIA_UPLOAD_PART_SIZE_MB * 1024 * 1024
+        part_count = max(1, math.ceil(file_size / part_size))
+        upload_id, part_urls = storage.create_multipart_upload(
+            name, content_type, part_count
+        )
+
+        token = signing.dumps(
+            {
+                "user_id": request.user.pk,
+                "project_id": project.pk,
+                "name": name,
+                "upload_id": upload_id,
+                "title": title,
+                "description": description,
+                "file_type": file_type,
+            },
+            salt=UPLOAD_SESSION_SALT,
+        )
+        return JsonResponse(
+            {
+                "token": token,
+                "part_size": part_size,
+                "parts": [
+                    {"part_number": number, "url": url}
+                    for number, url in enumerate(part_urls, start=1)
+                ],
+                "complete_url": reverse(
+                    self.complete_url_name, kwargs={"project_id": project.pk}
+                ),
+            }
+        )
+
+
+class MediaUploadCompleteView(LoginRequiredMixin, View):
+    """直接アップロードを完了し、メディアファイルを登録する"""
+
+    login_url = "app:login"
+
+    def post(self, request, project_id):
+        project = _get_owned_project(request.user, project_id)
+        storage = select_media_storage()
+        try:
+            data = json.loads(request.body)
+            session = signing.loads(
+                data["token"],
+                salt=UPLOAD_SESSION_SALT,
+                max_age=settings.MEDIA_S3_UPLOAD_SESSION_MAX_AGE,
+            )
+        except (ValueError, KeyError, TypeError, signing.BadSignature):
+            return JsonResponse({"error": "リクエストが不正です。"}, status=400)
+        if session["user_id"] != request.user.pk or session["project_id"] != project.pk:
+            return JsonResponse({"error": "リクエストが不正です。"}, status=400)
+        # 完了済みのトークンの再送
+        if MediaFile.all_objects.filter(
+            user=request.user, file=session["name"]
+        ).exists():
+            return JsonResponse(
+                {"error": "このアップロードは完了しています。"}, status=400
+            )
+
+        try:
+            file_size = storage.complete_multipart_upload(
+                session["name"], session["upload_id"], _parse_parts(data.get("parts"))
+            )
+        except (ValueError, MultipartUploadError):
+            # アップロード済みのパートがストレージに残らないよう中止する
+            storage.abort_multipart_upload(session["name"], session["upload_id"])
+            return JsonResponse(
+                {"error": "アップロードを完了できませんでした。"}, status=400
+            )
+        if file_size > settings.MAX_MEDIA_FILE_SIZE_BYTES:
+            storage.delete(session["name"])
+            return JsonResponse(
+                {
+                    "error": f"ファイルサイズが大きすぎます。{settings.MAX_MEDIA_FILE_SIZE_MB}MB以下のファイルを選択してください。"
+                },
+                status=400,
+            )
+
+        # ブラウザの申告ではなくアップロードされた先頭バイトで形式を判定する
+        content_type = coerce_content_type(
+            sniff_content_type(read_file_head(storage, session["name"])),
+            session["file_type"],
+        )
+        if content_type is None:
+            storage.delete(session["name"])
+            message = (
+                "音声ファイルを選択してください。"
+                if session["file_type"] == "audio"
+                else "動画ファイルを選択してください。"
+            )
+            return JsonResponse({"error": message}, status=400)
+
+        media_file = MediaFile.objects.create(
+            user=request.user,
+            project=project,
+            title=session["title"],
+            description=session["description"],
+            file_type=session["file_type"],
+            file=session["name"],
+            file_size=file_size,
+            mime_type=content_type,
+        )
+        messages.success(request, "ファイルが正常にアップロードされました。")
+        return JsonResponse(
+            {
+                "id": media_file.pk,
+                "redirect_url": reverse(
+                    "app:project_media_list", kwargs={"project_id": project.pk}
+                ),
+            },
+            status=201,
+        )
+
+
+class ProgressEventsView(View):
+    """
+    進捗イベントの SSE（Server-Sent Events）ストリーム
+
+    kind が media の場合はアップロード後の処理の進捗を送る。
+    """
+
+    kind = None
+
+    async def get(self, request, key):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return HttpResponse(status=401)
+        channel, initial = await resolve_channel(user, self.kind, key)
+        # 接続中は DB を使わないため、長時間の接続で DB の接続数を消費しないよう閉じる
+        await sync_to_async(close_connection)()
+        if channel is None:
+            raise Http404()
+        response = StreamingHttpResponse(
+            sse_stream(channel, initial), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Nginx でバッファリングせず、イベントをすぐにクライアントへ送る
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class TrashView(LoginRequiredMixin, TemplateView):
+    """ゴミ箱（削除したプロジェクトとメディアファイルの一覧）"""
+
+    template_name = "trash/list.html"
+    login_url = "app:login"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user = self.request.user
+        context["projects"] = (
+            Project.all_objects.trashed()
+            .filter(owner=user)
+            .annotate(media_count=Count("media_files"))
+            .order_by("-deleted_at")
+        )
+        # プロジェクトごと削除されたファイルはプロジェクトとして表示する
+        context["media_files"] = (
+            MediaFile.all_objects.trashed()
+            .filter(user=user, project__deleted_at__isnull=True)
+            .select_related("project")
+            .order_by("-deleted_at")
+        )
+        context["retention_days"] = settings.TRASH_RETENTION_DAYS
         return context
+
+
+class MediaFileRestoreView(LoginRequiredMixin, View):
+    """ゴミ箱からメディアファイルを復元"""
+
+    login_url = "app:login"
+
+    def post(self, request, pk):
+        media_file = get_object_or_404(
+            MediaFile.all_objects.trashed().filter(
+                user=request.user, project__deleted_at__isnull=True
+            ),
+            pk=pk,
+        )
+        media_file.restore()
+        messages.success(request, f"「{media_file.title}」を復元しました。")
+        return redirect("app:trash")
+
+
+class ProjectRestoreView(LoginRequiredMixin, View):
+    """ゴミ箱からプロジェクトを復元"""
+
+    login_url = "app:login"
+
+    def post(self, request, pk):
+        project = get_object_or_404(
+            Project.all_objects.trashed().filter(owner=request.user), pk=pk
+        )
+        if Project.objects.filter(owner=request.user, name=project.name).exists():
+            messages.error(
+                request,
+                f"同じ名前のプロジェクト「{project.name}」があるため復元できません。",
+            )
+        else:
+            project.restore()
+            messages.success(request, f"プロジェクト「{project.name}」を復元しました。")
+        return redirect("app:trash")
+
+
+def _parse_parts(parts):
+    """
+    完了リクエストの parts を (パート番号, ETag) のリストにする
+
+    パート番号が整数でない・重複している、ETag がないなどの場合は ValueError を送出する。
+    """
+    if not isinstance(parts, list) or not parts:
+        raise ValueError("parts がありません")
+    parsed = {}
+    for part in parts:
+        if not isinstance(part, dict):
+            raise ValueError("parts の要素が不正です")
+        number, etag = part.get("part_number"), part.get("etag")
+        if type(number) is not int or not 1 <= number <= 10000:
+            raise ValueError(f"パート番号が不正です: {number!r}")
+        if not isinstance(etag, str) or not etag or number in parsed:
+            raise ValueError(f"パート {number} の ETag が不正です")
+        parsed[number] = etag
+    return list(parsed.items())
+
+
+def _service_unavailable(response):
+    """混雑している場合の応答（フォームを再表示し、再試行までの秒数を伝える）"""
+    response.status_code = 503
+    response["Retry-After"] = str(settings.RATELIMIT_RETRY_AFTER)
+    return response
+
+
+def _get_owned_project(user, project_id):
+    try:
+        return Project.objects.get(id=project_id, owner=user)
+    except Project.DoesNotExist:
+        raise Http404("プロジェクトが見つかりません。")
@@ -0,0 +1,74 @@
+"""
+起動時のウォームアップ処理
+"""
+
+import logging
+import os
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template import engines
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEMPLATE_SUFFIXES = (".html", ".txt")
+
+
+def warm_templates():
+    """
+    全テンプレートを事前にコンパイルし、キャッシュローダーに載せる
+
+    最初のリクエストでテンプレートの読み込み・パースが走らないよう、
+    ワーカー起動時に呼び出す。
+    """
+    count = 0
+    for engine in engines.all():
+        template_dirs = set()
+        for loader in getattr(engine, "engine", engine).template_loaders:
+            if hasattr(loader, "get_dirs"):
+                template_dirs.update(str(d) for d in loader.get_dirs())
+
+        for template_dir in sorted(template_dirs):
+            for root, _, files in os.walk(template_dir):
+                for filename in files:
+                    if not filename.endswith(WARMUP_TEMPLATE_SUFFIXES):
+                        continue
+                    name = os.path.relpath(os.path.join(root, filename), template_dir)
+                    engine.get_template(name.replace(os.sep, "/"))
+                    count += 1
+    return count
+
+
+def warm_urls():
+    """URL パターンを読み込み、reverse() 用の逆引き表を作っておく"""
+    resolver = get_resolver()
+    count = len(resolver.reverse_dict)
+    # 名前空間（app: / api:）ごとの逆引き表は別に作られる
+    for _, namespace_resolver in resolver.namespace_dict.values():
+        count += len(namespace_resolver.reverse_dict)
+    return count
+
+
+def warm_static():
+    """静的ファイルのマニフェスト（ハッシュ付きファイル名の対応表）を読み込んでおく"""
+    try:
+        return len(staticfiles_storage.hashed_files)
+    except AttributeError:
+        # マニフェストを使わないストレージ
+        return 0
+
+
+def warm():
+    """
+    起動時のウォームアップをまとめて行う
+
+    gunicorn の --preload で親プロセスが一度だけ実行し、fork したワーカーに引き継ぐ。
+    DB への接続はワーカーに引き継げないため、ここでは行わない。
+    """
+    counts = {
+        "templates": warm_templates(),
+        "urls": warm_urls(),
+        "static": warm_static(),
+    }
+    logger.info("ウォームアップ完了: %s", counts)
+    return counts
@@ -0,0 +1,102 @@
+"""
+進捗イベントの WebSocket エンドポイント（EVENTS_WEBSOCKET_ENABLED の場合のみ）
+
+/ws/media/<pk>/ で、SSE と同じイベントを JSON のテキストメッセージとして送る。Django のビューを通らないため、セッション Cookie と
+Origin ヘッダーはここで検証する。
+"""
+
+import asyncio
+import json
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .events import close_connection, iter_events, resolve_channel
+
+PATH_RE = re.compile(r"^/ws/(?P<kind>media)/(?P<key>[^/]+)/$")
+
+
+def _headers(scope):
+    return {
+        name.decode("latin-1"): value.decode("latin-1")
+        for name, value in scope.get("headers", [])
+    }
+
+
+def _origin_allowed(headers):
+    """別サイトのページから接続されないよう、Origin が自サイトかを確認する"""
+    origin = headers.get("origin")
+    if not origin:
+        return False
+    if origin in settings.CSRF_TRUSTED_ORIGINS:
+        return True
+    return urlsplit(origin).netloc == headers.get("host")
+
+
+async def _get_user(headers):
+    cookie = SimpleCookie()
+    cookie.load(headers.get("cookie", ""))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(morsel.value if morsel else None)
+    return await aget_user(SimpleNamespace(session=session))
+
+
+async def websocket_application(scope, receive, send):
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+
+    match = PATH_RE.match(scope["path"])
+    headers = _headers(scope)
+    if match is None or not _origin_allowed(headers):
+        await send({"type": "websocket.close", "code": 4403})
+        return
+    kind, key = match["kind"], match["key"]
+    if kind == "media":
+        if not key.isdigit():
+            await send({"type": "websocket.close", "code": 4404})
+            return
+        key = int(key)
+    try:
+        user = await _get_user(headers)
+        channel, initial = await resolve_channel(user, kind, key)
+    finally:
+        # リクエスト単位の接続管理が行われず、接続中は DB を使わないため閉じる
+        await sync_to_async(close_connection)()
+    if channel is None:
+        await send({"type": "websocket.close", "code": 4404})
+        return
+
+    await send({"type": "websocket.accept"})
+
+    async def forward():
+        if initial is not None:
+            await send_event(initial)
+        async for event in iter_events(channel):
+            if event is not None:
+                await send_event(event)
+        await send({"type": "websocket.close", "code": 1000})
+
+    async def send_event(event):
+        text = json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False)
+        await send({"type": "websocket.send", "text": text})
+
+    async def wait_disconnect():
+        while (await receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(forward()), asyncio.create_task(wait_disconnect())]
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for task in done:
+        task.result()
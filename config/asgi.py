@@ -13,4 +13,35 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+from app.concurrency import wrap as limit_concurrency  # noqa: E402
+
+django_application = limit_concurrency(django_application)
+
+if settings.MEDIA_SERVE_MODE == "asgi":
+    from app.serving import MediaResponder  # noqa: E402
+
+    django_application = MediaResponder(django_application)
+
+if settings.EVENTS_WEBSOCKET_ENABLED:
+    from app.websocket import websocket_application  # noqa: E402
+
+    async def application(scope, receive, send):
+        if scope["type"] == "websocket":
+            return await websocket_application(scope, receive, send)
+        return await django_application(scope, receive, send)
+
+else:
+    application = django_application
+
+if settings.METRICS_ENABLED:
+    from app.metrics import MetricsMiddleware  # noqa: E402
+
+    application = MetricsMiddleware(application)
+
+from app.warmup import warm  # noqa: E402
+
+warm()
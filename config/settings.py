@@ -11,16 +11,19 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Load environment variables from .env file
+# コンテナでは env_file で環境変数を渡すため読み込まない（DJANGO_LOAD_DOTENV=False）
+if os.environ.get("DJANGO_LOAD_DOTENV", "True").lower() == "true":
+    load_dotenv(BASE_DIR / ".env")
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -53,11 +56,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # プローブには他のミドルウェアを通さずに応答する
+    "app.middleware.HealthCheckMiddleware",
+    "app.middleware.RequestContextMiddleware",
+    # 本文を書き換える他のミドルウェアより後（レスポンスの処理では最後）に圧縮する
+    "app.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
-    "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # リクエストボディを読み込む CsrfViewMiddleware より前で判定する
+    "app.middleware.RateLimitMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -68,13 +78,22 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
             ],
+            # コンパイル済みテンプレートをプロセス内に保持する（起動時にウォームアップ）
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
         },
     },
 ]
@@ -93,9 +112,146 @@ DATABASES = {
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD"),
         "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
         "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        # ASGI では同期ビューがリクエストごとのスレッドで動くため、既定では接続を持ち越さない
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "0")),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
+# プロセスごとに、リクエストボディの受信後に同時に処理するリクエスト数の上限
+# （gunicorn.conf.py が DB_MAX_CONNECTIONS をワーカー数で割った値を設定する。0 は無制限）
+DB_CONCURRENCY_LIMIT = int(os.environ.get("DB_CONCURRENCY_LIMIT", "0"))
+# 上限に達しているときに空きを待つ秒数（超えると 503 を返す）
+DB_CONCURRENCY_TIMEOUT = float(os.environ.get("DB_CONCURRENCY_TIMEOUT", "10"))
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+
+# ログの形式（json または text）。書き出しは別スレッドで行う
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "request_context": {"()": "app.observability.RequestIdFilter"},
+    },
+    "formatters": {
+        "json": {"()": "app.observability.JsonFormatter"},
+        "text": {
+            "format": "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s",
+        },
+    },
+    "handlers": {
+        "console": {
+            "()": "app.observability.QueueStreamHandler",
+            "formatter": LOG_FORMAT,
+            "filters": ["request_context"],
+        },
+    },
+    "root": {"handlers": ["console"], "level": LOG_LEVEL},
+    "loggers": {
+        "django": {
+            "handlers": ["console"],
+            "level": os.environ.get("DJANGO_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+    },
+}
+
+# この時間（ミリ秒）以上かかったリクエストを警告ログに記録する
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get("SLOW_REQUEST_THRESHOLD_MS", "1000"))
+
+# Tracing（app.observability）
+# サンプリングされたリクエストのみ、HTTP・DB クエリ・ストレージ・テンプレート描画・
+# メール送信のスパンを file（JSON Lines）または otlp（OTLP/HTTP JSON）へ書き出す
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "False").lower() == "true"
+TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", "0.01"))
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "file")
+TRACING_FILE_PATH = os.environ.get(
+    "TRACING_FILE_PATH", BASE_DIR / "tmp" / "traces.jsonl"
+)
+TRACING_OTLP_ENDPOINT = os.environ.get(
+    "TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+)
+TRACING_SERVICE_NAME = os.environ.get(
+    "TRACING_SERVICE_NAME", "django-tailwindcss-multimedia-auth"
+)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "default"),
+        "TIMEOUT": int(os.environ.get("CACHE_TIMEOUT", "300")),
+    }
+}
+
+# 一覧・詳細ページのフラグメントキャッシュの有効期間（秒）
+TEMPLATE_FRAGMENT_CACHE_TIMEOUT = int(
+    os.environ.get("TEMPLATE_FRAGMENT_CACHE_TIMEOUT", "3600")
+)
+
+# ログインユーザー専用ページの ETag に含めるリリースの識別子（デプロイごとに変える）。
+# 空の場合は静的ファイルのマニフェストから求める
+RELEASE_ID = os.environ.get("RELEASE_ID", "")
+
+# レスポンスの圧縮（app.middleware.CompressionMiddleware）
+# brotli パッケージがインストールされていれば Brotli、なければ gzip を使う
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "True").lower() == "true"
+# これより短い本文は圧縮しない（バイト）
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+# 動的なレスポンスでは最大の 11 は遅すぎるため、速度と圧縮率の釣り合う値にする
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "5"))
+# 圧縮しない Content-Type（前方一致）。既に圧縮された形式と、小さなイベントを長時間送り続ける SSE
+COMPRESSION_EXCLUDED_TYPES = [
+    "image/",
+    "audio/",
+    "video/",
+    "font/woff",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/octet-stream",
+    "text/event-stream",
+]
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+
+# 推奨ハッシャー（argon2 を使う場合は argon2-cffi が必要）。
+# 変更後は、既存ユーザーのパスワードがログイン時に自動で再ハッシュされる。
+PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "scrypt")
+_PASSWORD_HASHERS = {
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+
+# パスワードのハッシュ計算の同時実行数（既定は CPU コア数の半分）、待ち行列の長さ
+# （超えた場合はすぐに失敗させる）と待ち時間の上限
+PASSWORD_HASH_WORKERS = int(
+    os.environ.get("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+)
+PASSWORD_HASH_QUEUE_SIZE = int(
+    os.environ.get("PASSWORD_HASH_QUEUE_SIZE", PASSWORD_HASH_WORKERS * 4)
+)
+PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", "10"))
+
+AUTHENTICATION_BACKENDS = ["app.backends.BoundedHashingModelBackend"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -135,10 +291,165 @@ STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# collectstatic でハッシュ付きファイル名・マニフェスト・事前圧縮ファイルを出力する
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "app.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
 # Media files
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# アクセス頻度の低いメディアファイルを移動するコールド階層のディレクトリ
+MEDIA_COLD_ROOT = Path(os.environ.get("MEDIA_COLD_ROOT", BASE_DIR / "media_cold"))
+# この日数アクセスがないファイルをコールド階層へ移動する（media_tiering コマンド）
+MEDIA_TIER_DEMOTE_AFTER_DAYS = int(os.environ.get("MEDIA_TIER_DEMOTE_AFTER_DAYS", "90"))
+# S3 互換ストレージでの階層ごとのストレージクラス
+MEDIA_S3_STORAGE_CLASSES = {
+    "hot": os.environ.get("MEDIA_S3_HOT_STORAGE_CLASS", "STANDARD"),
+    "cold": os.environ.get("MEDIA_S3_COLD_STORAGE_CLASS", "STANDARD_IA"),
+}
+# アクセス回数を DB に反映する間隔（秒）と、反映前に保持する最大件数
+MEDIA_ACCESS_FLUSH_INTERVAL = float(os.environ.get("MEDIA_ACCESS_FLUSH_INTERVAL", "30"))
+MEDIA_ACCESS_FLUSH_MAX_PENDING = int(
+    os.environ.get("MEDIA_ACCESS_FLUSH_MAX_PENDING", "1000")
+)
+# メディアファイルのテーブルを月ごとに分割している場合に、先に作成しておく月数
+# （media_partitions コマンド）
+MEDIA_PARTITION_MONTHS_AHEAD = int(os.environ.get("MEDIA_PARTITION_MONTHS_AHEAD", "3"))
+
+# ファイルシステムのメディアファイルの配信方法
+# accel: Nginx が X-Accel-Redirect を解釈して配信する
+# asgi: Nginx を使わない構成向け。アプリケーションが pathsend またはチャンク単位で配信する
+MEDIA_SERVE_MODE = os.environ.get("MEDIA_SERVE_MODE", "accel")
+
+# メディアファイルのストレージ（filesystem または s3）
+# s3 の場合は django-storages[s3] が必要。MinIO 等の S3 互換ストレージも利用できる。
+MEDIA_STORAGE_BACKEND = os.environ.get("MEDIA_STORAGE_BACKEND", "filesystem")
+
+if MEDIA_STORAGE_BACKEND == "s3":
+    STORAGES["media"] = {
+        "BACKEND": "app.storage.SafeS3MediaStorage",
+        "OPTIONS": {
+            "bucket_name": os.environ.get("MEDIA_S3_BUCKET_NAME", "media"),
+            # 署名付き URL はブラウザから直接アクセスされるため、外部から到達できる URL を指定する
+            "endpoint_url": os.environ.get("MEDIA_S3_ENDPOINT_URL") or None,
+            "region_name": os.environ.get("MEDIA_S3_REGION_NAME") or None,
+            "access_key": os.environ.get("MEDIA_S3_ACCESS_KEY_ID"),
+            "secret_key": os.environ.get("MEDIA_S3_SECRET_ACCESS_KEY"),
+            "addressing_style": os.environ.get("MEDIA_S3_ADDRESSING_STYLE", "path"),
+            "signature_version": "s3v4",
+            "querystring_expire": int(
+                os.environ.get("MEDIA_S3_PRESIGNED_EXPIRE", "3600")
+            ),
+            "file_overwrite": False,
+            "default_acl": None,
+        },
+    }
+else:
+    STORAGES["media"] = {
+        "BACKEND": "app.storage.SafeMediaFileStorage",
+    }
+
+# 直接アップロード時のマルチパートのパートサイズ（MB、S3 の最小値は 5MB）
+MEDIA_UPLOAD_PART_SIZE_MB = int(os.environ.get("MEDIA_UPLOAD_PART_SIZE_MB", "16"))
+# 直接アップロードのセッション（完了用トークン）の有効期間（秒）
+MEDIA_S3_UPLOAD_SESSION_MAX_AGE = int(
+    os.environ.get("MEDIA_S3_UPLOAD_SESSION_MAX_AGE", "86400")
+)
+
+# メディアファイルの過去の版を保持する件数（現在の版を除く）と、
+# それを超えた版を削除するまでの日数（prune_media_versions コマンド）
+MEDIA_VERSION_KEEP = int(os.environ.get("MEDIA_VERSION_KEEP", "5"))
+MEDIA_VERSION_KEEP_DAYS = int(os.environ.get("MEDIA_VERSION_KEEP_DAYS", "7"))
+
+# ゴミ箱に移動したプロジェクト・メディアファイルを保持する日数（purge_trash コマンド）
+TRASH_RETENTION_DAYS = int(os.environ.get("TRASH_RETENTION_DAYS", "30"))
+
+# アクティベーションされないままこの日数が経過したユーザーを削除する（cleanup_accounts
+# コマンド）。アクティベーションのリンクの有効期限（PASSWORD_RESET_TIMEOUT、既定 3 日）より
+# 長くする
+UNACTIVATED_USER_RETENTION_DAYS = int(
+    os.environ.get("UNACTIVATED_USER_RETENTION_DAYS", "7")
+)
+
+# アップロード後の処理（process_media コマンド）
+# ワーカー数（同時に処理するファイル数）と、ワーカープロセスの nice 値
+MEDIA_PROCESSING_WORKERS = int(os.environ.get("MEDIA_PROCESSING_WORKERS", "1"))
+MEDIA_PROCESSING_NICE = int(os.environ.get("MEDIA_PROCESSING_NICE", "10"))
+# 処理待ちがない場合の待機秒数
+MEDIA_PROCESSING_POLL_INTERVAL = float(
+    os.environ.get("MEDIA_PROCESSING_POLL_INTERVAL", "5")
+)
+# この秒数を超えて処理中のままのファイルは、ワーカーが停止したものとみなして再処理する
+MEDIA_PROCESSING_STALE_SECONDS = int(
+    os.environ.get("MEDIA_PROCESSING_STALE_SECONDS", "7200")
+)
+
+# Web で再生しやすい形式への変換（ffmpeg が必要）
+MEDIA_TRANSCODE_ENABLED = os.environ.get("MEDIA_TRANSCODE_ENABLED", "False") == "True"
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+# 1ファイルあたりの変換のタイムアウト（秒）
+MEDIA_TRANSCODE_TIMEOUT = int(os.environ.get("MEDIA_TRANSCODE_TIMEOUT", "3600"))
+# 動画は H.264/AAC の MP4 に変換する。高さの上限と画質（CRF）
+MEDIA_TRANSCODE_VIDEO_MAX_HEIGHT = int(
+    os.environ.get("MEDIA_TRANSCODE_VIDEO_MAX_HEIGHT", "720")
+)
+MEDIA_TRANSCODE_VIDEO_CRF = int(os.environ.get("MEDIA_TRANSCODE_VIDEO_CRF", "23"))
+# 音声の変換先コーデック（aac または opus）
+MEDIA_TRANSCODE_AUDIO_CODEC = os.environ.get("MEDIA_TRANSCODE_AUDIO_CODEC", "aac")
+
+# 音声の解析（ラウドネス・トゥルーピーク・RMS・無音区間。ffmpeg と numpy が必要）
+MEDIA_ANALYSIS_ENABLED = os.environ.get("MEDIA_ANALYSIS_ENABLED", "False") == "True"
+# RMS がこの値（dBFS）未満の状態が MEDIA_ANALYSIS_SILENCE_MIN_SECONDS 以上続く区間を無音とする
+MEDIA_ANALYSIS_SILENCE_THRESHOLD_DB = float(
+    os.environ.get("MEDIA_ANALYSIS_SILENCE_THRESHOLD_DB", "-50")
+)
+MEDIA_ANALYSIS_SILENCE_MIN_SECONDS = float(
+    os.environ.get("MEDIA_ANALYSIS_SILENCE_MIN_SECONDS", "2")
+)
+
+# 音声の指紋による類似ファイルの検出（ffmpeg と numpy が必要）
+MEDIA_FINGERPRINT_ENABLED = (
+    os.environ.get("MEDIA_FINGERPRINT_ENABLED", "False") == "True"
+)
+# 指紋を計算する長さ（先頭からの秒数）
+MEDIA_FINGERPRINT_MAX_SECONDS = int(
+    os.environ.get("MEDIA_FINGERPRINT_MAX_SECONDS", "900")
+)
+# 指紋のビット誤り率がこの値以下なら類似ファイルとみなす（無関係な音声では約 0.5）
+MEDIA_FINGERPRINT_MAX_BIT_ERROR_RATE = float(
+    os.environ.get("MEDIA_FINGERPRINT_MAX_BIT_ERROR_RATE", "0.3")
+)
+
+# ワーカーごとのメトリクス（/metrics）
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "True").lower() == "true"
+# 各ワーカーが値を書き出すディレクトリ（gunicorn.conf.py が設定する）
+METRICS_DIR = os.environ.get(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "app-metrics")
+)
+METRICS_WRITE_INTERVAL = float(os.environ.get("METRICS_WRITE_INTERVAL", "5"))
+METRICS_LOOP_LAG_INTERVAL = 0.5
+
+# 進捗イベント（SSE / WebSocket）
+# postgres: LISTEN/NOTIFY でプロセスをまたいで配信 / memory: 同じプロセス内のみ
+# auto: データベースが PostgreSQL なら postgres
+EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND", "auto")
+# WebSocket（/ws/...）を有効にする（uvicorn に websockets パッケージが必要）
+EVENTS_WEBSOCKET_ENABLED = (
+    os.environ.get("EVENTS_WEBSOCKET_ENABLED", "False").lower() == "true"
+)
+# イベントがない間に接続維持用のメッセージを送る間隔（秒）
+EVENTS_HEARTBEAT_SECONDS = int(os.environ.get("EVENTS_HEARTBEAT_SECONDS", "15"))
+# 1 本の接続を維持する最大時間（秒）。経過後はクライアントが再接続する
+EVENTS_STREAM_TIMEOUT = int(os.environ.get("EVENTS_STREAM_TIMEOUT", "600"))
+EVENTS_RETRY_MILLISECONDS = 3000
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -163,14 +474,43 @@ if USE_MAILGUN:
         f"Django TailwindCSS Multimedia Auth <noreply@{mailgun_sender_domain}>",
     )
 else:
-    EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+    # テスト時はファイルベースのバックエンド（django.core.mail.backends.filebased.EmailBackend）を指定できる
+    EMAIL_BACKEND = os.environ.get(
+        "EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend"
+    )
+    EMAIL_FILE_PATH = os.environ.get("EMAIL_FILE_PATH", BASE_DIR / "tmp" / "emails")
     DEFAULT_FROM_EMAIL = os.environ.get(
         "DEFAULT_FROM_EMAIL", "Django TailwindCSS Multimedia Auth <noreply@localhost>"
     )
 
+# Email outbox settings（send_outbox コマンドによるバックグラウンド送信）
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+EMAIL_OUTBOX_RATE_PER_SECOND = float(
+    os.environ.get("EMAIL_OUTBOX_RATE_PER_SECOND", "10")
+)
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(
+    os.environ.get("EMAIL_OUTBOX_RETRY_BASE_SECONDS", "30")
+)
+EMAIL_OUTBOX_POLL_INTERVAL = float(os.environ.get("EMAIL_OUTBOX_POLL_INTERVAL", "2"))
+
 # Frontend URL for activation emails
 FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://127.0.0.1:8000")
 
+# Rate limiting（app.middleware.RateLimitMiddleware）
+RATELIMIT_ENABLED = os.environ.get("RATELIMIT_ENABLED", "True").lower() == "true"
+# 共有ストアとして使うキャッシュ（複数ワーカー間で共有するには Redis 等を指定する）
+RATELIMIT_CACHE = os.environ.get("RATELIMIT_CACHE", "default")
+# クライアント IP を取得する META キー。Nginx 経由の場合は HTTP_X_REAL_IP
+# （docker-compose で設定済み）。直接公開する場合はクライアントが偽装できるため使わない
+RATELIMIT_IP_META_KEY = os.environ.get("RATELIMIT_IP_META_KEY", "REMOTE_ADDR")
+RATELIMIT_RETRY_AFTER = int(os.environ.get("RATELIMIT_RETRY_AFTER", "30"))
+RATELIMIT_LOGIN_RATE = os.environ.get("RATELIMIT_LOGIN_RATE", "10/m")
+RATELIMIT_SIGNUP_RATE = os.environ.get("RATELIMIT_SIGNUP_RATE", "5/h")
+RATELIMIT_ACTIVATE_RATE = os.environ.get("RATELIMIT_ACTIVATE_RATE", "30/h")
+RATELIMIT_UPLOAD_RATE = os.environ.get("RATELIMIT_UPLOAD_RATE", "60/h")
+UPLOAD_CONCURRENCY_PER_USER = int(os.environ.get("UPLOAD_CONCURRENCY_PER_USER", "2"))
+
 # Media file upload settings
 MAX_MEDIA_FILE_SIZE_MB = int(os.environ.get("MAX_MEDIA_FILE_SIZE_MB", "300"))
 MAX_MEDIA_FILE_SIZE_BYTES = MAX_MEDIA_FILE_SIZE_MB * 1024 * 1024
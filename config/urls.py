@@ -20,5 +20,6 @@ from django.urls import include, path
 
 urlpatterns = [
     path("", include("app.urls")),
+    path("api/v1/", include("app.api_urls")),
     path("admin/", admin.site.urls),
 ]
@@ -0,0 +1,20 @@
+"""
+gunicorn のワーカークラス
+"""
+
+from uvicorn_worker import UvicornWorker as BaseUvicornWorker
+
+
+class UvicornWorker(BaseUvicornWorker):
+    """
+    gunicorn の設定を uvicorn に引き継ぐワーカー
+
+    - worker_connections を同時接続数の上限（limit_concurrency）にする
+      （DB を使う処理の同時実行数は app.concurrency.ConcurrencyLimiter が別に制限する）
+    - graceful_timeout の間に終わらない接続は、終了時に閉じる
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config.limit_concurrency = self.cfg.worker_connections
+        self.config.timeout_graceful_shutdown = self.cfg.graceful_timeout
@@ -0,0 +1,129 @@
+"""
+gunicorn の設定（環境変数で調整する）
+
+ワーカー数は CPU 数と利用できるメモリから決める。1 ワーカーあたりの同時接続数と、
+DB を使う処理の同時実行数（DB の接続数の上限をワーカー数で割った値）は別々に制限する。
+"""
+
+import glob
+import math
+import os
+import tempfile
+
+MB = 1024 * 1024
+
+
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def cpu_count():
+    """コンテナに割り当てられた CPU 数（cgroup の制限があればそちらを優先する）"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def memory_limit_mb():
+    """コンテナのメモリ上限、なければ利用可能なメモリ（MB）"""
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            value = f.read().strip()
+        if value != "max":
+            return int(value) // MB
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def default_workers():
+    workers = cpu_count() * _env_int("GUNICORN_WORKERS_PER_CPU", 2)
+    memory = memory_limit_mb()
+    if memory is not None:
+        workers = min(workers, memory // _env_int("GUNICORN_WORKER_MEMORY_MB", 256))
+    return max(1, workers)
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = "config.workers.UvicornWorker"
+workers = _env_int("GUNICORN_WORKERS") or default_workers()
+
+# 1 ワーカーが同時に保持する接続数。SSE や受信中のアップロードも数えるため大きめにし、
+# 超えた分は uvicorn が 503 を返す
+worker_connections = _env_int("GUNICORN_WORKER_CONNECTIONS", 1000)
+
+# 同期ビューはリクエストごとのスレッドで DB に接続するため、ボディの受信後に同時に処理する
+# リクエスト数が DB の接続数になる。app.concurrency.ConcurrencyLimiter がこの値で制限する
+db_concurrency = _env_int("DB_CONCURRENCY_LIMIT") or max(
+    1, _env_int("DB_MAX_CONNECTIONS", 90) // workers
+)
+os.environ["DB_CONCURRENCY_LIMIT"] = str(db_concurrency)
+
+# 非同期ワーカーでは timeout はハートビートの間隔で、リクエストの処理時間ではない
+timeout = _env_int("GUNICORN_TIMEOUT", 60)
+# 再起動時、処理中のリクエスト（大きなファイルのアップロードなど）が終わるのを待つ時間
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 120)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+
+# メモリの断片化やリークに備えて一定数のリクエストごとにワーカーを入れ替える。
+# 全ワーカーが同時に再起動しないよう、上限にばらつきを持たせる
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 2000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+
+# 親プロセスでアプリケーションを読み込み、ウォームアップしてから fork する
+preload_app = True
+# ハートビート用の一時ファイルはディスクの遅延の影響を受けない tmpfs に置く
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+# ワーカーごとのメトリクスの書き出し先（Django の設定でも同じ値を使う）
+os.environ.setdefault(
+    "METRICS_DIR",
+    os.path.join(
+        "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+        "app-metrics",
+    ),
+)
+
+
+def on_starting(server):
+    # 前回の起動で残ったワーカーのメトリクスを消す
+    for path in glob.glob(os.path.join(os.environ["METRICS_DIR"], "*.json")):
+        os.remove(path)
+    server.log.info(
+        "workers=%s worker_connections=%s db_concurrency=%s max_requests=%s (+%s)",
+        workers,
+        worker_connections,
+        db_concurrency,
+        max_requests,
+        max_requests_jitter,
+    )
+
+
+def post_fork(server, worker):
+    # 親プロセスで開いた DB 接続をワーカーで使わない
+    from django.db import connections
+
+    connections.close_all()
+
+
+def child_exit(server, worker):
+    try:
+        os.remove(os.path.join(os.environ["METRICS_DIR"], f"{worker.pid}.json"))
+    except OSError:
+        pass